@@ -0,0 +1,17 @@
+"""
+app — FastAPI backend of the dashboard.
+
+The shared ingest package (pipeline/, at the repo root) defines the schema,
+the rollup cube, the lateness thresholds, the delay priors and the serving
+files the API reads; it is imported rather than copied, so the two sides
+cannot drift apart.  The repo root is put on the path here, whatever the
+working directory the app is started from (``cd backend && uvicorn
+app.main:app``).
+"""
+
+import sys
+from pathlib import Path
+
+_REPO_ROOT = str(Path(__file__).resolve().parent.parent.parent)
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
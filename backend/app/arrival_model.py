@@ -0,0 +1,327 @@
+"""
+arrival_model.py — Gradient-boosted arrival-delay model.
+
+Predicts the arrival delay (minutes) at a stop from:
+
+* train_number, station_code — target-encoded (smoothed mean delay)
+* stop_sequence              — position of the stop on the run
+* day_of_week                — of the service date (Mon = 0)
+* upstream_delay             — last delay observed further up the line
+* stops_since_upstream       — how many stops back that was (0 = unknown)
+
+The trees learn the correction to a baseline — the upstream delay when
+one is known (delays mostly persist), else the train's mean delay.
+
+The trees are scikit-learn's ``HistGradientBoostingRegressor`` (features
+bucketed into at most 255 bins, NaN handled natively), so one ``predict``
+call scores all the stops of a train, or of every live train, at once.
+The station and train number are target-encoded here rather than passed
+as categorical features, which HistGradientBoostingRegressor limits to
+fewer categories than the feed has stations.
+
+``train_model.py`` (repo root) fits it on the clean dataset and saves
+models/arrival_model.joblib (the weekly train-model workflow publishes
+one as a build artifact); the API loads that file once at startup
+(``current()``) and falls back to the historical priors without it.
+scikit-learn is imported on first fit or load only, so workers without a
+model do not pay for it.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from pipeline.schema import EST
+
+_REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+MODEL_PATH = _REPO_ROOT / "models" / "arrival_model.joblib"
+
+FEATURES = [
+    "train_number",
+    "station_code",
+    "stop_sequence",
+    "day_of_week",
+    "upstream_delay",
+    "stops_since_upstream",
+]
+
+# Training samples look this many stops back for their upstream delay at most
+MAX_LOOKBACK = 12
+# Share of training samples with no upstream observation (trains that have
+# not departed, or are predicted from history alone)
+UNKNOWN_UPSTREAM_SHARE = 0.1
+# Targets are clipped to this range (minutes); the raw feed has outliers
+TARGET_RANGE = (-60.0, 720.0)
+# Smoothing (pseudo-count) of the target encodings
+ENCODING_PRIOR = 20.0
+
+# Run keys of multi-day trains carry their service date: "2 (03-28)"
+_RUN_DATE_RE = re.compile(r"\((\d{2})-(\d{2})\)\s*$")
+
+
+# ---------------------------------------------------------------------------
+# Features
+# ---------------------------------------------------------------------------
+class _TargetEncoding:
+    """Category → smoothed mean target; unseen categories get the global mean."""
+
+    def __init__(self, keys: np.ndarray, values: np.ndarray, default: float) -> None:
+        self.keys = keys
+        self.values = values
+        self.default = float(default)
+        self._index = pd.Index(keys)
+
+    @classmethod
+    def fit(cls, categories: pd.Series, y: np.ndarray) -> _TargetEncoding:
+        stats = pd.DataFrame({"k": categories.astype(str).to_numpy(), "y": y}).groupby("k")["y"].agg(["sum", "count"])
+        default = float(np.mean(y))
+        values = (stats["sum"] + ENCODING_PRIOR * default) / (stats["count"] + ENCODING_PRIOR)
+        return cls(stats.index.to_numpy(dtype=str), values.to_numpy(), default)
+
+    def transform(self, categories: Any) -> np.ndarray:
+        positions = self._index.get_indexer(pd.Index(np.asarray(categories, dtype=object).astype(str)))
+        return np.where(positions >= 0, self.values[positions], self.default)
+
+
+class ArrivalModel:
+    """Target encodings + trees + training metadata, saved as one joblib file."""
+
+    def __init__(
+        self,
+        trees: Any,
+        train_numbers: _TargetEncoding,
+        stations: _TargetEncoding,
+        meta: dict[str, Any],
+    ) -> None:
+        self.trees = trees
+        self.train_numbers = train_numbers
+        self.stations = stations
+        self.meta = meta
+
+    def features(self, frame: pd.DataFrame) -> np.ndarray:
+        """Feature matrix for a frame with the FEATURES columns (raw values)."""
+        return np.column_stack([
+            self.train_numbers.transform(frame["train_number"]),
+            self.stations.transform(frame["station_code"]),
+            frame["stop_sequence"].to_numpy(dtype=np.float64, na_value=np.nan),
+            frame["day_of_week"].to_numpy(dtype=np.float64, na_value=np.nan),
+            frame["upstream_delay"].to_numpy(dtype=np.float64, na_value=np.nan),
+            frame["stops_since_upstream"].to_numpy(dtype=np.float64, na_value=np.nan),
+        ])
+
+    @staticmethod
+    def _baseline(X: np.ndarray) -> np.ndarray:
+        """The upstream delay where one is known, else the train's mean delay."""
+        upstream = X[:, FEATURES.index("upstream_delay")]
+        return np.where(np.isnan(upstream), X[:, FEATURES.index("train_number")], upstream)
+
+    def predict(self, frame: pd.DataFrame) -> np.ndarray:
+        """Predicted delay (minutes) for every row of *frame*, in one batch."""
+        if frame.empty:
+            return np.empty(0)
+        X = self.features(frame)
+        return self._baseline(X) + self.trees.predict(X)
+
+    # -----------------------------------------------------------------------
+    # Training
+    # -----------------------------------------------------------------------
+    @classmethod
+    def fit(cls, samples: pd.DataFrame, **params: Any) -> ArrivalModel:
+        """
+        Fit on ``training_samples`` output (FEATURES + ``delay``); *params*
+        go to HistGradientBoostingRegressor.
+        """
+        import sklearn
+        from sklearn.ensemble import HistGradientBoostingRegressor
+
+        y = samples["delay"].to_numpy(dtype=np.float64)
+        train_numbers = _TargetEncoding.fit(samples["train_number"], y)
+        stations = _TargetEncoding.fit(samples["station_code"], y)
+        model = cls(None, train_numbers, stations, {})
+        X = model.features(samples)
+        # The trees learn the correction to the baseline
+        params = {"early_stopping": False, "random_state": 0, **params}
+        model.trees = HistGradientBoostingRegressor(**params).fit(X, y - cls._baseline(X))
+        model.meta = {
+            "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "samples": len(samples),
+            "params": params,
+            "sklearn": sklearn.__version__,
+        }
+        return model
+
+    # -----------------------------------------------------------------------
+    # Persistence
+    # -----------------------------------------------------------------------
+    def save(self, path: Path = MODEL_PATH) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        joblib.dump(
+            {
+                "trees": self.trees,
+                "train_numbers": self.train_numbers,
+                "stations": self.stations,
+                "meta": self.meta,
+            },
+            tmp_path,
+            compress=3,
+        )
+        tmp_path.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path: Path = MODEL_PATH) -> ArrivalModel:
+        state = joblib.load(path)
+        return cls(state["trees"], state["train_numbers"], state["stations"], state["meta"])
+
+
+# ---------------------------------------------------------------------------
+# Feature frames
+# ---------------------------------------------------------------------------
+def training_samples(df: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    """
+    One training sample per stop of the clean dataset with a known delay.
+
+    Each run (train_key × service_date) is taken from its latest scrape,
+    where most delays are final.  Every sample sees the delay observed a
+    random 1..MAX_LOOKBACK stops further up the same run as its upstream
+    delay — the situation of a live train at that distance from the stop —
+    and UNKNOWN_UPSTREAM_SHARE of them see none.
+    """
+    columns = ["scrape_date_est", "train_key", "train_number", "service_date",
+               "stop_sequence", "station_code", "delay_minutes"]
+    runs = df[columns]
+    latest = runs.groupby(["train_key", "service_date"], observed=True)["scrape_date_est"].transform("max")
+    runs = runs[runs["scrape_date_est"] == latest]
+    runs = runs.sort_values(["train_key", "service_date", "stop_sequence"], kind="stable").reset_index(drop=True)
+
+    rng = np.random.default_rng(seed)
+    delay = runs["delay_minutes"].to_numpy(dtype=np.float64, na_value=np.nan)
+    run_id = runs.groupby(["train_key", "service_date"], observed=True, sort=False).ngroup().to_numpy()
+    position = np.arange(len(runs)) - np.searchsorted(run_id, run_id)  # runs are contiguous
+
+    lookback = np.minimum(rng.integers(1, MAX_LOOKBACK + 1, len(runs)), position)
+    lookback[rng.random(len(runs)) < UNKNOWN_UPSTREAM_SHARE] = 0
+    upstream = np.where(lookback > 0, delay[np.arange(len(runs)) - lookback], np.nan)
+
+    samples = pd.DataFrame({
+        "scrape_date_est": runs["scrape_date_est"],
+        "train_number": runs["train_number"].astype(str),
+        "station_code": runs["station_code"].astype(str),
+        "stop_sequence": runs["stop_sequence"].to_numpy(dtype=np.float64, na_value=np.nan),
+        "day_of_week": runs["service_date"].dt.dayofweek.to_numpy(dtype=np.float64),
+        "upstream_delay": upstream,
+        "stops_since_upstream": lookback.astype(np.float64),
+        "delay": np.clip(delay, *TARGET_RANGE),
+    })
+    return samples[~np.isnan(delay)].reset_index(drop=True)
+
+
+def _day_of_week(service_date: Any) -> float:
+    try:
+        return float(date.fromisoformat(str(service_date)[:10]).weekday())
+    except ValueError:
+        return np.nan
+
+
+def service_date_of(train_key: str, today: date | None = None) -> date:
+    """
+    Service date of the run *train_key*: the MM-DD of a multi-day key
+    ("2 (03-28)") in the year that puts it closest to *today*, else *today*
+    (default: today's EST date).
+    """
+    today = today or datetime.now(EST).date()
+    match = _RUN_DATE_RE.search(train_key)
+    if match is None:
+        return today
+    candidates = []
+    for year in (today.year - 1, today.year, today.year + 1):
+        try:
+            candidates.append(date(year, int(match[1]), int(match[2])))
+        except ValueError:  # 02-29 outside a leap year, or garbage
+            pass
+    return min(candidates, key=lambda d: abs(d - today)) if candidates else today
+
+
+def _parse_time(value: Any) -> datetime | None:
+    """Aware datetime of an ISO 8601 string (naive = UTC); None when unparseable."""
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+def live_stop_frame(trains: list[dict[str, Any]], now: datetime | None = None) -> pd.DataFrame:
+    """
+    FEATURES for every stop of the live-feed *trains* (app.live_feed's
+    shape), plus train_key, code and ``observed``.  A stop counts as reached
+    once its estimated arrival has passed (the origin: once the train has
+    departed); the delay at the last reached stop is the upstream delay of
+    the stops after it.  Estimated arrivals that do not parse are treated
+    as not passed, and naive times (including *now*) as UTC.
+    """
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    rows: list[tuple] = []
+    for train in trains:
+        train_key = train["train_key"]
+        train_number = train_key.split()[0]
+        dow = _day_of_week(train.get("service_date"))
+        stops = train.get("stops") or []
+
+        reached = -1
+        if train.get("departed") and stops:
+            reached = 0
+            for i, stop in enumerate(stops):
+                eta = _parse_time(stop.get("estimated_arrival"))
+                if train.get("arrived") or (eta is not None and eta <= now):
+                    reached = i
+        upstream = stops[reached].get("delay_minutes") if reached >= 0 else None
+
+        for i, stop in enumerate(stops):
+            known = 0 <= reached < i and upstream is not None
+            rows.append((
+                train_key,
+                train_number,
+                stop.get("code") or "",
+                i,
+                dow,
+                upstream if known else np.nan,
+                i - reached if known else 0,
+                i <= reached,
+            ))
+    return pd.DataFrame(
+        rows,
+        columns=["train_key", *FEATURES, "observed"],
+    ).astype({"upstream_delay": "float64", "day_of_week": "float64"})
+
+
+# ---------------------------------------------------------------------------
+# Loaded model
+# ---------------------------------------------------------------------------
+_current: ArrivalModel | None = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def current() -> ArrivalModel | None:
+    """The model saved at MODEL_PATH, loaded on first call; None without one."""
+    global _current, _loaded
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                _current = ArrivalModel.load(MODEL_PATH) if MODEL_PATH.exists() else None
+                _loaded = True
+    return _current
@@ -1,26 +1,239 @@
 """
-data_loader.py — Loads the cleaned Parquet dataset once at startup and
-exposes helper functions for the API routers.
+data_loader.py — Loads the cleaned Parquet dataset and exposes helper
+functions for the API routers.
+
+The dataset is read from the Hive-partitioned layout in clean_data/via_rail/
+(one ``scrape_date_est=YYYY-MM-DD`` directory per EST day), else from the
+legacy single file clean_data/via_rail_clean.parquet.  Everything derived
+from one version of the files lives in a ``Dataset``; ``watch`` swaps in new
+versions as the pipeline writes them.
 """
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections.abc import Iterable
+from datetime import date, datetime, timezone
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from app import metrics
+from app.indexes import FrameIndex
+from app.priors import Priors
+from pipeline.priors import PRIORS_SCHEMA
+from pipeline.rollup import ROLLUP_DIMS, ROLLUP_MEASURES, build_rollup
+from pipeline.schema import SCHEMA
+from pipeline.serving import (
+    ROLLUP_FILENAME,
+    ROWS_FILENAME,
+    ensure_serving,
+    partitions_fingerprint,
+    serving_dir,
+)
 
 # ---------------------------------------------------------------------------
 # Path resolution — works regardless of the working directory
 # ---------------------------------------------------------------------------
 _REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+_DATASET_DIR = _REPO_ROOT / "clean_data" / "via_rail"
 _PARQUET_PATH = _REPO_ROOT / "clean_data" / "via_rail_clean.parquet"
+_ROLLUP_DIR = _DATASET_DIR / "_rollup"
+_MANIFEST_PATH = _DATASET_DIR / "_manifest.parquet"
+_PRIORS_PATH = _DATASET_DIR / "_priors.parquet"
+_SERVING_ROWS_PATH = serving_dir(_DATASET_DIR) / ROWS_FILENAME
+_SERVING_ROLLUP_PATH = serving_dir(_DATASET_DIR) / ROLLUP_FILENAME
+
+RELOAD_INTERVAL_SECONDS = 60.0
+
+log = logging.getLogger(__name__)
+
+# The partition key lives only in the directory names, so its type has to be
+# declared explicitly for it to come back as a date column.
+_PARTITIONING = ds.partitioning(
+    pa.schema([pa.field("scrape_date_est", pa.date32())]), flavor="hive"
+)
+
+# Low-cardinality string columns held as categoricals
+_CATEGORICAL_COLUMNS = [
+    "train_key",
+    "train_number",
+    "origin",
+    "destination",
+    "station_name",
+    "station_code",
+    "diff_status",
+]
+
+# Arrow → pandas dtypes for nullable columns (the defaults would give object
+# arrays of Python bools / float64 as soon as one value is null)
+_NULLABLE_DTYPES = {
+    pa.bool_(): pd.BooleanDtype(),
+    pa.int32(): pd.Int32Dtype(),
+}
+
+# Columns with a secondary index (see get_index)
+INDEXED_COLUMNS = [
+    "train_number",
+    "train_key",
+    "station_code",
+    "origin",
+    "destination",
+    "is_corridor",
+]
+
+# Rollup levels built before a new version is swapped in (the dashboard's
+# default queries)
+_WARM_ROLLUP_LEVELS = [(), ("is_corridor",)]
+
+
+def _partition_names(root: Path) -> set[str]:
+    return {p.name for p in root.glob("scrape_date_est=*")} if root.is_dir() else set()
+
+
+def _has_partitions() -> bool:
+    """Return True when the partitioned dataset holds at least one day."""
+    return bool(_partition_names(_DATASET_DIR))
+
+
+def _parquet_format(columns: Iterable[str]) -> ds.ParquetFileFormat:
+    """Parquet format that reads *columns* as dictionary arrays."""
+    return ds.ParquetFileFormat(read_options={"dictionary_columns": list(columns)})
+
+
+def _to_pandas(table: pa.Table) -> pd.DataFrame:
+    """Convert *table* to the compact pandas representation (see above)."""
+    # Restore the canonical column order (partition column first)
+    names = [n for n in table.column_names if n != "scrape_date_est"]
+    if "scrape_date_est" in table.column_names:
+        names.insert(0, "scrape_date_est")
+    df = table.select(names).to_pandas(
+        date_as_object=False,
+        types_mapper=_NULLABLE_DTYPES.get,
+        split_blocks=True,
+    )
+    for column in _CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            values = df[column].astype("category")
+            df[column] = values.cat.reorder_categories(sorted(values.cat.categories))
+    del table
+    # Hand the Arrow buffers back to the OS; the allocator would otherwise
+    # keep them for the life of the worker.
+    pa.default_memory_pool().release_unused()
+    return df
+
+
+def _to_arrow(df: pd.DataFrame) -> pa.Table:
+    """Convert a compact frame back to SCHEMA types, for the pipeline's builders."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    return table.cast(pa.schema([SCHEMA.field(name) for name in table.column_names]))
+
+
+# ---------------------------------------------------------------------------
+# Memory-mapped serving files (layout: see pipeline/serving.py)
+# ---------------------------------------------------------------------------
+def _view(table: pa.Table, name: str) -> np.ndarray:
+    """Zero-copy numpy view of a null-free fixed-width column."""
+    column = table.column(name)
+    array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+    return array.to_numpy(zero_copy_only=True)
+
+
+def _serving_column(table: pa.Table, field: pa.Field) -> pd.api.extensions.ExtensionArray | np.ndarray:
+    meta = {k.decode(): v.decode() for k, v in (field.metadata or {}).items()}
+    values = _view(table, field.name)
+    kind = meta.get("pandas")
+    if kind == "category":
+        categories = pd.Index(json.loads(meta["categories"]), dtype="str")
+        return pd.Categorical.from_codes(values, categories=categories, validate=False)
+    if kind in ("Int32", "boolean"):
+        mask = _view(table, meta["mask"]).view(np.bool_)
+        if kind == "boolean":
+            return pd.arrays.BooleanArray(values.view(np.bool_), mask, copy=False)
+        return pd.arrays.IntegerArray(values, mask, copy=False)
+    if kind == "datetime":
+        values = values.view(f"M8[{meta['unit']}]")
+        if meta["tz"]:
+            # Every public tz-aware constructor copies: these few timestamp
+            # columns are private to the worker, the rest stay shared
+            return pd.array(values, dtype=pd.DatetimeTZDtype(meta["unit"], meta["tz"]))
+    return values
 
-# Module-level singleton: loaded once when the module is first imported.
-_df: pd.DataFrame | None = None
 
+def _map_serving(path: Path, partitions: str) -> pd.DataFrame | None:
+    """
+    Memory-map the serving file at *path* as a DataFrame of read-only views,
+    or return None when it is missing or was not built from *partitions*
+    (a ``partitions_fingerprint``).
+    """
+    try:
+        with pa.memory_map(str(path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if (table.schema.metadata or {}).get(b"partitions") != partitions.encode():
+        return None
 
-def _load() -> pd.DataFrame:
-    """Read the Parquet file and return the DataFrame."""
+    masks = {
+        field.metadata[b"mask"].decode()
+        for field in table.schema
+        if field.metadata and b"mask" in field.metadata
+    }
+    return pd.DataFrame(
+        {
+            field.name: pd.Series(_serving_column(table, field), name=field.name, copy=False)
+            for field in table.schema
+            if field.name not in masks
+        },
+        copy=False,
+    )
+
+
+def _load(mapped: bool = True, partitions: str | None = None) -> pd.DataFrame:
+    """
+    Read the dataset and return the DataFrame — memory-mapped from the
+    serving file when it matches *partitions* (by default the current
+    ``partitions_fingerprint``), unless *mapped* is False.
+
+    The frame is kept compact, since every worker holds a full copy:
+
+    * low-cardinality strings (train_key, station_code, origin, …) are
+      decoded straight from the Parquet dictionary pages into categoricals
+      whose categories are sorted, so sorting and grouping order is
+      unchanged and equality filters compare integer codes;
+    * booleans use pandas' nullable ``boolean`` dtype (1 byte + 1 byte mask)
+      and int32 columns ``Int32``, instead of object arrays where nulls occur;
+    * dates and timestamps are int64-backed datetime64 columns, not Python
+      ``date`` objects.
+
+    The serving files (clean_data/via_rail/_serving/, see pipeline/serving.py)
+    are built by the first worker to load a version they do not match; mapped
+    from them every column is a read-only view of the file, so all workers
+    share one page-cache copy.  When they cannot be built (e.g. a read-only
+    checkout) the Parquet partitions are read instead.
+    """
+    if _has_partitions():
+        df = None
+        if mapped:
+            if partitions is None:
+                partitions = partitions_fingerprint(_DATASET_DIR)
+            try:
+                ensure_serving(_DATASET_DIR, partitions)
+            except OSError as exc:
+                log.warning("Cannot write the serving files, reading Parquet: %s", exc)
+            df = _map_serving(_SERVING_ROWS_PATH, partitions)
+        if df is not None:
+            return df
+        return _to_pandas(parquet_dataset(_CATEGORICAL_COLUMNS).to_table())
     if not _PARQUET_PATH.exists():
         # Return an empty DataFrame with the expected columns so the API can
         # still start when no dataset has been built yet.
@@ -43,21 +256,487 @@ def _load() -> pd.DataFrame:
                 "estimated_departure_utc",
                 "delay_minutes",
                 "diff_status",
-                "is_on_time",
-                "is_late_15",
-                "is_late_60",
                 "is_corridor",
             ]
         )
-    return pd.read_parquet(_PARQUET_PATH)
+    return _to_pandas(pq.read_table(_PARQUET_PATH, read_dictionary=_CATEGORICAL_COLUMNS))
+
+
+def parquet_dataset(dictionary_columns: Iterable[str] = ()) -> ds.Dataset | None:
+    """
+    Return a pyarrow Dataset over the Parquet files on disk — the
+    partitions, else the legacy single file — or None when there are none.
+    Scanning it reads lazily, one file at a time.
+    """
+    fmt = _parquet_format(dictionary_columns)
+    if _has_partitions():
+        return ds.dataset(_DATASET_DIR, format=fmt, partitioning=_PARTITIONING)
+    if _PARQUET_PATH.exists():
+        return ds.dataset(_PARQUET_PATH, format=fmt)
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Pushdown queries on the Parquet files
+# ---------------------------------------------------------------------------
+def scan_filter(
+    *,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    equals: dict[str, object] | None = None,
+) -> ds.Expression | None:
+    """
+    Return the filter expression for scrape_date_est within [*date_from*,
+    *date_to*] and ``column == value`` for each item of *equals* (a list,
+    tuple or set value matches any of its elements), or None for no filter.
+    """
+    predicates = []
+    day = ds.field("scrape_date_est")
+    if date_from is not None:
+        predicates.append(day >= pa.scalar(date_from, pa.date32()))
+    if date_to is not None:
+        predicates.append(day <= pa.scalar(date_to, pa.date32()))
+    for column, value in (equals or {}).items():
+        if isinstance(value, (list, tuple, set, frozenset)):
+            predicates.append(ds.field(column).isin(list(value)))
+        else:
+            predicates.append(ds.field(column) == value)
+
+    expression = None
+    for predicate in predicates:
+        expression = predicate if expression is None else expression & predicate
+    return expression
+
+
+def scanner(
+    columns: list[str] | None = None,
+    *,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    equals: dict[str, object] | None = None,
+    dictionary_columns: Iterable[str] = (),
+    batch_size: int = 131_072,
+) -> ds.Scanner | None:
+    """
+    Return a pyarrow Scanner over the Parquet files reading only *columns*
+    (all by default, partition column first) of the rows matching
+    ``scan_filter(...)``, or None when there is no dataset.  Raises
+    ValueError for unknown columns.
+    """
+    dataset = parquet_dataset(dictionary_columns)
+    if dataset is None:
+        return None
+    names = ["scrape_date_est"] + [n for n in dataset.schema.names if n != "scrape_date_est"]
+    if columns is not None:
+        unknown = sorted(set(columns).union(equals or {}).difference(names))
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        names = list(columns)
+    return dataset.scanner(
+        columns=names,
+        filter=scan_filter(date_from=date_from, date_to=date_to, equals=equals),
+        batch_size=batch_size,
+    )
+
+
+def scan(
+    columns: list[str] | None = None,
+    *,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    equals: dict[str, object] | None = None,
+) -> pd.DataFrame:
+    """
+    Read just *columns* of the rows matching the filters from the Parquet
+    files (see ``scanner``) into a compact frame, like the one ``_load``
+    builds.  Independent of the loaded version — use it for queries the
+    in-memory frame and rollup cube don't cover.
+
+    The column list and the filters are pushed down to the pyarrow.dataset
+    scan, so only the partitions in the date range, the row groups whose
+    statistics admit the filters and the requested columns are read: the
+    cost of a query follows the data it asks for, not the size of the
+    history.
+    """
+    scan_ = scanner(
+        columns,
+        date_from=date_from,
+        date_to=date_to,
+        equals=equals,
+        dictionary_columns=_CATEGORICAL_COLUMNS,
+    )
+    if scan_ is None:
+        return pd.DataFrame(columns=columns or [])
+    return _to_pandas(scan_.to_table())
+
+
+def dataset_version() -> str | None:
+    """
+    Return a fingerprint of the files on disk, or None if they are being
+    replaced right now.  The partitioned dataset is identified by its
+    manifest (written last by every build and update), the legacy file by
+    itself.
+    """
+    if _has_partitions():
+        if _MANIFEST_PATH.exists():
+            paths = [_MANIFEST_PATH]
+        else:
+            paths = sorted(_DATASET_DIR.glob("scrape_date_est=*/*.parquet"))
+    elif _PARQUET_PATH.exists():
+        paths = [_PARQUET_PATH]
+    else:
+        return "empty"
+
+    digest = hashlib.sha1()
+    try:
+        for path in paths:
+            st = path.stat()
+            digest.update(f"{path.name}:{st.st_mtime_ns}:{st.st_size}\n".encode())
+    except OSError:
+        return None
+    return digest.hexdigest()[:12]
+
+
+# ---------------------------------------------------------------------------
+# Rollup cube
+# ---------------------------------------------------------------------------
+def _rollup_from_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate stop-level rows into the rollup cube, as the pipeline does."""
+    return _to_pandas(build_rollup(_to_arrow(df)))
+
+
+def _load_rollup(df: pd.DataFrame, partitions: str | None = None) -> pd.DataFrame:
+    """
+    Read the stored cube — memory-mapped when the serving file matches
+    *partitions*, the fingerprint the rows were loaded with — or derive it
+    when it is missing, out of step with the partitions or built with other
+    lateness thresholds.
+    """
+    days = _partition_names(_DATASET_DIR)
+    if days and partitions is not None:
+        cube = _map_serving(_SERVING_ROLLUP_PATH, partitions)
+        if cube is not None and set(ROLLUP_MEASURES).issubset(cube.columns):
+            return cube
+    if days and _partition_names(_ROLLUP_DIR) == days:
+        dataset = ds.dataset(
+            _ROLLUP_DIR,
+            format=_parquet_format(c for c in ROLLUP_DIMS if c in _CATEGORICAL_COLUMNS),
+            partitioning=_PARTITIONING,
+        )
+        if set(ROLLUP_MEASURES).issubset(dataset.schema.names):
+            return _to_pandas(dataset.to_table())
+    return _rollup_from_rows(df)
+
+
+def _load_priors(df: pd.DataFrame) -> Priors:
+    """
+    Read the stored priors table, or derive it when it is missing or was
+    built before one of its key columns existed.
+    """
+    if _has_partitions() and _PRIORS_PATH.exists():
+        table = pq.read_table(_PRIORS_PATH)
+        if set(PRIORS_SCHEMA.names).issubset(table.column_names):
+            return Priors.from_frame(table.to_pandas())
+    return Priors.from_rows(_to_arrow(df))
+
+
+# ---------------------------------------------------------------------------
+# One loaded version
+# ---------------------------------------------------------------------------
+class Dataset:
+    """
+    One version of the dataset plus the indexes, rollups and priors derived
+    from it.  Requests hold on to the Dataset returned by ``current()``, so
+    an in-flight request finishes on the version it started with.
+
+    ``priors`` holds the delay priors table written by the pipeline to
+    clean_data/via_rail/_priors.parquet (see pipeline/priors.py and
+    app/priors.py) as a dict, for fallback predictions; like the rollup
+    cube it is derived from the rows when the file is missing.
+    """
+
+    def __init__(self, version: str | None, df: pd.DataFrame, partitions: str | None = None) -> None:
+        self.version = version
+        # Fingerprint of the partitions at load time (None without partitions)
+        self.partitions = partitions
+        self.loaded_at = datetime.now(timezone.utc)
+        self.df = df
+        self._index: FrameIndex | None = None
+        self._rollup_base: pd.DataFrame | None = None
+        self._rollups: dict[frozenset[str], tuple[pd.DataFrame, FrameIndex]] = {}
+        self._priors: Priors | None = None
+
+    @classmethod
+    def load(cls, version: str | None) -> Dataset:
+        # Hashed once per load: it covers both the rows and the rollup cube
+        partitions = partitions_fingerprint(_DATASET_DIR) if _has_partitions() else None
+        return cls(version, _load(partitions=partitions), partitions)
+
+    def warm(self) -> Dataset:
+        """Build the indexes, default rollup levels and priors ahead of first use."""
+        _ = self.index
+        _ = self.priors
+        for dims in _WARM_ROLLUP_LEVELS:
+            self._rollup_level(dims)
+        return self
+
+    # -----------------------------------------------------------------------
+    # Stop-level rows
+    # -----------------------------------------------------------------------
+    @property
+    def index(self) -> FrameIndex:
+        """Secondary indexes over ``df``, built on first use."""
+        if self._index is None:
+            self._index = FrameIndex(self.df, INDEXED_COLUMNS, date_column="scrape_date_est")
+        return self._index
+
+    def select(
+        self,
+        filters: dict[str, object] | None = None,
+        since: object = None,
+        columns: str | list[str] | None = None,
+    ) -> pd.DataFrame | pd.Series:
+        """
+        Return the rows where each ``column == value`` of *filters* holds
+        (columns from INDEXED_COLUMNS) and, if given, scrape_date_est is on
+        or after *since* — answered from the indexes without scanning the
+        frame.  Only *columns* are gathered when given; a single column name
+        returns a Series, as with ``df[column]``.
+
+        The indexes (see app/indexes.py) are built on first use and map each
+        value to its row positions, so a query costs the rows it returns
+        rather than a full-column mask.
+        """
+        df = self.df if columns is None else self.df[columns]
+        return df.iloc[self.index.select(filters or {}, since=since)]
+
+    # -----------------------------------------------------------------------
+    # Delay priors
+    # -----------------------------------------------------------------------
+    @property
+    def priors(self) -> Priors:
+        """Historical delay priors (see app/priors.py), loaded on first use."""
+        if self._priors is None:
+            self._priors = _load_priors(self.df)
+        return self._priors
+
+    # -----------------------------------------------------------------------
+    # Rollup cube
+    # -----------------------------------------------------------------------
+    def _rollup_level(self, dims: Iterable[str]) -> tuple[pd.DataFrame, FrameIndex]:
+        key = frozenset(dims)
+        unknown = key.difference(ROLLUP_DIMS)
+        if unknown:
+            raise ValueError(f"Not rollup dimensions: {sorted(unknown)}")
+
+        if key not in self._rollups:
+            if self._rollup_base is None:
+                self._rollup_base = _load_rollup(self.df, self.partitions)
+            by = [d for d in ROLLUP_DIMS if d in key]
+            cube = self._rollup_base[["scrape_date_est", *by, *ROLLUP_MEASURES]].copy()
+            for column in ("origin", "destination"):
+                if column in key:
+                    cube[column] = cube[column].astype(object).str.upper().astype("category")
+            level = (
+                cube
+                .groupby(["scrape_date_est", *by], dropna=False, observed=True, sort=True)[list(ROLLUP_MEASURES)]
+                .sum()
+                .reset_index()
+            )
+            self._rollups[key] = (level, FrameIndex(level, by, date_column="scrape_date_est"))
+        return self._rollups[key]
+
+    def get_rollup(self, dims: Iterable[str] = ()) -> pd.DataFrame:
+        """
+        Return the rollup cube summed over every dimension not in *dims*: one
+        row per scrape_date_est × *dims* combination with the additive
+        ROLLUP_MEASURES.  origin and destination are upper-cased so callers
+        can filter them case-insensitively with plain equality.  Each level
+        is built (and indexed) once, on first use.
+
+        The cube is the one written by the pipeline to
+        clean_data/via_rail/_rollup/ (see pipeline/rollup.py).  When it is
+        missing, does not cover every partition or lacks a lateness measure
+        (the thresholds changed) it is derived from the stop-level rows
+        instead.  Other thresholds are answered by ``count_late``.
+        """
+        return self._rollup_level(dims)[0]
+
+    def select_rollup(
+        self, filters: dict[str, object], period_days: int | None = None
+    ) -> pd.DataFrame:
+        """
+        Return the rows of the smallest rollup level covering *filters* where
+        each ``dim == value`` holds and, with *period_days*, scrape_date_est
+        lies within that many days of the latest date — via the level's
+        indexes.
+        """
+        cube, index = self._rollup_level(filters)
+        since = None
+        if period_days is not None:
+            latest = index.max_date()
+            if latest is None:
+                return cube
+            since = pd.Timestamp(latest) - pd.Timedelta(days=period_days - 1)
+        return cube.iloc[index.select(filters, since=since)]
+
+    def count_late(
+        self, filters: dict[str, object], threshold: int, period_days: int | None = None
+    ) -> pd.Series:
+        """
+        Return the number of stops at least *threshold* minutes late per
+        scrape_date_est, over the stop-level rows matching the rollup
+        dimension *filters* (origin and destination upper-cased, as for
+        ``select_rollup``) within the same *period_days* window — for
+        thresholds the cube has no measure for.
+        """
+        since = None
+        if period_days is not None:
+            latest = self.index.max_date()
+            if latest is None:
+                return pd.Series(dtype="int64")
+            since = pd.Timestamp(latest) - pd.Timedelta(days=period_days - 1)
+
+        filters = dict(filters)
+        for column in ("origin", "destination"):
+            if column in filters:
+                # Every spelling that upper-cases to the requested value
+                filters[column] = [
+                    v for v in self.index.columns[column].codes if str(v).upper() == filters[column]
+                ]
+        rows = self.select(filters, since=since, columns=["scrape_date_est", "delay_minutes"])
+        late = rows["delay_minutes"].to_numpy(dtype="float64", na_value=np.nan) >= threshold
+        return pd.Series(late, index=rows["scrape_date_est"]).groupby(level=0, sort=True).sum()
+
+
+# ---------------------------------------------------------------------------
+# Current version and hot reload
+# ---------------------------------------------------------------------------
+_current: Dataset | None = None
+_reload_lock = threading.Lock()
+
+_RELOADS = metrics.Counter(
+    "via_dataset_reloads_total",
+    "Dataset versions loaded, by outcome (swapped, superseded, failed).",
+    ["result"],
+    registry=metrics.REGISTRY,
+)
+_ROWS = metrics.Gauge(
+    "via_dataset_rows", "Stop-level rows in the dataset being served.", registry=metrics.REGISTRY
+)
+_FRAME_BYTES = metrics.Gauge(
+    "via_dataset_frame_bytes",
+    "Size of the served frame's columns (memory-mapped ones included).",
+    registry=metrics.REGISTRY,
+)
+_LOADED_AT = metrics.Gauge(
+    "via_dataset_loaded_timestamp_seconds", "When the served dataset was loaded.", registry=metrics.REGISTRY
+)
+_LOAD_SECONDS = metrics.Gauge(
+    "via_dataset_load_seconds", "Time the served dataset took to load and warm up.", registry=metrics.REGISTRY
+)
+
+
+def _swapped_in(dataset: Dataset, seconds: float) -> None:
+    _RELOADS.labels(result="swapped").inc()
+    _ROWS.set(len(dataset.df))
+    _FRAME_BYTES.set(int(dataset.df.memory_usage(index=False, deep=True).sum()))
+    _LOADED_AT.set(dataset.loaded_at.timestamp())
+    _LOAD_SECONDS.set(seconds)
+
+
+def current() -> Dataset:
+    """
+    Return the Dataset being served, loading it on first call.  Callers
+    should use the returned object for the whole request.
+    """
+    if _current is None:
+        reload_if_changed()
+    return _current
+
+
+def loaded() -> Dataset | None:
+    """Return the Dataset being served, or None before the first load."""
+    return _current
+
+
+def reload_if_changed() -> bool:
+    """
+    Load and swap in the files on disk if their version differs from the
+    one being served; return True if a new version was swapped in.
+    Blocking — run it in a worker thread from async code.
+    """
+    global _current
+    with _reload_lock:
+        version = dataset_version()
+        if _current is not None and (version is None or version == _current.version):
+            return False
+
+        start = time.perf_counter()
+        with metrics.timed("dataset", "load"):
+            dataset = Dataset.load(version)
+        with metrics.timed("dataset", "warm"):
+            dataset.warm()
+        # Files replaced while loading: keep what we have and retry on the
+        # next poll (unless there is nothing to serve yet).
+        if _current is not None and dataset_version() != version:
+            _RELOADS.labels(result="superseded").inc()
+            return False
+        _current = dataset
+        _swapped_in(dataset, time.perf_counter() - start)
+        return True
+
 
+async def watch(interval: float = RELOAD_INTERVAL_SECONDS) -> None:
+    """
+    Poll for new dataset versions forever, loading them off the event loop.
 
+    The version is ``dataset_version`` — a fingerprint of _manifest.parquet,
+    which the pipeline rewrites last on every build or update.  When it
+    changes the new version is loaded in a worker thread, its indexes and
+    rollup levels are warmed, and it is swapped in with a single assignment.
+    Started by the app's lifespan.
+    """
+    while True:
+        try:
+            if await asyncio.to_thread(reload_if_changed):
+                log.info("Serving dataset version %s", _current.version)
+        except Exception:  # keep serving the old version
+            _RELOADS.labels(result="failed").inc()
+            log.exception("Dataset reload failed")
+        await asyncio.sleep(interval)
+
+
+# ---------------------------------------------------------------------------
+# Shortcuts on the current version
+# ---------------------------------------------------------------------------
 def get_df() -> pd.DataFrame:
-    """Return the singleton DataFrame, loading it on first call."""
-    global _df
-    if _df is None:
-        _df = _load()
-    return _df
+    """Return the DataFrame of the current version."""
+    return current().df
+
+
+def get_index() -> FrameIndex:
+    """Return the secondary indexes of the current version."""
+    return current().index
+
+
+def select(
+    filters: dict[str, object] | None = None,
+    since: object = None,
+    columns: str | list[str] | None = None,
+) -> pd.DataFrame | pd.Series:
+    """Dataset.select on the current version."""
+    return current().select(filters, since=since, columns=columns)
+
+
+def get_rollup(dims: Iterable[str] = ()) -> pd.DataFrame:
+    """Dataset.get_rollup on the current version."""
+    return current().get_rollup(dims)
+
+
+def select_rollup(filters: dict[str, object], period_days: int | None = None) -> pd.DataFrame:
+    """Dataset.select_rollup on the current version."""
+    return current().select_rollup(filters, period_days)
 
 
 # ---------------------------------------------------------------------------
@@ -66,16 +745,16 @@ def get_df() -> pd.DataFrame:
 
 def get_corridor_df() -> pd.DataFrame:
     """Return rows that belong to the Windsor–Québec City corridor."""
-    df = get_df()
-    if df.empty or "is_corridor" not in df.columns:
-        return df
-    return df[df["is_corridor"].fillna(False)]
+    data = current()
+    if data.df.empty or "is_corridor" not in data.df.columns:
+        return data.df
+    return data.select({"is_corridor": True})
 
 
 def get_recent_df(days: int = 30) -> pd.DataFrame:
     """Return rows from the most recent *days* EST calendar days."""
-    df = get_df()
-    if df.empty or "scrape_date_est" not in df.columns:
-        return df
-    cutoff = df["scrape_date_est"].max() - pd.Timedelta(days=days - 1)
-    return df[df["scrape_date_est"] >= cutoff]
+    data = current()
+    if data.df.empty or "scrape_date_est" not in data.df.columns:
+        return data.df
+    cutoff = pd.Timestamp(data.index.max_date()) - pd.Timedelta(days=days - 1)
+    return data.select(since=cutoff)
@@ -0,0 +1,109 @@
+"""
+indexes.py — Secondary indexes over an in-memory DataFrame.
+
+A FrameIndex maps each value of selected columns to the positions of the
+rows holding it, stored as one position array per column sorted by value
+(CSR style: ``order[offsets[code]:offsets[code + 1]]``), plus a sorted-range
+lookup on one date column.  Built once per frame in O(n log n); a lookup is
+a dict hit and a slice, and combining filters intersects the (sorted)
+position arrays smallest-first instead of masking every row.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+
+class _ColumnIndex:
+    """Value → sorted row positions for one column."""
+
+    def __init__(self, values: pd.Series) -> None:
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            uniques = values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        # Shift by one so nulls (code -1) get their own, unreachable bucket
+        shifted = codes.astype(np.int64) + 1
+        dtype = np.int32 if len(values) < np.iinfo(np.int32).max else np.int64
+        self.order = np.argsort(shifted, kind="stable").astype(dtype)
+        self.offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(shifted, minlength=len(uniques) + 1))]
+        )
+        self.codes = {value: code + 1 for code, value in enumerate(uniques)}
+
+    def rows(self, value: Any) -> np.ndarray:
+        if isinstance(value, (list, tuple, set, frozenset)):
+            # Any of the values: the buckets are disjoint
+            parts = [self.rows(v) for v in value]
+            return np.sort(np.concatenate(parts)) if parts else self.order[:0]
+        code = self.codes.get(value)
+        if code is None:
+            return self.order[:0]
+        return self.order[self.offsets[code]:self.offsets[code + 1]]
+
+
+class FrameIndex:
+    """Secondary indexes on *columns* of *df* and a range index on *date_column*."""
+
+    def __init__(self, df: pd.DataFrame, columns: list[str], date_column: str | None = None) -> None:
+        self.num_rows = len(df)
+        self.columns = {c: _ColumnIndex(df[c]) for c in columns if c in df.columns}
+
+        self.date_column = date_column
+        self._dates: np.ndarray | None = None
+        self._date_order: np.ndarray | None = None
+        if date_column is not None and date_column in df.columns:
+            dates = df[date_column].to_numpy()
+            if not df[date_column].is_monotonic_increasing:
+                self._date_order = np.argsort(dates, kind="stable")
+                dates = dates[self._date_order]
+            self._dates = dates
+
+    def rows(self, column: str, value: Any) -> np.ndarray:
+        """
+        Positions of the rows where *column* equals *value* (any element of a
+        list, tuple or set), ascending.
+        """
+        return self.columns[column].rows(value)
+
+    def max_date(self) -> Any:
+        """Latest value of the date column, or None for an empty frame."""
+        if self._dates is None or not len(self._dates):
+            return None
+        return self._dates[-1]
+
+    def since(self, start: Any) -> np.ndarray:
+        """Positions of the rows whose date is on or after *start*, ascending."""
+        lo = int(np.searchsorted(self._dates, np.asarray(start, dtype=self._dates.dtype)))
+        if self._date_order is None:
+            return np.arange(lo, self.num_rows)
+        return np.sort(self._date_order[lo:])
+
+    def select(self, filters: dict[str, Any], since: Any = None) -> np.ndarray:
+        """
+        Positions of the rows matching every ``column == value`` in *filters*
+        and, if given, dated on or after *since* — ascending, so ``iloc`` keeps
+        the frame's order.
+        """
+        candidates = sorted((self.rows(c, v) for c, v in filters.items()), key=len)
+        if not candidates:
+            positions = np.arange(self.num_rows)
+        else:
+            positions = candidates[0]
+            for other in candidates[1:]:
+                if not len(positions):
+                    break
+                positions = np.intersect1d(positions, other, assume_unique=True)
+
+        if since is not None and self._dates is not None:
+            if self._date_order is None:
+                # Dates ascend with position: the window is a suffix
+                lo = int(np.searchsorted(self._dates, np.asarray(since, dtype=self._dates.dtype)))
+                positions = positions[np.searchsorted(positions, lo):]
+            else:
+                positions = np.intersect1d(positions, self.since(since), assume_unique=True)
+        return positions
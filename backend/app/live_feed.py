@@ -0,0 +1,354 @@
+"""
+live_feed.py — Shared, cached view of the Via Rail live feed.
+
+One background task per worker polls the upstream feed on a fixed cadence
+and keeps the simplified train list in memory; every /api/live request is
+answered from that snapshot.  Upstream traffic is therefore bounded by the
+refresh interval (one conditional GET per REFRESH_SECONDS per worker), no
+matter how many clients are connected.
+
+Stale-while-revalidate: a snapshot older than REFRESH_SECONDS is still
+served immediately while a single refresh runs in the background.  Only a
+cold cache (no successful fetch yet) makes a request wait for upstream, and
+concurrent cold requests share one fetch.
+
+The upstream body is decoded one train at a time as it streams in (see
+pipeline/json_stream.py), so the response is simplified while it downloads and
+the full tree of raw dicts is never held.
+
+Change feed: whenever a fetch yields different content, the per-train diff
+against the previous snapshot is computed once and kept in a short history
+(see ``diff_trains``).  Streaming clients (/api/live/stream) wait on
+``wait_for_version`` and forward those diffs instead of the full payload.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+from collections import deque
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from typing import Any
+
+import httpx
+
+from app import metrics
+from pipeline.json_stream import ObjectItems
+from pipeline.schema import CORRIDOR_STATION_CODES
+
+VIA_RAIL_URL = "https://tsimobile.viarail.ca/data/allData.json"
+
+REFRESH_SECONDS = 30.0
+UPSTREAM_TIMEOUT = 10.0
+
+# The body is decoded in pieces of at least this size: smaller network reads
+# are coalesced, since a train cut at a piece boundary is decoded twice.
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Diffs kept for streaming clients that fall a few versions behind; older
+# clients are sent a fresh snapshot instead.
+DIFF_HISTORY = 16
+
+_TRAIN_FIELDS = ("from", "to", "departed", "arrived", "service_date")
+
+log = logging.getLogger(__name__)
+
+
+def build_train(train_key: str, train: dict[str, Any]) -> dict[str, Any]:
+    """Return the simplified form of one raw train served by /api/live."""
+    stops = []
+    for stop in train.get("times", []):
+        arrival = stop.get("arrival") or {}
+        stops.append({
+            "station": stop.get("station"),
+            "code": stop.get("code"),
+            "diff_status": stop.get("diff"),
+            "delay_minutes": stop.get("diffMin"),
+            "estimated_arrival": arrival.get("estimated"),
+            "scheduled_arrival": arrival.get("scheduled"),
+        })
+
+    return {
+        "train_key": train_key,
+        "from": train.get("from"),
+        "to": train.get("to"),
+        "departed": bool(train.get("departed", False)),
+        "arrived": bool(train.get("arrived", False)),
+        "service_date": train.get("instance"),
+        "stops": stops,
+    }
+
+
+def build_trains(raw: dict[str, Any]) -> list[dict[str, Any]]:
+    """Return the simplified per-train list served by /api/live."""
+    return [build_train(train_key, train) for train_key, train in raw.items()]
+
+
+# ---------------------------------------------------------------------------
+# Diffs and filters
+# ---------------------------------------------------------------------------
+def diff_trains(
+    old: dict[str, dict[str, Any]], new: dict[str, dict[str, Any]]
+) -> dict[str, list]:
+    """
+    Return the changes from snapshot *old* to *new* (both keyed by train_key):
+
+    * ``added``   — full train objects that are new, or whose list of stop
+      codes changed; clients replace their copy wholesale;
+    * ``updated`` — ``{"train_key", <changed train fields>, "stops": [...]}``
+      where ``stops`` holds only the stops whose values changed (matched
+      by ``code``);
+    * ``removed`` — train_keys no longer in the feed.
+
+    All three lists are empty when nothing changed.
+    """
+    added: list[dict[str, Any]] = []
+    updated: list[dict[str, Any]] = []
+
+    for key, train in new.items():
+        before = old.get(key)
+        if before is None or [s["code"] for s in before["stops"]] != [s["code"] for s in train["stops"]]:
+            added.append(train)
+            continue
+
+        change: dict[str, Any] = {f: train[f] for f in _TRAIN_FIELDS if train[f] != before[f]}
+        stops = [s for s, b in zip(train["stops"], before["stops"]) if s != b]
+        if stops:
+            change["stops"] = stops
+        if change:
+            updated.append({"train_key": key, **change})
+
+    removed = [key for key in old if key not in new]
+    return {"added": added, "updated": updated, "removed": removed}
+
+
+def is_corridor_train(train: dict[str, Any]) -> bool:
+    """True if every stop of *train* is a Québec City–Windsor corridor station."""
+    codes = [s["code"] for s in train["stops"]]
+    return bool(codes) and all(c in CORRIDOR_STATION_CODES for c in codes)
+
+
+def train_filter(corridor_only: bool = False, train_numbers: list[str] | None = None):
+    """Return a predicate over train objects for the given subscription."""
+    numbers = set(train_numbers or ())
+
+    def matches(train: dict[str, Any]) -> bool:
+        if numbers and train["train_key"].split()[0] not in numbers:
+            return False
+        return not corridor_only or is_corridor_train(train)
+
+    return matches
+
+
+def _refresh_done(task: asyncio.Task) -> None:
+    """Done-callback of a background refresh: retrieve (and log) its exception."""
+    if task.cancelled():  # e.g. at shutdown
+        return
+    exc = task.exception()
+    if exc is not None:
+        log.warning("Background refresh of the live feed failed: %s", exc)
+
+
+class LiveFeed:
+    """In-memory snapshot of the live feed plus the task that refreshes it."""
+
+    def __init__(self, url: str = VIA_RAIL_URL, refresh_seconds: float = REFRESH_SECONDS) -> None:
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self.trains: list[dict[str, Any]] | None = None
+        self.fetched_at: datetime | None = None
+        self.last_error: str | None = None
+        self.version = 0
+        self.diffs: deque[tuple[int, dict[str, list]]] = deque(maxlen=DIFF_HISTORY)
+        self._by_key: dict[str, dict[str, Any]] = {}
+        self._updated = asyncio.Event()
+        self._fetched_monotonic = 0.0
+        self._etag: str | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+        self._poller: asyncio.Task | None = None
+
+    # -----------------------------------------------------------------------
+    # Upstream
+    # -----------------------------------------------------------------------
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=UPSTREAM_TIMEOUT)
+        return self._client
+
+    async def _fetch(self) -> None:
+        headers = {"If-None-Match": self._etag} if self._etag else {}
+        start = time.perf_counter()
+        parse_seconds = 0.0
+        async with self._http().stream("GET", self.url, headers=headers) as response:
+            if response.status_code == 304:
+                _FETCHES.labels(result="not_modified").inc()
+            else:
+                response.raise_for_status()
+                # Each train is decoded and simplified as soon as its bytes
+                # are in, while the rest of the body is still arriving.
+                parser = ObjectItems()
+                trains: list[dict[str, Any]] = []
+                async for chunk in response.aiter_bytes(STREAM_CHUNK_BYTES):
+                    parse_start = time.perf_counter()
+                    trains.extend(build_train(k, t) for k, t in parser.feed(chunk))
+                    parse_seconds += time.perf_counter() - parse_start
+                parse_start = time.perf_counter()
+                trains.extend(build_train(k, t) for k, t in parser.close())
+                parse_seconds += time.perf_counter() - parse_start
+                self._publish(trains)
+                self._etag = response.headers.get("ETag")
+                _FETCHES.labels(result="updated").inc()
+        metrics.STAGE_SECONDS.labels(component="live_feed", stage="parse").observe(parse_seconds)
+        metrics.STAGE_SECONDS.labels(component="live_feed", stage="upstream").observe(
+            time.perf_counter() - start - parse_seconds
+        )
+        self.fetched_at = datetime.now(timezone.utc)
+        self._fetched_monotonic = time.monotonic()
+        self.last_error = None
+
+    def _publish(self, trains: list[dict[str, Any]]) -> None:
+        """Install *trains* as the new snapshot if its content changed."""
+        by_key = {t["train_key"]: t for t in trains}
+        diff = diff_trains(self._by_key, by_key)
+        if self.trains is not None and not any(diff.values()):
+            return
+        self.trains, self._by_key = trains, by_key
+        self.version += 1
+        self.diffs.append((self.version, diff))
+        # Wake every waiting subscriber, then arm a fresh event.
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def refresh(self) -> None:
+        """Fetch upstream once; concurrent callers share the same fetch."""
+        if self._refresh_lock.locked():
+            async with self._refresh_lock:
+                return
+        async with self._refresh_lock:
+            try:
+                await self._fetch()
+            except (httpx.HTTPError, ValueError) as exc:
+                _FETCHES.labels(result="error").inc()
+                self.last_error = str(exc)
+                if self.trains is None:
+                    raise
+
+    # -----------------------------------------------------------------------
+    # Serving
+    # -----------------------------------------------------------------------
+    def age_seconds(self) -> float | None:
+        if self.fetched_at is None:
+            return None
+        return time.monotonic() - self._fetched_monotonic
+
+    def _revalidate_in_background(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+            # A failed background refresh is recorded in last_error; the
+            # stale snapshot keeps being served.
+            self._refresh_task.add_done_callback(_refresh_done)
+
+    async def get(self) -> dict[str, Any]:
+        """
+        Return the current snapshot with its age, fetching first only if
+        nothing has been fetched yet.  Raises httpx.HTTPError when the cache
+        is cold and upstream is unavailable.
+        """
+        if self.trains is None:
+            await self.refresh()
+            if self.trains is None:  # waited on someone else's failed fetch
+                raise httpx.HTTPError(self.last_error or "no snapshot available")
+
+        age = self.age_seconds()
+        stale = age is None or age > self.refresh_seconds
+        if stale:
+            self._revalidate_in_background()
+
+        return {
+            "version": self.version,
+            "trains": self.trains,
+            "fetched_at": self.fetched_at.isoformat().replace("+00:00", "Z") if self.fetched_at else None,
+            "age_seconds": round(age, 1) if age is not None else None,
+            "stale": stale,
+            "last_error": self.last_error,
+        }
+
+    # -----------------------------------------------------------------------
+    # Change feed
+    # -----------------------------------------------------------------------
+    async def wait_for_version(self, after: int, timeout: float) -> bool:
+        """Wait up to *timeout* s for a version newer than *after*."""
+        if self.version > after:
+            return True
+        try:
+            await asyncio.wait_for(self._updated.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def diffs_since(self, version: int) -> list[tuple[int, dict[str, list]]] | None:
+        """Return the diffs after *version* in order, or None if some are gone."""
+        pending = [(v, d) for v, d in self.diffs if v > version]
+        if not pending or pending[0][0] != version + 1:
+            return None if self.version > version else []
+        return pending
+
+    # -----------------------------------------------------------------------
+    # Background poller
+    # -----------------------------------------------------------------------
+    async def _poll_forever(self) -> None:
+        while True:
+            with contextlib.suppress(httpx.HTTPError, ValueError):
+                await self.refresh()
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self) -> None:
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll_forever())
+
+    async def stop(self) -> None:
+        for task in (self._poller, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        self._poller = self._refresh_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Module-level singleton shared by every request in this worker.
+feed = LiveFeed()
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+_FETCHES = metrics.Counter(
+    "via_live_upstream_requests_total",
+    "Upstream fetches by outcome (updated, not_modified, error).",
+    ["result"],
+    registry=metrics.REGISTRY,
+)
+
+
+@metrics.collector
+def _collect() -> Iterator[metrics.GaugeMetricFamily]:
+    age = feed.age_seconds()
+    yield metrics.GaugeMetricFamily(
+        "via_live_feed_age_seconds",
+        "Age of the live snapshot being served.",
+        value=age if age is not None else float("nan"),
+    )
+    yield metrics.GaugeMetricFamily(
+        "via_live_feed_trains", "Trains in the live snapshot.", value=len(feed.trains or [])
+    )
+    yield metrics.GaugeMetricFamily(
+        "via_live_feed_version", "Content version of the live snapshot.", value=feed.version
+    )
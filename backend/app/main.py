@@ -7,12 +7,40 @@ Start with:
 
 from __future__ import annotations
 
-from fastapi import FastAPI
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.routers import live, performance, predict, stations
+from app import arrival_model, data_loader, metrics
+from app.live_feed import feed
+from app.routers import export, live, performance, predict, stations
 
-app = FastAPI(title="Via Rail Performance API", version="0.1.0")
+
+# ---------------------------------------------------------------------------
+# Lifespan — one live-feed poller and one dataset watcher per worker process
+# ---------------------------------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Loaded once per worker; None (historical-average fallback) without a file
+    await asyncio.to_thread(arrival_model.current)
+    feed.start()
+    # The watcher's first poll loads the dataset, so the first request
+    # doesn't pay for it.
+    watcher = asyncio.create_task(data_loader.watch())
+    try:
+        yield
+    finally:
+        watcher.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await watcher
+        await feed.stop()
+
+
+app = FastAPI(title="Via Rail Performance API", version="0.1.0", lifespan=lifespan)
 
 # ---------------------------------------------------------------------------
 # CORS — allow the Vite dev server and any future production origin
@@ -25,6 +53,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ---------------------------------------------------------------------------
+# Request metrics — added last, so it is the outermost middleware and times
+# everything inside it (see app/metrics.py)
+# ---------------------------------------------------------------------------
+app.add_middleware(metrics.MetricsMiddleware)
+
 # ---------------------------------------------------------------------------
 # Routers
 # ---------------------------------------------------------------------------
@@ -32,6 +66,7 @@ app.include_router(performance.router, prefix="/api")
 app.include_router(stations.router, prefix="/api")
 app.include_router(live.router, prefix="/api")
 app.include_router(predict.router, prefix="/api")
+app.include_router(export.router, prefix="/api")
 
 
 # ---------------------------------------------------------------------------
@@ -39,4 +74,17 @@ app.include_router(predict.router, prefix="/api")
 # ---------------------------------------------------------------------------
 @app.get("/health")
 def health() -> dict:
-    return {"status": "ok"}
+    data = data_loader.loaded()
+    return {
+        "status": "ok",
+        "dataset_version": data.version if data else None,
+        "dataset_loaded_at": data.loaded_at.isoformat() if data else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Prometheus metrics
+# ---------------------------------------------------------------------------
+@app.get("/metrics", include_in_schema=False)
+def get_metrics() -> Response:
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
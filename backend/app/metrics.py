@@ -0,0 +1,193 @@
+"""
+metrics.py — Request latency and internal timings in the Prometheus text
+format, served at GET /metrics.
+
+The metrics are prometheus_client objects in this module's ``REGISTRY``,
+which also carries its ``ProcessCollector`` (CPU time, memory, open files
+and the start time, read from /proc).
+
+``MetricsMiddleware`` counts every request and records its latency per
+route template (``/api/predict/{train_key}``, not the concrete path), so
+the series stay few however many trains are asked for.  The latency is the
+time until the response headers go out: for the ordinary endpoints the
+work is done by then, and the streaming ones (/api/export,
+/api/live/stream) would otherwise report how long the client stayed
+connected.
+
+Inside a request, ``timed(component, stage)`` splits the time further —
+filtering the frame vs. computing vs. encoding the body, loading the
+dataset, waiting for upstream in the live feed — into
+``via_stage_duration_seconds``.  Values that are cheaper to read than to
+track (cache sizes, feed age, peak memory) are read when /metrics is
+scraped, by the generators registered with ``collector``, which yield
+metric families.
+
+The counters live in the worker process: with several uvicorn workers each
+answers /metrics with its own numbers, and the pid is exported as
+``via_worker_info`` so a scrape can be told apart.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import resource
+import sys
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import AbstractContextManager
+from typing import Any
+
+# Counter, Gauge and the metric families are used through this module, with
+# REGISTRY, by the rest of the app
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    ProcessCollector,
+    disable_created_metrics,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Seconds; from a cached response (~1 ms) to a cold 365-day query or a slow upstream
+DURATION_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+log = logging.getLogger(__name__)
+
+# No *_created series: every counter here starts with the worker
+disable_created_metrics()
+
+REGISTRY = CollectorRegistry()
+ProcessCollector(registry=REGISTRY)
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+class _FunctionCollector:
+    """Adapts a generator function of metric families to the collector protocol."""
+
+    def __init__(self, fn: Callable[[], Iterable[Metric]]) -> None:
+        self._fn = fn
+
+    def collect(self) -> Iterator[Metric]:
+        try:
+            yield from list(self._fn())
+        except Exception:  # a broken collector must not take /metrics down
+            log.exception("Metrics collector %s failed", self._fn.__qualname__)
+
+
+def collector(fn: Callable[[], Iterable[Metric]]) -> Callable[[], Iterable[Metric]]:
+    """Register *fn*, a generator of metric families, to run on every scrape."""
+    REGISTRY.register(_FunctionCollector(fn))
+    return fn
+
+
+def render() -> bytes:
+    """Every metric in the Prometheus text exposition format."""
+    return generate_latest(REGISTRY)
+
+
+# ---------------------------------------------------------------------------
+# Requests and stages
+# ---------------------------------------------------------------------------
+REQUESTS = Counter(
+    "via_http_requests_total",
+    "HTTP requests by route template and status.",
+    ["method", "route", "status"],
+    registry=REGISTRY,
+)
+REQUEST_SECONDS = Histogram(
+    "via_http_request_duration_seconds",
+    "Time until the response headers are sent, by route template.",
+    ["method", "route"],
+    buckets=DURATION_BUCKETS,
+    registry=REGISTRY,
+)
+STAGE_SECONDS = Histogram(
+    "via_stage_duration_seconds",
+    "Time spent in one stage of a request or background job (filter, compute, serialize, load, upstream, ...).",
+    ["component", "stage"],
+    buckets=DURATION_BUCKETS,
+    registry=REGISTRY,
+)
+
+
+def timed(component: str, stage: str) -> AbstractContextManager[Any]:
+    """Time the enclosed block into via_stage_duration_seconds."""
+    return STAGE_SECONDS.labels(component=component, stage=stage).time()
+
+
+_PATH_PARAM = re.compile(r"{(\w+)(?::\w+)?}")
+
+
+def _route_template(scope: dict[str, Any]) -> str:
+    """The path template of the route the router matched, prefix included."""
+    template = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return "unmatched"
+    # Depending on the FastAPI version, routes of an included router report
+    # their path without the router's prefix: take it from the request path.
+    params = scope.get("path_params", {})
+    rendered = _PATH_PARAM.sub(lambda m: str(params.get(m.group(1), "")), template)
+    path = scope["path"]
+    if path != rendered and path.endswith(rendered):
+        template = path[: -len(rendered)] + template
+    return template
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and timing them per route template."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_timed(message: dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                self._record(scope, status, start)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        except Exception:
+            if status == 500:  # failed before any response was started
+                self._record(scope, status, start)
+            raise
+
+    @staticmethod
+    def _record(scope: dict[str, Any], status: int, start: float) -> None:
+        path = _route_template(scope)
+        REQUEST_SECONDS.labels(method=scope["method"], route=path).observe(time.perf_counter() - start)
+        REQUESTS.labels(method=scope["method"], route=path, status=status).inc()
+
+
+# ---------------------------------------------------------------------------
+# Process (the rest comes from ProcessCollector)
+# ---------------------------------------------------------------------------
+@collector
+def _collect_process() -> Iterator[Metric]:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    yield GaugeMetricFamily(
+        "via_process_peak_resident_memory_bytes", "Peak resident memory size in bytes.", value=peak
+    )
+    worker = GaugeMetricFamily("via_worker_info", "The worker process answering this scrape.", labels=["pid"])
+    worker.add_metric([str(os.getpid())], 1)
+    yield worker
@@ -0,0 +1,114 @@
+"""
+priors.py — Historical delay priors held as a hash table.
+
+The pipeline writes clean_data/via_rail/_priors.parquet (see
+pipeline/priors.py): count, mean, median and p90 of the delay per
+(train_number, station_code, day_of_week), plus the coarser keys
+(train_number, station_code), (train_key,) and (train_number,) with the
+dropped columns null.  ``Priors`` keeps it as one dict from key tuple to ``Prior``, so a
+fallback prediction — and every step of its fallback chain — is a dict
+lookup instead of a scan of the stop-level rows.
+"""
+
+from __future__ import annotations
+
+from typing import Any, NamedTuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from pipeline.priors import PRIOR_KEYS, build_histogram, build_priors
+
+
+class Prior(NamedTuple):
+    """Delay distribution (minutes) of one key."""
+
+    count: int
+    mean: float
+    median: float
+    p90: float
+    level: tuple[str, ...]
+
+
+def _key(train_key: Any, train_number: Any, station_code: Any, day_of_week: Any) -> tuple:
+    """Key tuple in PRIOR_KEYS order, with missing values as None."""
+    def norm(value: Any) -> Any:
+        return None if value is None or pd.isna(value) else value
+
+    dow = norm(day_of_week)
+    return (
+        norm(train_key),
+        norm(train_number),
+        norm(station_code),
+        None if dow is None else int(dow),
+    )
+
+
+class Priors:
+    """(train_key, train_number, station_code, day_of_week) → Prior, with fallbacks."""
+
+    def __init__(self, table: dict[tuple, Prior]) -> None:
+        self._table = table
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> Priors:
+        """From the pipeline's priors table (PRIOR_KEYS + count/mean/median/p90)."""
+        columns = [frame[c].astype(object).to_numpy() for c in PRIOR_KEYS]
+        values = zip(
+            frame["count"].to_numpy(dtype=np.int64).tolist(),
+            frame["mean"].to_numpy(dtype=np.float64).tolist(),
+            frame["median"].to_numpy(dtype=np.float64).tolist(),
+            frame["p90"].to_numpy(dtype=np.float64).tolist(),
+        )
+        table = {}
+        for train_key, train_number, station_code, dow, (count, mean, median, p90) in zip(
+            *columns, values
+        ):
+            key = _key(train_key, train_number, station_code, dow)
+            level = tuple(name for name, value in zip(PRIOR_KEYS, key) if value is not None)
+            table[key] = Prior(count, mean, median, p90, level)
+        return cls(table)
+
+    @classmethod
+    def from_rows(cls, table: pa.Table) -> Priors:
+        """
+        Derive the priors from stop-level SCHEMA rows (no priors table on
+        disk), the way the pipeline does.
+        """
+        if table.num_rows == 0:
+            return cls({})
+        return cls.from_frame(build_priors(build_histogram(table)).to_pandas())
+
+    def get(
+        self,
+        train_number: str,
+        station_code: str | None = None,
+        day_of_week: int | None = None,
+        train_key: str | None = None,
+    ) -> Prior | None:
+        """
+        The most specific prior known for the key: (train, station, weekday),
+        then (train, station), then the run (train_key), then (train) —
+        levels whose columns are not given are skipped.  None when the train
+        number has no history.
+        """
+        train_key, train_number, station_code, day_of_week = _key(
+            train_key, train_number, station_code, day_of_week
+        )
+        if station_code is not None:
+            if day_of_week is not None:
+                prior = self._table.get((None, train_number, station_code, day_of_week))
+                if prior is not None:
+                    return prior
+            prior = self._table.get((None, train_number, station_code, None))
+            if prior is not None:
+                return prior
+        if train_key is not None:
+            prior = self._table.get((train_key, None, None, None))
+            if prior is not None:
+                return prior
+        return self._table.get((None, train_number, None, None))
@@ -0,0 +1,177 @@
+"""
+result_cache.py — Response cache for the analytics endpoints.
+
+/api/performance, /api/summary and /api/stations depend only on their
+(normalized) query parameters and the dataset version, and dashboards ask
+for the same few combinations over and over.  ``cached_json`` answers them
+from a per-worker LRU of encoded JSON bodies, bounded both in entries and
+in bytes and keyed on the parameters; the cache empties itself the first
+time it is used with a new dataset version, so a hot reload invalidates
+everything at once.
+
+Every response carries an ETag derived from the dataset version and the
+parameters — known before anything is computed — and a ``Cache-Control``
+lifetime, so browsers and CDNs revalidate with ``If-None-Match`` and get a
+bodiless 304 until the data changes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterator
+from typing import Any
+
+from fastapi import Request, Response
+
+from app import metrics
+from app.data_loader import RELOAD_INTERVAL_SECONDS, Dataset, current
+from app.serialization import dumps
+
+MAX_ENTRIES = 256
+MAX_BYTES = 16 * 1024 * 1024
+
+# New data can only appear after the next reload poll
+CACHE_CONTROL = f"public, max-age={int(RELOAD_INTERVAL_SECONDS)}"
+
+
+class ResultCache:
+    """Thread-safe LRU of encoded bodies for one dataset version."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version: str | None = None
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _sync(self, version: str | None) -> None:
+        if version != self.version:
+            self._entries.clear()
+            self.nbytes = 0
+            self.version = version
+
+    def get(self, version: str | None, key: Hashable) -> bytes | None:
+        with self._lock:
+            self._sync(version)
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, version: str | None, key: Hashable, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._sync(version)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            self._entries[key] = body
+            self.nbytes += len(body)
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "version": self.version,
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+cache = ResultCache()
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+_LOOKUPS = metrics.Counter(
+    "via_result_cache_requests_total",
+    "Cached-endpoint requests by outcome (hit, miss, not_modified).",
+    ["endpoint", "result"],
+    registry=metrics.REGISTRY,
+)
+
+
+@metrics.collector
+def _collect() -> Iterator[metrics.Metric]:
+    stats = cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    yield metrics.CounterMetricFamily("via_result_cache_hits", "Result cache hits.", value=stats["hits"])
+    yield metrics.CounterMetricFamily("via_result_cache_misses", "Result cache misses.", value=stats["misses"])
+    yield metrics.GaugeMetricFamily(
+        "via_result_cache_hit_ratio",
+        "Hits / lookups since the worker started.",
+        value=stats["hits"] / lookups if lookups else 0.0,
+    )
+    yield metrics.GaugeMetricFamily(
+        "via_result_cache_entries", "Encoded bodies held by the result cache.", value=stats["entries"]
+    )
+    yield metrics.GaugeMetricFamily(
+        "via_result_cache_bytes", "Size of the encoded bodies held by the result cache.", value=stats["bytes"]
+    )
+
+
+def etag_for(version: str | None, key: Hashable) -> str:
+    digest = hashlib.sha1(repr((version, key)).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return etag in tags or "*" in tags
+
+
+def cached_json(
+    request: Request, key: Hashable, compute: Callable[[Dataset], Any]
+) -> Response:
+    """
+    Return the JSON response for *key* — a hashable of the endpoint name and
+    its normalized parameters — computing it with ``compute(dataset)`` on
+    the current dataset only on a cache miss.  Answers 304 when the
+    client's ``If-None-Match`` already names the current ETag.
+
+    The time of a miss is recorded in two stages of the endpoint (the
+    first element of *key*): ``compute`` and ``serialize``.
+    """
+    endpoint = key[0] if isinstance(key, tuple) else key
+    data = current()
+    etag = etag_for(data.version, key)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if _not_modified(request, etag):
+        _LOOKUPS.labels(endpoint=endpoint, result="not_modified").inc()
+        return Response(status_code=304, headers=headers)
+
+    body = cache.get(data.version, key)
+    if body is None:
+        _LOOKUPS.labels(endpoint=endpoint, result="miss").inc()
+        with metrics.timed(endpoint, "compute"):
+            result = compute(data)
+        with metrics.timed(endpoint, "serialize"):
+            body = dumps(result)
+        cache.put(data.version, key, body)
+    else:
+        _LOOKUPS.labels(endpoint=endpoint, result="hit").inc()
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,132 @@
+"""
+export.py — Bulk export of the stop-level rows.
+
+GET /api/export?format=arrow|parquet&from=&to=&corridor_only=&columns=
+
+Streams the matching rows of the Parquet dataset as an Arrow IPC stream or
+a Parquet file, with chunked transfer encoding.  The date range and other
+filters are pushed down to the Parquet scan (data_loader.scanner:
+partitions outside the range are never opened, row groups are skipped on
+their statistics) and only the requested columns are read.  Rows are
+re-batched into ~EXPORT_BATCH_ROWS-row record batches / row groups and
+written out as they are scanned, so the server holds one batch at a time
+regardless of the size of the export.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from datetime import date
+from typing import Literal, Optional
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.data_loader import scanner
+
+router = APIRouter(tags=["export"])
+
+EXPORT_BATCH_ROWS = 65_536
+
+_MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are drained between batches."""
+
+    closed = False
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _rebatch(batches: Iterator[pa.RecordBatch], rows: int) -> Iterator[pa.RecordBatch]:
+    """Concatenate the (per-file, often small) scan batches to ~*rows* rows each."""
+    pending: list[pa.RecordBatch] = []
+    count = 0
+    for batch in batches:
+        if not batch.num_rows:
+            continue
+        pending.append(batch)
+        count += batch.num_rows
+        if count >= rows:
+            yield from pa.Table.from_batches(pending).combine_chunks().to_batches()
+            pending, count = [], 0
+    if pending:
+        yield from pa.Table.from_batches(pending).combine_chunks().to_batches()
+
+
+def _stream(scan: ds.Scanner, fmt: Literal["arrow", "parquet"]) -> Iterator[bytes]:
+    sink = _ChunkSink()
+    schema = scan.projected_schema
+    if fmt == "arrow":
+        writer = pa.ipc.new_stream(sink, schema)
+    else:
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for batch in _rebatch(scan.to_batches(), EXPORT_BATCH_ROWS):
+            writer.write_batch(batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+@router.get("/export")
+def export_rows(
+    format: Literal["arrow", "parquet"] = Query("arrow", description="arrow (IPC stream) | parquet"),
+    from_: Optional[date] = Query(None, alias="from", description="First EST date (inclusive)"),
+    to: Optional[date] = Query(None, description="Last EST date (inclusive)"),
+    corridor_only: bool = Query(False, description="Restrict to corridor trains"),
+    train_number: Optional[str] = Query(None, description="Filter to a specific train number"),
+    station_code: Optional[str] = Query(None, description="Filter to stops at a specific station"),
+    columns: Optional[str] = Query(None, description="Comma-separated columns (default: all)"),
+) -> StreamingResponse:
+    """
+    Stream the stop-level rows matching the filters, in the canonical
+    schema (scrape_date_est first), as an Arrow IPC stream or a Parquet file.
+    """
+    equals: dict[str, object] = {}
+    if corridor_only:
+        equals["is_corridor"] = True
+    if train_number is not None:
+        equals["train_number"] = train_number
+    if station_code is not None:
+        equals["station_code"] = station_code.upper()
+    # An empty list (e.g. columns=",") means every column, like no list at all
+    names = [c.strip() for c in (columns or "").split(",") if c.strip()] or None
+
+    try:
+        scan = scanner(
+            names, date_from=from_, date_to=to, equals=equals, batch_size=EXPORT_BATCH_ROWS
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if scan is None:
+        raise HTTPException(status_code=404, detail="No dataset has been built yet")
+
+    suffix = "arrow" if format == "arrow" else "parquet"
+    span = f"{from_ or 'start'}_{to or 'end'}"
+    return StreamingResponse(
+        _stream(scan, format),
+        media_type=_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="via_rail_{span}.{suffix}"'},
+    )
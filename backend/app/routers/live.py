@@ -1,28 +1,41 @@
 """
-live.py — Live train positions and delays (proxies the Via Rail API).
+live.py — Live train positions and delays (cached view of the Via Rail API).
 
 GET /api/live
+GET /api/live/stream   (Server-Sent Events)
+
+Responses come from the shared in-memory snapshot kept by app.live_feed,
+so client traffic never reaches tsimobile.viarail.ca directly.
 """
 
 from __future__ import annotations
 
-from typing import Any
+import json
+from collections.abc import AsyncIterator
+from typing import Any, Callable
 
 import httpx
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 
-router = APIRouter(tags=["live"])
+from app.live_feed import feed, train_filter
 
-_VIA_RAIL_URL = "https://tsimobile.viarail.ca/data/allData.json"
+router = APIRouter(tags=["live"])
 
 
 @router.get("/live")
-def get_live() -> dict[str, Any]:
+async def get_live() -> dict[str, Any]:
     """
-    Proxy the Via Rail live tracking API and return a simplified payload.
+    Return the latest cached snapshot of the Via Rail live tracking API.
+
+    The snapshot is refreshed in the background every
+    live_feed.REFRESH_SECONDS; a stale one is still served (``stale`` is
+    true) while a refresh runs.  Only the very first request after startup
+    waits for upstream, and gets a 502 if it is unreachable.
 
     Response shape:
         {
+            "version": 42,
             "trains": [
                 {
                     "train_key": "60",
@@ -44,38 +57,111 @@ def get_live() -> dict[str, Any]:
                     ]
                 },
                 ...
-            ]
+            ],
+            "fetched_at": "2025-04-01T17:40:12.345678Z",
+            "age_seconds": 12.3,
+            "stale": false,
+            "last_error": null
         }
     """
     try:
-        response = httpx.get(_VIA_RAIL_URL, timeout=10.0)
-        response.raise_for_status()
-        raw: dict = response.json()
-    except httpx.HTTPError as exc:
+        return await feed.get()
+    except (httpx.HTTPError, ValueError) as exc:
+        raise HTTPException(status_code=502, detail=f"Via Rail API error: {exc}") from exc
+
+
+# ---------------------------------------------------------------------------
+# Server-Sent Events
+# ---------------------------------------------------------------------------
+_KEEPALIVE_SECONDS = 15.0
+
+
+def _sse(event: str, version: int, data: dict[str, Any]) -> str:
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {version}\nevent: {event}\ndata: {body}\n\n"
+
+
+def _filter_diff(
+    diff: dict[str, list], visible: set[str], matches: Callable[[dict[str, Any]], bool]
+) -> dict[str, list]:
+    """Restrict *diff* to one subscriber; updates *visible* in place."""
+    added, removed = [], []
+    for train in diff["added"]:
+        key = train["train_key"]
+        if matches(train):
+            added.append(train)
+            visible.add(key)
+        elif key in visible:  # re-routed out of the subscription
+            removed.append(key)
+            visible.discard(key)
+    updated = [u for u in diff["updated"] if u["train_key"] in visible]
+    for key in diff["removed"]:
+        if key in visible:
+            removed.append(key)
+            visible.discard(key)
+    return {"added": added, "updated": updated, "removed": removed}
+
+
+async def _event_stream(
+    request: Request, matches: Callable[[dict[str, Any]], bool]
+) -> AsyncIterator[str]:
+    version = -1
+    visible: set[str] = set()
+
+    while not await request.is_disconnected():
+        diffs = feed.diffs_since(version) if version >= 0 else None
+        if diffs is None:
+            trains = [t for t in feed.trains or [] if matches(t)]
+            visible = {t["train_key"] for t in trains}
+            version = feed.version
+            yield _sse("snapshot", version, {"version": version, "trains": trains})
+        else:
+            for v, diff in diffs:
+                version = v
+                change = _filter_diff(diff, visible, matches)
+                if any(change.values()):
+                    yield _sse("diff", v, {"version": v, **change})
+
+        if not await feed.wait_for_version(version, _KEEPALIVE_SECONDS):
+            yield ": keepalive\n\n"
+
+
+@router.get("/live/stream")
+async def stream_live(
+    request: Request,
+    corridor_only: bool = Query(False, description="Only trains that run entirely in the corridor"),
+    train_number: list[str] | None = Query(None, description="Restrict to these train numbers"),
+) -> StreamingResponse:
+    """
+    Stream live updates as Server-Sent Events.
+
+    The first event is ``snapshot`` (same train objects as GET /api/live,
+    filtered to the subscription).  After that, each time the shared feed
+    changes, a ``diff`` event carries only what changed for the subscribed
+    trains:
+
+        event: diff
+        data: {"version": 43,
+               "added":   [<full train>, ...],
+               "updated": [{"train_key": "60", "stops": [<changed stop>, ...]}, ...],
+               "removed": ["61 (04-01)"]}
+
+        * ``added`` replaces the client's copy of a train wholesale;
+        * ``updated`` lists only changed train fields and changed stops
+          (matched by ``code``);
+        * ``removed`` trains should be dropped.
+
+    Every event's ``id`` is the feed version.  Diffs are computed once per
+    upstream change and shared by all subscribers; a comment line is sent
+    every 15 s when nothing changed to keep proxies from closing the stream.
+    """
+    try:
+        await feed.get()
+    except (httpx.HTTPError, ValueError) as exc:
         raise HTTPException(status_code=502, detail=f"Via Rail API error: {exc}") from exc
 
-    trains = []
-    for train_key, train in raw.items():
-        stops = []
-        for stop in train.get("times", []):
-            arrival = stop.get("arrival") or {}
-            stops.append({
-                "station": stop.get("station"),
-                "code": stop.get("code"),
-                "diff_status": stop.get("diff"),
-                "delay_minutes": stop.get("diffMin"),
-                "estimated_arrival": arrival.get("estimated"),
-                "scheduled_arrival": arrival.get("scheduled"),
-            })
-
-        trains.append({
-            "train_key": train_key,
-            "from": train.get("from"),
-            "to": train.get("to"),
-            "departed": bool(train.get("departed", False)),
-            "arrived": bool(train.get("arrived", False)),
-            "service_date": train.get("instance"),
-            "stops": stops,
-        })
-
-    return {"trains": trains}
+    return StreamingResponse(
+        _event_stream(request, train_filter(corridor_only, train_number)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -3,16 +3,32 @@ performance.py — Timeseries performance and aggregate summary endpoints.
 
 GET /api/performance   — daily on-time / late counts (optionally filtered)
 GET /api/summary       — aggregate stats for a rolling period
+
+Both endpoints answer from the daily rollup cube (Dataset.select_rollup)
+rather than the stop-level rows, so their cost grows with the number of
+days × filtered dimensions, not with the number of stops.  Responses are
+cached per normalized parameters and dataset version (app/result_cache.py)
+and built a column at a time (app/serialization.py).
+
+``late_threshold=N`` adds the share of stops at least N minutes late: read
+from the cube for the thresholds it holds (LATE_THRESHOLDS), otherwise
+counted from delay_minutes on the indexed stop-level rows
+(Dataset.count_late), so a new definition needs no re-ingest.
 """
 
 from __future__ import annotations
 
+from functools import partial
 from typing import Any, Literal, Optional
 
 import pandas as pd
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request, Response
 
-from app.data_loader import get_df
+from app import metrics
+from app.data_loader import ROLLUP_MEASURES, Dataset
+from app.result_cache import cached_json
+from app.serialization import Shape, round_values, shaped
+from pipeline.lateness import LATE_THRESHOLDS
 
 router = APIRouter(tags=["performance"])
 
@@ -24,66 +40,81 @@ router = APIRouter(tags=["performance"])
 _PERIOD_DAYS: dict[str, int] = {"7d": 7, "30d": 30, "365d": 365}
 
 
-def _filter_by_period(df: pd.DataFrame, period: str) -> pd.DataFrame:
-    """Return rows within the rolling *period* window."""
-    if df.empty or "scrape_date_est" not in df.columns:
-        return df
-    days = _PERIOD_DAYS.get(period, 30)
-    cutoff = df["scrape_date_est"].max() - pd.Timedelta(days=days - 1)
-    return df[df["scrape_date_est"] >= cutoff]
-
-
-def _apply_common_filters(
-    df: pd.DataFrame,
+def _common_filters(
     *,
-    period: str,
     corridor_only: bool,
     train_number: Optional[str],
     station_code: Optional[str],
     origin: Optional[str],
     destination: Optional[str],
-) -> pd.DataFrame:
-    """Apply the standard set of query-parameter filters to *df*."""
-    df = _filter_by_period(df, period)
-
+) -> dict[str, Any]:
+    """
+    Return the rollup-dimension filters for the standard query parameters,
+    normalized (codes and cities upper-cased) so equivalent requests share
+    one cache entry.
+    """
+    filters: dict[str, Any] = {}
     if corridor_only:
-        df = df[df["is_corridor"].fillna(False)]
-
+        filters["is_corridor"] = True
     if train_number is not None:
-        df = df[df["train_number"] == train_number]
-
+        filters["train_number"] = train_number
     if station_code is not None:
-        df = df[df["station_code"] == station_code.upper()]
-
+        filters["station_code"] = station_code.upper()
     if origin is not None:
-        df = df[df["origin"].str.upper() == origin.upper()]
-
+        filters["origin"] = origin.upper()
     if destination is not None:
-        df = df[df["destination"].str.upper() == destination.upper()]
+        filters["destination"] = destination.upper()
+    return filters
+
+
+def _select(data: Dataset, period: str, filters: dict[str, Any]) -> pd.DataFrame:
+    """
+    Return the rows of the rollup cube matching *filters* within *period*,
+    taken from the smallest rollup level covering them and looked up
+    through that level's indexes.
+    """
+    return data.select_rollup(filters, _PERIOD_DAYS.get(period, 30))
+
 
-    return df
+def _cache_key(
+    endpoint: str, period: str, filters: dict[str, Any], late_threshold: Optional[int]
+) -> tuple:
+    return (endpoint, period, tuple(sorted(filters.items())), late_threshold)
 
 
-def _safe_mean(series: pd.Series) -> float | None:
-    """Return the mean of a boolean/numeric series, or None if empty."""
-    if series.empty:
-        return None
-    return float(series.mean())
+def _late_counts(
+    data: Dataset, endpoint: str, cube: pd.DataFrame, period: str, filters: dict[str, Any], threshold: int
+) -> pd.Series:
+    """Stops at least *threshold* minutes late per scrape_date_est."""
+    if threshold in LATE_THRESHOLDS:
+        return cube.groupby("scrape_date_est", observed=True, sort=True)[f"late_{threshold}"].sum()
+    with metrics.timed(endpoint, "late_threshold"):
+        return data.count_late(filters, threshold, _PERIOD_DAYS.get(period, 30))
+
+
+def _pct(count: Any, total: Any) -> Any:
+    """Percentage rounded to 1 decimal — scalars or whole columns."""
+    return round_values(count / total * 100, 1)
 
 
 # ---------------------------------------------------------------------------
 # GET /api/performance
 # ---------------------------------------------------------------------------
 
-@router.get("/performance")
+@router.get("/performance", response_model=list[dict[str, Any]])
 def get_performance(
+    request: Request,
     period: Literal["7d", "30d", "365d"] = Query("30d", description="Rolling window: 7d | 30d | 365d"),
     corridor_only: bool = Query(False, description="Restrict to corridor trains"),
     train_number: Optional[str] = Query(None, description="Filter to a specific train number"),
     station_code: Optional[str] = Query(None, description="Filter to stops at a specific station"),
     origin: Optional[str] = Query(None, description="Filter by origin city"),
     destination: Optional[str] = Query(None, description="Filter by destination city"),
-) -> list[dict[str, Any]]:
+    late_threshold: Optional[int] = Query(
+        None, ge=0, description="Also return late_pct: the percentage of stops at least this many minutes late"
+    ),
+    shape: Shape = Query("records", description="records: list of objects | columns: one array per field"),
+) -> Response:
     """
     Return a daily timeseries of on-time percentage and average delay.
 
@@ -96,72 +127,78 @@ def get_performance(
             "late_60_pct": 3.1,            # percentage of stops >= 60 min late
             "total_stops": 142             # number of stop records that day
         }
-    """
-    df = get_df()
 
-    if df.empty:
-        return []
+    With ``late_threshold=N`` each element also has ``"late_pct"``, the
+    percentage of stops >= N min late.
 
-    df = _apply_common_filters(
-        df,
-        period=period,
+    With ``shape=columns`` the same fields come as parallel arrays:
+    ``{"date": [...], "on_time_pct": [...], ...}``.
+    """
+    filters = _common_filters(
         corridor_only=corridor_only,
         train_number=train_number,
         station_code=station_code,
         origin=origin,
         destination=destination,
     )
+    return cached_json(
+        request,
+        (*_cache_key("performance", period, filters, late_threshold), shape),
+        partial(_performance, period=period, filters=filters, late_threshold=late_threshold, shape=shape),
+    )
 
-    if df.empty:
-        return []
-
-    # Work only with rows that have delay data
-    df_delay = df.dropna(subset=["delay_minutes", "is_on_time"])
-
-    if df_delay.empty:
-        return []
 
-    grouped = (
-        df_delay
-        .groupby("scrape_date_est")
-        .agg(
-            on_time_pct=("is_on_time", "mean"),
-            avg_delay_minutes=("delay_minutes", "mean"),
-            late_15_pct=("is_late_15", "mean"),
-            late_60_pct=("is_late_60", "mean"),
-            total_stops=("delay_minutes", "count"),
+def _performance(
+    data: Dataset,
+    *,
+    period: str,
+    filters: dict[str, Any],
+    late_threshold: Optional[int],
+    shape: Shape,
+) -> list[dict[str, Any]] | dict[str, Any]:
+    with metrics.timed("performance", "filter"):
+        cube = _select(data, period, filters)
+
+    daily = cube.groupby("scrape_date_est", observed=True, sort=True)[list(ROLLUP_MEASURES)].sum()
+
+    # Only days with delay data
+    daily = daily[daily["delay_stops"] > 0]
+
+    n = daily["delay_stops"]
+    result = pd.DataFrame({
+        "date": daily.index.strftime("%Y-%m-%d"),
+        "on_time_pct": _pct(daily["on_time"], n),
+        "avg_delay_minutes": round_values(daily["delay_sum"] / n, 2),
+        **{f"late_{t}_pct": _pct(daily[f"late_{t}"], n) for t in LATE_THRESHOLDS},
+        "total_stops": n,
+    })
+    if late_threshold is not None:
+        late = _late_counts(data, "performance", cube, period, filters, late_threshold)
+        result.insert(
+            len(result.columns) - 1, "late_pct", _pct(late.reindex(daily.index, fill_value=0), n)
         )
-        .reset_index()
-        .sort_values("scrape_date_est")
-    )
-
-    result = []
-    for _, row in grouped.iterrows():
-        result.append({
-            "date": str(row["scrape_date_est"]),
-            "on_time_pct": round(float(row["on_time_pct"]) * 100, 1),
-            "avg_delay_minutes": round(float(row["avg_delay_minutes"]), 2),
-            "late_15_pct": round(float(row["late_15_pct"]) * 100, 1),
-            "late_60_pct": round(float(row["late_60_pct"]) * 100, 1),
-            "total_stops": int(row["total_stops"]),
-        })
+    result = result.reset_index(drop=True)
 
-    return result
+    return shaped(result, shape)
 
 
 # ---------------------------------------------------------------------------
 # GET /api/summary
 # ---------------------------------------------------------------------------
 
-@router.get("/summary")
+@router.get("/summary", response_model=dict[str, Any])
 def get_summary(
+    request: Request,
     period: Literal["7d", "30d", "365d"] = Query("30d", description="Rolling window: 7d | 30d | 365d"),
     corridor_only: bool = Query(False, description="Restrict to corridor trains"),
     train_number: Optional[str] = Query(None, description="Filter to a specific train number"),
     station_code: Optional[str] = Query(None, description="Filter to stops at a specific station"),
     origin: Optional[str] = Query(None, description="Filter by origin city"),
     destination: Optional[str] = Query(None, description="Filter by destination city"),
-) -> dict[str, Any]:
+    late_threshold: Optional[int] = Query(
+        None, ge=0, description="Also return late_pct: the percentage of stops at least this many minutes late"
+    ),
+) -> Response:
     """
     Return aggregate performance stats for the requested rolling period.
 
@@ -173,41 +210,42 @@ def get_summary(
             "late_60_pct": 4.0,
             "avg_delay_minutes": 9.1
         }
-    """
-    df = get_df()
-
-    if df.empty:
-        return {
-            "period": period,
-            "total_stops": 0,
-            "on_time_pct": None,
-            "late_15_pct": None,
-            "late_60_pct": None,
-            "avg_delay_minutes": None,
-        }
 
-    df = _apply_common_filters(
-        df,
-        period=period,
+    With ``late_threshold=N`` it also has ``"late_threshold": N`` and
+    ``"late_pct"``, the percentage of stops >= N min late.
+    """
+    filters = _common_filters(
         corridor_only=corridor_only,
         train_number=train_number,
         station_code=station_code,
         origin=origin,
         destination=destination,
     )
+    return cached_json(
+        request,
+        _cache_key("summary", period, filters, late_threshold),
+        partial(_summary, period=period, filters=filters, late_threshold=late_threshold),
+    )
 
-    df_delay = df.dropna(subset=["delay_minutes"])
 
-    on_time_mean = _safe_mean(df_delay["is_on_time"].dropna())
-    late_15_mean = _safe_mean(df_delay["is_late_15"].dropna())
-    late_60_mean = _safe_mean(df_delay["is_late_60"].dropna())
-    avg_delay_mean = _safe_mean(df_delay["delay_minutes"])
+def _summary(
+    data: Dataset, *, period: str, filters: dict[str, Any], late_threshold: Optional[int]
+) -> dict[str, Any]:
+    with metrics.timed("summary", "filter"):
+        cube = _select(data, period, filters)
+
+    totals = cube[list(ROLLUP_MEASURES)].sum()
+    n = int(totals["delay_stops"])
 
-    return {
+    summary = {
         "period": period,
-        "total_stops": int(len(df_delay)),
-        "on_time_pct": round(on_time_mean * 100, 1) if on_time_mean is not None else None,
-        "late_15_pct": round(late_15_mean * 100, 1) if late_15_mean is not None else None,
-        "late_60_pct": round(late_60_mean * 100, 1) if late_60_mean is not None else None,
-        "avg_delay_minutes": round(avg_delay_mean, 2) if avg_delay_mean is not None else None,
+        "total_stops": n,
+        "on_time_pct": _pct(totals["on_time"], n) if n else None,
+        **{f"late_{t}_pct": _pct(totals[f"late_{t}"], n) if n else None for t in LATE_THRESHOLDS},
+        "avg_delay_minutes": round_values(totals["delay_sum"] / n, 2) if n else None,
     }
+    if late_threshold is not None:
+        late = _late_counts(data, "summary", cube, period, filters, late_threshold).sum()
+        summary["late_threshold"] = late_threshold
+        summary["late_pct"] = _pct(late, n) if n else None
+    return summary
@@ -1,41 +1,213 @@
 """
-predict.py — Predicted arrival delay for a given train.
+predict.py — Predicted arrival delays.
 
-GET /api/predict/{train_key}
+GET /api/predict/live         — every stop of every live train, one batch
+GET /api/predict/{train_key}  — every stop of one train
+
+Predictions come from the gradient-boosted model in app/arrival_model.py
+(trained by train_model.py, loaded once per worker).  Each request scores
+all the stops it needs in a single vectorized ``predict`` call.  Without a
+model file both endpoints fall back to the historical delay priors
+(app/priors.py): one dict lookup per stop, along the chain
+(train, station, weekday) → (train, station) → (run) → (train).
 """
 
 from __future__ import annotations
 
 from typing import Any
 
-from fastapi import APIRouter, HTTPException
+import httpx
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, HTTPException, Query
 
-from app.data_loader import get_df
+from app import arrival_model, metrics
+from app.data_loader import Dataset, current
+from app.live_feed import feed, train_filter
+from app.priors import Prior, Priors
+from app.serialization import round_values
 
 router = APIRouter(tags=["predict"])
 
+_RUN_COLUMNS = ["scrape_date_est", "service_date", "stop_sequence", "station_code", "station_name"]
+
+
+def _note(model: arrival_model.ArrivalModel, source: str) -> str:
+    return f"gradient-boosted model trained {model.meta.get('trained_at', '?')} ({source})"
+
+
+def _predicted_stops(frame: pd.DataFrame, predicted: np.ndarray) -> list[dict[str, Any]]:
+    rounded = round_values(predicted, 2)
+    return [
+        {
+            "code": code,
+            "stop_sequence": int(seq),
+            "observed": bool(observed),
+            "predicted_delay_minutes": None if np.isnan(value) else float(value),
+        }
+        for code, seq, observed, value in zip(
+            frame["station_code"], frame["stop_sequence"], frame["observed"], rounded
+        )
+    ]
+
+
+def _stop_priors(priors: Priors, frame: pd.DataFrame) -> tuple[list[Prior | None], np.ndarray]:
+    """The prior of every stop of *frame* (FEATURES columns) and its mean delay."""
+    found = [
+        priors.get(train_number, station_code, day_of_week, train_key)
+        for train_key, train_number, station_code, day_of_week in zip(
+            frame["train_key"], frame["train_number"], frame["station_code"], frame["day_of_week"]
+        )
+    ]
+    means = np.array([np.nan if p is None else p.mean for p in found], dtype=np.float64)
+    return found, means
+
+
+def _prior_prediction(train_key: str, prior: Prior) -> dict[str, Any]:
+    basis = f" by {', '.join(prior.level)}" if "station_code" in prior.level else ""
+    return {
+        "train_key": train_key,
+        "predicted_delay_minutes": round(prior.mean, 2),
+        "median_delay_minutes": round(prior.median, 2),
+        "p90_delay_minutes": round(prior.p90, 2),
+        "samples": prior.count,
+        "confidence": "low",
+        "note": f"historical average{basis} — no ML model loaded",
+    }
+
+
+def _history_frame(data: Dataset, train_key: str) -> pd.DataFrame | None:
+    """
+    FEATURES for the stops of the latest recorded run of *train_key* (or of
+    its train number), with no upstream observation, on the weekday of the
+    run's service date.
+    """
+    train_number = train_key.split()[0]
+    runs = data.select({"train_key": train_key}, columns=_RUN_COLUMNS)
+    if runs.empty:
+        runs = data.select({"train_number": train_number}, columns=_RUN_COLUMNS)
+    if runs.empty:
+        return None
+    latest = runs[runs["scrape_date_est"] == runs["scrape_date_est"].max()]
+    latest = latest[latest["service_date"] == latest["service_date"].max()]
+    latest = latest.sort_values("stop_sequence")
+    return pd.DataFrame({
+        "train_key": train_key,
+        "train_number": train_number,
+        "station_code": latest["station_code"].astype(str).to_numpy(),
+        "stop_sequence": latest["stop_sequence"].to_numpy(dtype=np.float64, na_value=np.nan),
+        "day_of_week": float(arrival_model.service_date_of(train_key).weekday()),
+        "upstream_delay": np.nan,
+        "stops_since_upstream": 0.0,
+        "observed": False,
+    })
+
+
+# ---------------------------------------------------------------------------
+# GET /api/predict/live
+# ---------------------------------------------------------------------------
+
+@router.get("/predict/live")
+async def predict_live(
+    corridor_only: bool = Query(False, description="Only trains whose stops are all in the corridor"),
+) -> dict[str, Any]:
+    """
+    Predict the arrival delay at every stop of every train in the live
+    snapshot, in one batched model call (without a model: the historical
+    priors of each stop, null where the train has no history).
+
+        {
+            "version": 42,                 # live snapshot version
+            "fetched_at": "...",
+            "trains": [
+                {
+                    "train_key": "60",
+                    "stops": [
+                        {"code": "KGON", "stop_sequence": 3, "observed": false,
+                         "predicted_delay_minutes": 14.2},
+                        ...
+                    ]
+                },
+                ...
+            ]
+        }
+    """
+    try:
+        snapshot = await feed.get()
+    except (httpx.HTTPError, ValueError) as exc:
+        raise HTTPException(status_code=502, detail=f"Via Rail API error: {exc}") from exc
+
+    trains = [t for t in snapshot["trains"] if train_filter(corridor_only)(t)]
+    with metrics.timed("predict_live", "features"):
+        frame = arrival_model.live_stop_frame(trains)
+    model = arrival_model.current()
+    if model is not None:
+        with metrics.timed("predict_live", "model"):
+            predicted = model.predict(frame)
+    else:
+        with metrics.timed("predict_live", "priors"):
+            _, predicted = _stop_priors(current().priors, frame)
+
+    result = [
+        {"train_key": key, "stops": _predicted_stops(frame.iloc[rows], predicted[rows])}
+        for key, rows in frame.groupby("train_key", sort=False).indices.items()
+    ]
+    return {"version": snapshot["version"], "fetched_at": snapshot["fetched_at"], "trains": result}
+
+
+# ---------------------------------------------------------------------------
+# GET /api/predict/{train_key}
+# ---------------------------------------------------------------------------
 
 @router.get("/predict/{train_key}")
 def get_prediction(train_key: str) -> dict[str, Any]:
     """
-    Return a simple historical-average–based arrival delay prediction for the
-    requested train key.
+    Return the predicted arrival delay of *train_key* at its final stop,
+    plus every stop along the way (``stops``).
 
-    When a trained ML model is available at ``models/arrival_model.joblib``
-    this stub should be replaced with real inference.  Until then it returns
-    the mean historical delay for the train (or a global mean as fallback).
+    The train's stops and its latest observed delay come from the live
+    snapshot when the train is running; otherwise from its most recent
+    recorded run, without an upstream delay.  Without a trained model the
+    historical priors are returned instead: at the final stop of the live
+    run (with ``stops``), else over every stop of the run — or of the train
+    number when the run key has no history.
 
     Response shape:
         {
             "train_key": "60",
-            "predicted_delay_minutes": 8.2,
-            "confidence": "low",
-            "note": "historical average — no ML model loaded"
+            "predicted_delay_minutes": 8.2,    # at the final stop
+            "confidence": "medium",            # medium: upstream delay known
+            "note": "gradient-boosted model trained 2025-04-01T05:00:00+00:00 (live)",
+            "stops": [
+                {"code": "TRTO", "stop_sequence": 0, "observed": true,
+                 "predicted_delay_minutes": 0.4},
+                ...
+            ]
         }
     """
-    df = get_df()
-
-    if df.empty:
+    data = current()
+    live = [t for t in feed.trains or [] if t["train_key"] == train_key]
+
+    model = arrival_model.current()
+    if model is not None:
+        with metrics.timed("predict", "features"):
+            if live:
+                frame, source = arrival_model.live_stop_frame(live), "live"
+            else:
+                frame, source = _history_frame(data, train_key), "history"
+        if frame is not None and not frame.empty:
+            with metrics.timed("predict", "model"):
+                predicted = model.predict(frame)
+            upstream_known = bool(frame["stops_since_upstream"].iat[-1] > 0)
+            return {
+                "train_key": train_key,
+                "predicted_delay_minutes": round_values(predicted[-1], 2),
+                "confidence": "medium" if upstream_known else "low",
+                "note": _note(model, source),
+                "stops": _predicted_stops(frame, predicted),
+            }
+
+    if data.df.empty:
         return {
             "train_key": train_key,
             "predicted_delay_minutes": None,
@@ -43,25 +215,16 @@ def get_prediction(train_key: str) -> dict[str, Any]:
             "note": "no data available",
         }
 
-    train_df = df[df["train_key"] == train_key].dropna(subset=["delay_minutes"])
-
-    if train_df.empty:
-        # Try matching on train_number instead (e.g. "60" matches "60 (03-28)")
-        train_number = train_key.split()[0]
-        train_df = df[df["train_number"] == train_number].dropna(
-            subset=["delay_minutes"]
-        )
+    if live:
+        frame = arrival_model.live_stop_frame(live)
+        found, means = _stop_priors(data.priors, frame)
+        if found and found[-1] is not None:
+            return {**_prior_prediction(train_key, found[-1]), "stops": _predicted_stops(frame, means)}
 
-    if train_df.empty:
+    # e.g. "2 (03-28)" → that run, else every run of train 2
+    prior = data.priors.get(train_key.split()[0], train_key=train_key)
+    if prior is None:
         raise HTTPException(
             status_code=404, detail=f"No historical data found for train '{train_key}'"
         )
-
-    predicted = round(float(train_df["delay_minutes"].mean()), 2)
-
-    return {
-        "train_key": train_key,
-        "predicted_delay_minutes": predicted,
-        "confidence": "low",
-        "note": "historical average — no ML model loaded",
-    }
+    return _prior_prediction(train_key, prior)
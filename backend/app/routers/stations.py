@@ -2,23 +2,48 @@
 stations.py — Station list with average delay statistics.
 
 GET /api/stations
+
+On-time (and, with ``late_threshold``, late) shares are computed from
+delay_minutes with vectorized comparisons; no per-stop flag is stored.
+Responses are cached per parameters and dataset version (app/result_cache.py)
+and built a column at a time (app/serialization.py).
 """
 
 from __future__ import annotations
 
-from typing import Any
+from typing import Any, Optional
 
-from fastapi import APIRouter, Query
+import pandas as pd
+from fastapi import APIRouter, Query, Request, Response
 
-from app.data_loader import get_df
+from app import metrics
+from app.data_loader import Dataset
+from app.result_cache import cached_json
+from app.serialization import Shape, round_values, shaped
+from pipeline.lateness import ON_TIME_MAX_MINUTES
 
 router = APIRouter(tags=["stations"])
 
+_COLUMNS = ["station_code", "station_name", "is_corridor", "delay_minutes"]
+_OUTPUT_COLUMNS = [
+    "station_code",
+    "station_name",
+    "is_corridor",
+    "avg_delay_minutes",
+    "on_time_pct",
+    "total_stops",
+]
+
 
-@router.get("/stations")
+@router.get("/stations", response_model=list[dict[str, Any]])
 def get_stations(
+    request: Request,
     corridor_only: bool = Query(False, description="Restrict to corridor stations"),
-) -> list[dict[str, Any]]:
+    late_threshold: Optional[int] = Query(
+        None, ge=0, description="Also return late_pct: the percentage of stops at least this many minutes late"
+    ),
+    shape: Shape = Query("records", description="records: list of objects | columns: one array per field"),
+) -> Response:
     """
     Return a list of stations with aggregate delay statistics.
 
@@ -31,44 +56,65 @@ def get_stations(
             "on_time_pct": 61.0,
             "total_stops": 320
         }
+
+    With ``late_threshold=N`` each element also has ``"late_pct"``, the
+    percentage of stops >= N min late.  With ``shape=columns`` the same
+    fields come as parallel arrays.
     """
-    df = get_df()
+    return cached_json(
+        request,
+        ("stations", corridor_only, late_threshold, shape),
+        lambda data: shaped(_stations(data, corridor_only, late_threshold), shape),
+    )
 
-    if df.empty:
-        return []
 
-    if corridor_only:
-        df = df[df["is_corridor"].fillna(False)]
+def _stations(data: Dataset, corridor_only: bool, late_threshold: Optional[int] = None) -> pd.DataFrame:
+    output_columns = list(_OUTPUT_COLUMNS)
+    if late_threshold is not None:
+        output_columns.insert(-1, "late_pct")
+    if data.df.empty:
+        return pd.DataFrame(columns=output_columns)
+
+    with metrics.timed("stations", "filter"):
+        if corridor_only:
+            df = data.select({"is_corridor": True}, columns=_COLUMNS)
+        else:
+            df = data.df[_COLUMNS]
 
     if df.empty:
-        return []
+        return pd.DataFrame(columns=output_columns)
 
     df_delay = df.dropna(subset=["delay_minutes"])
 
     if df_delay.empty:
-        return []
+        return pd.DataFrame(columns=output_columns)
+
+    minutes = df_delay["delay_minutes"].to_numpy(dtype="float64")
+    rates = {"on_time_rate": minutes <= ON_TIME_MAX_MINUTES}
+    if late_threshold is not None:
+        rates["late_rate"] = minutes >= late_threshold
 
     grouped = (
         df_delay
-        .groupby(["station_code", "station_name", "is_corridor"])
+        .assign(**rates)
+        .groupby(["station_code", "station_name", "is_corridor"], observed=True)
         .agg(
             avg_delay_minutes=("delay_minutes", "mean"),
-            on_time_rate=("is_on_time", "mean"),
+            **{rate: (rate, "mean") for rate in rates},
             total_stops=("delay_minutes", "count"),
         )
         .reset_index()
         .sort_values("station_name")
     )
 
-    result = []
-    for _, row in grouped.iterrows():
-        result.append({
-            "station_code": str(row["station_code"]),
-            "station_name": str(row["station_name"]),
-            "is_corridor": bool(row["is_corridor"]),
-            "avg_delay_minutes": round(float(row["avg_delay_minutes"]), 2),
-            "on_time_pct": round(float(row["on_time_rate"]) * 100, 1),
-            "total_stops": int(row["total_stops"]),
-        })
-
+    result = pd.DataFrame({
+        "station_code": grouped["station_code"].astype(str),
+        "station_name": grouped["station_name"].astype(str),
+        "is_corridor": grouped["is_corridor"].astype(bool),
+        "avg_delay_minutes": round_values(grouped["avg_delay_minutes"].astype(float), 2),
+        "on_time_pct": round_values(grouped["on_time_rate"].astype(float) * 100, 1),
+        "total_stops": grouped["total_stops"].astype("int64"),
+    })
+    if late_threshold is not None:
+        result.insert(len(result.columns) - 1, "late_pct", round_values(grouped["late_rate"] * 100, 1))
     return result
@@ -0,0 +1,72 @@
+"""
+serialization.py — Column-at-a-time response building and JSON encoding.
+
+Routers build their output as one DataFrame of final values — rounded and
+converted a whole column at a time — and hand it to ``to_records`` (the
+default list-of-objects shape) or ``to_columns`` (``{"date": [...],
+"on_time_pct": [...]}``, selected with ``?shape=columns``).  ``dumps``
+encodes with orjson, which writes numpy arrays and scalars natively, so
+numeric columns of the columnar shape never become Python objects.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Literal
+
+import numpy as np
+import orjson
+import pandas as pd
+
+Shape = Literal["records", "columns"]
+
+_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+
+def round_values(values: Any, decimals: int) -> Any:
+    """
+    Round an array (or scalar) to *decimals* like Python's ``round`` does.
+
+    ``np.round`` scales by 10**decimals first, which can push a value just
+    below a half over it (347.775 → 347.78); the few values that land near
+    a half after scaling are re-rounded one by one with ``round``.
+    """
+    if np.ndim(values) == 0:
+        return round(float(values), decimals)
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, decimals)
+    scaled = values * 10.0**decimals
+    near_half = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    if near_half.any():
+        rounded[near_half] = [round(v, decimals) for v in values[near_half].tolist()]
+    return rounded
+
+
+def _column(values: pd.Series) -> np.ndarray | list[Any]:
+    """A column as a numpy array orjson can write directly, else a list."""
+    if values.dtype.kind in "biuf" and not isinstance(values.dtype, pd.api.extensions.ExtensionDtype):
+        return np.ascontiguousarray(values.to_numpy())
+    # Strings, categoricals, nullable dtypes: NA becomes None
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+def to_columns(frame: pd.DataFrame) -> dict[str, np.ndarray | list[Any]]:
+    """``{column: values}`` for every column of *frame*."""
+    return {name: _column(frame[name]) for name in frame.columns}
+
+
+def to_records(frame: pd.DataFrame) -> list[dict[str, Any]]:
+    """One ``{column: value}`` object per row of *frame*."""
+    names = list(frame.columns)
+    columns = [_column(frame[name]) for name in names]
+    columns = [c.tolist() if isinstance(c, np.ndarray) else c for c in columns]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def shaped(frame: pd.DataFrame, shape: Shape) -> list[dict[str, Any]] | dict[str, Any]:
+    """*frame* in the requested response *shape*."""
+    return to_columns(frame) if shape == "columns" else to_records(frame)
+
+
+def dumps(content: Any) -> bytes:
+    """Encode *content* as compact UTF-8 JSON (NaN becomes null)."""
+    return orjson.dumps(content, option=_OPTIONS)
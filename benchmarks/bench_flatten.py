@@ -0,0 +1,159 @@
+"""
+bench_flatten.py — Micro-benchmark: columnar flattener vs. the legacy
+per-stop dict path.
+
+The legacy path (one 21-key dict per stop, ``datetime.fromisoformat`` per
+timestamp, then ``pd.DataFrame`` + ``pd.to_datetime``) is reproduced below
+verbatim so the comparison stays meaningful after it was removed from the
+pipeline.  JSON decoding is done once up front and excluded from both
+timings.
+
+Usage:
+    python benchmarks/bench_flatten.py [--files 50] [--repeat 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from pipeline.flatten import flatten_data  # noqa: E402
+from pipeline.schema import CORRIDOR_STATION_CODES, EST, SCHEMA, UTC  # noqa: E402
+
+RAW_DIR = REPO_ROOT / "raw_data"
+
+
+# ---------------------------------------------------------------------------
+# Legacy dict path (reference implementation)
+# ---------------------------------------------------------------------------
+def _parse_dt(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return dt.astimezone(UTC)
+    except ValueError:
+        return None
+
+
+def legacy_flatten(data: dict, scrape_date_est: date) -> pa.Table:
+    rows: list[dict] = []
+    for train_key, train in data.items():
+        train_number = train_key.split()[0]
+        try:
+            service_date = date.fromisoformat(train.get("instance", ""))
+        except ValueError:
+            service_date = None
+        origin = train.get("from", "")
+        destination = train.get("to", "")
+        departed = bool(train.get("departed", False))
+        arrived = bool(train.get("arrived", False))
+        for seq, stop in enumerate(train.get("times", [])):
+            delay_minutes = stop.get("diffMin")
+            if delay_minutes is None:
+                delay_minutes_int = is_on_time = is_late_15 = is_late_60 = None
+            else:
+                delay_minutes_int = int(delay_minutes)
+                is_on_time = delay_minutes_int <= 5
+                is_late_15 = delay_minutes_int >= 15
+                is_late_60 = delay_minutes_int >= 60
+            arrival = stop.get("arrival") or {}
+            departure = stop.get("departure") or {}
+            station_code = stop.get("code", "")
+            rows.append({
+                "scrape_date_est": scrape_date_est,
+                "train_key": train_key,
+                "train_number": train_number,
+                "service_date": service_date,
+                "origin": origin,
+                "destination": destination,
+                "departed": departed,
+                "arrived": arrived,
+                "stop_sequence": seq,
+                "station_name": stop.get("station", ""),
+                "station_code": station_code,
+                "scheduled_arrival_utc": _parse_dt(arrival.get("scheduled")),
+                "estimated_arrival_utc": _parse_dt(arrival.get("estimated")),
+                "scheduled_departure_utc": _parse_dt(departure.get("scheduled")),
+                "estimated_departure_utc": _parse_dt(departure.get("estimated")),
+                "delay_minutes": delay_minutes_int,
+                "diff_status": stop.get("diff"),
+                "is_on_time": is_on_time,
+                "is_late_15": is_late_15,
+                "is_late_60": is_late_60,
+                "is_corridor": station_code in CORRIDOR_STATION_CODES,
+            })
+
+    df = pd.DataFrame(rows)
+    df["scrape_date_est"] = pd.to_datetime(df["scrape_date_est"])
+    df["service_date"] = pd.to_datetime(df["service_date"], errors="coerce")
+    df["stop_sequence"] = df["stop_sequence"].astype("Int32")
+    df["delay_minutes"] = df["delay_minutes"].astype("Int32")
+    for col in ("scheduled_arrival_utc", "estimated_arrival_utc",
+                "scheduled_departure_utc", "estimated_departure_utc"):
+        df[col] = pd.to_datetime(df[col], utc=True, errors="coerce")
+    return pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+
+
+# ---------------------------------------------------------------------------
+# Harness
+# ---------------------------------------------------------------------------
+def _load_inputs(n_files: int) -> list[tuple[dict, date]]:
+    paths = sorted(RAW_DIR.glob("Via_data_*.json"))[-n_files:]
+    inputs = []
+    for path in paths:
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+        stamp = datetime.strptime(path.name[9:28], "%Y-%m-%d %H:%M:%S")
+        inputs.append((data, stamp.replace(tzinfo=UTC).astimezone(EST).date()))
+    return inputs
+
+
+def _time(fn, inputs: list[tuple[dict, date]], repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = sum(fn(data, d).num_rows for data, d in inputs)
+        best = min(best, time.perf_counter() - start)
+    return best, rows
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark flatten_data vs. the legacy dict path")
+    parser.add_argument("--files", type=int, default=50, help="Number of raw snapshots to use")
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N repetitions")
+    args = parser.parse_args(argv)
+
+    inputs = _load_inputs(args.files)
+    if not inputs:
+        print(f"No raw snapshots found in {RAW_DIR}")
+        return
+
+    # Sanity check: both paths must produce the same table
+    data, d = inputs[-1]
+    if not legacy_flatten(data, d).equals(flatten_data(data, d)):
+        raise SystemExit("Columnar and legacy outputs differ")
+
+    legacy_s, rows = _time(legacy_flatten, inputs, args.repeat)
+    columnar_s, _ = _time(flatten_data, inputs, args.repeat)
+
+    print(f"{len(inputs)} file(s), {rows:,} rows (best of {args.repeat})")
+    print(f"  legacy dict path : {legacy_s * 1000:8.1f} ms  {rows / legacy_s:12,.0f} rows/s")
+    print(f"  columnar         : {columnar_s * 1000:8.1f} ms  {rows / columnar_s:12,.0f} rows/s")
+    print(f"  speed-up         : {legacy_s / columnar_s:8.1f}×")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+bench_json_stream.py — Micro-benchmark: per-train streaming JSON decoding
+vs. decoding the whole snapshot up front.
+
+Two consumers are measured on the latest raw snapshots, each both ways:
+
+* ingest — ``flatten_trains(iter_items(payload))`` (what flatten_file does)
+  vs. ``flatten_data(json.loads(payload))``;
+* live   — the /api/live train list built while the body arrives in
+  live_feed.STREAM_CHUNK_BYTES pieces (``ObjectItems`` + ``build_train``,
+  what the live feed does) vs. ``build_trains(json.loads(payload))`` on
+  the complete body.
+
+orjson's whole-document decode is shown as a reference where installed.
+Reading the files is excluded from the timings; peak memory is the
+tracemalloc high-water mark of one run on the largest snapshot, payload
+excluded.
+
+Usage:
+    python benchmarks/bench_json_stream.py [--files 50] [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = REPO_ROOT / "backend"
+for path in (REPO_ROOT, BACKEND_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from app.live_feed import STREAM_CHUNK_BYTES, build_train, build_trains  # noqa: E402
+from pipeline.flatten import flatten_data, flatten_trains  # noqa: E402
+from pipeline.json_stream import ObjectItems, iter_items  # noqa: E402
+from pipeline.schema import EST, UTC  # noqa: E402
+
+try:
+    import orjson
+except ImportError:  # reference only
+    orjson = None
+
+RAW_DIR = REPO_ROOT / "raw_data"
+
+
+# ---------------------------------------------------------------------------
+# Variants
+# ---------------------------------------------------------------------------
+def ingest_full(payload: bytes, d: date) -> Any:
+    return flatten_data(json.loads(payload), d)
+
+
+def ingest_orjson(payload: bytes, d: date) -> Any:
+    return flatten_data(orjson.loads(payload), d)
+
+
+def ingest_stream(payload: bytes, d: date) -> Any:
+    return flatten_trains(iter_items(payload), d)
+
+
+def live_full(payload: bytes, d: date) -> Any:
+    return build_trains(json.loads(payload))
+
+
+def live_orjson(payload: bytes, d: date) -> Any:
+    return build_trains(orjson.loads(payload))
+
+
+def live_stream(payload: bytes, d: date) -> Any:
+    parser = ObjectItems()
+    trains = []
+    for start in range(0, len(payload), STREAM_CHUNK_BYTES):
+        chunk = payload[start:start + STREAM_CHUNK_BYTES]
+        trains.extend(build_train(k, t) for k, t in parser.feed(chunk))
+    trains.extend(build_train(k, t) for k, t in parser.close())
+    return trains
+
+
+# ---------------------------------------------------------------------------
+# Harness
+# ---------------------------------------------------------------------------
+def _load_inputs(n_files: int) -> list[tuple[bytes, date]]:
+    paths = sorted(RAW_DIR.glob("Via_data_*.json"))[-n_files:]
+    inputs = []
+    for path in paths:
+        stamp = datetime.strptime(path.name[9:28], "%Y-%m-%d %H:%M:%S")
+        inputs.append((path.read_bytes(), stamp.replace(tzinfo=UTC).astimezone(EST).date()))
+    return inputs
+
+
+def _time(fn: Callable[[bytes, date], Any], inputs: list[tuple[bytes, date]], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload, d in inputs:
+            fn(payload, d)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_kb(fn: Callable[[bytes, date], Any], payload: bytes, d: date) -> float:
+    tracemalloc.start()
+    try:
+        fn(payload, d)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark streaming vs. whole-document JSON decoding")
+    parser.add_argument("--files", type=int, default=50, help="Number of raw snapshots to use")
+    parser.add_argument("--repeat", type=int, default=5, help="Best-of-N repetitions")
+    args = parser.parse_args(argv)
+
+    inputs = _load_inputs(args.files)
+    if not inputs:
+        print(f"No raw snapshots found in {RAW_DIR}")
+        return
+    largest = max(inputs, key=lambda item: len(item[0]))
+
+    # Sanity check: both paths must produce the same output
+    for payload, d in inputs:
+        if not ingest_full(payload, d).equals(ingest_stream(payload, d)):
+            raise SystemExit("Streaming and whole-document flatten outputs differ")
+        if live_full(payload, d) != live_stream(payload, d):
+            raise SystemExit("Streaming and whole-document live train lists differ")
+
+    total_mb = sum(len(p) for p, _ in inputs) / 1e6
+    print(
+        f"{len(inputs)} file(s), {total_mb:.1f} MB of JSON (best of {args.repeat}); "
+        f"peak memory on the largest ({len(largest[0]) / 1024:.0f} KB)"
+    )
+    for consumer, variants in (
+        ("ingest", [("json.loads", ingest_full), ("orjson.loads", ingest_orjson), ("streaming", ingest_stream)]),
+        ("live", [("json.loads", live_full), ("orjson.loads", live_orjson), ("streaming", live_stream)]),
+    ):
+        baseline = None
+        for label, fn in variants:
+            if label.startswith("orjson") and orjson is None:
+                continue
+            seconds = _time(fn, inputs, args.repeat)
+            baseline = baseline or seconds
+            print(
+                f"  {consumer:<7}{label:<14}{seconds * 1000:9.1f} ms  {total_mb / seconds:7.1f} MB/s  "
+                f"{baseline / seconds:5.2f}×  peak {_peak_kb(fn, *largest):8.0f} KB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+bench_memory.py — Memory of the backend's in-memory dataset across uvicorn
+workers:
+
+* legacy  — plain ``to_pandas()`` frame with object-dtype strings, dates
+            and flags;
+* compact — categoricals, nullable dtypes and datetime64 decoded from the
+            Parquet partitions;
+* mmap    — the same frame as views of the memory-mapped serving file
+            (see pipeline/serving.py).
+
+Each loader runs in fresh interpreters so resident-set sizes are not
+polluted by the other ones; --workers of them load at the same time, like
+uvicorn workers, and read every column once.  Reported per loader, minus the
+process's footprint after imports:
+
+* frame   — ``DataFrame.memory_usage(deep=True)``
+* RSS     — resident set of one worker
+* private — resident pages only that worker maps (anonymous or copied)
+* peak    — peak resident set of one worker during the load
+* PSS     — proportional set size summed over all workers, i.e. what the
+            workers cost together once shared pages are counted once
+
+Usage:
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = REPO_ROOT / "backend"
+
+LOADERS = ["legacy", "compact", "mmap"]
+
+
+def _smaps(pid: int | str = "self") -> dict[str, float]:
+    """Rss / Pss / Private_* / Shared_* of process *pid* in MB."""
+    sizes = {}
+    with open(f"/proc/{pid}/smaps_rollup") as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                sizes[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    sizes["Private"] = sizes.get("Private_Clean", 0) + sizes.get("Private_Dirty", 0)
+    return sizes
+
+
+def _peak_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(loader: str) -> dict[str, float]:
+    """Load the dataset with *loader* in this process and return its footprint."""
+    sys.path.insert(0, str(BACKEND_DIR))
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    from app import data_loader
+
+    baseline = _smaps()
+    if loader == "legacy":
+        dataset = ds.dataset(
+            data_loader._DATASET_DIR, format="parquet", partitioning=data_loader._PARTITIONING
+        )
+        df = dataset.to_table().to_pandas()
+        pa.default_memory_pool().release_unused()
+    else:
+        df = data_loader._load(mapped=loader == "mmap")
+    # Fault in every page, as serving requests eventually would
+    pd.util.hash_pandas_object(df, index=False).sum()
+
+    after = _smaps()
+    return {
+        "rows": len(df),
+        "frame_mb": df.memory_usage(deep=True).sum() / 1e6,
+        "rss_mb": after["Rss"] - baseline["Rss"],
+        "private_mb": after["Private"] - baseline["Private"],
+        "peak_mb": _peak_mb() - baseline["Rss"],
+        "baseline_pss_mb": baseline["Pss"],
+    }
+
+
+def run_workers(loader: str, workers: int) -> dict[str, float]:
+    """Run *workers* processes holding the dataset at once; return worker 0's numbers plus total PSS."""
+    procs = [
+        subprocess.Popen(
+            [sys.executable, __file__, "--loader", loader],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(workers)
+    ]
+    try:
+        results = [json.loads(p.stdout.readline()) for p in procs]
+        time.sleep(0.1)
+        pss = sum(_smaps(p.pid)["Pss"] - r["baseline_pss_mb"] for p, r in zip(procs, results))
+    finally:
+        for p in procs:
+            p.stdin.close()
+            p.wait()
+    return {**results[0], "pss_total_mb": pss}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Memory footprint of the backend dataset")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent worker processes (default: 4)")
+    parser.add_argument("--loader", choices=LOADERS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.loader:
+        # Report, then hold the dataset until the parent closes stdin
+        print(json.dumps(measure(args.loader)), flush=True)
+        sys.stdin.read()
+        return
+
+    # Build the serving files up front, so no mmap worker pays for it
+    sys.path.insert(0, str(REPO_ROOT))
+    from pipeline.serving import ensure_serving
+
+    ensure_serving(REPO_ROOT / "clean_data" / "via_rail")
+    results = {loader: run_workers(loader, args.workers) for loader in LOADERS}
+
+    print(f"{results['compact']['rows']:,} rows, {args.workers} workers\n")
+    print(
+        f"{'loader':<10}{'frame MB':>10}{'RSS MB':>10}{'private':>10}"
+        f"{'peak MB':>10}{'PSS total':>11}"
+    )
+    for loader, r in results.items():
+        print(
+            f"{loader:<10}{r['frame_mb']:>10.1f}{r['rss_mb']:>10.1f}{r['private_mb']:>10.1f}"
+            f"{r['peak_mb']:>10.1f}{r['pss_total_mb']:>11.1f}"
+        )
+
+    legacy, compact, mapped = results["legacy"], results["compact"], results["mmap"]
+    print(
+        f"\nPer worker: compact holds {legacy['rss_mb'] - compact['rss_mb']:.1f} MB less "
+        f"than legacy ({legacy['rss_mb'] / compact['rss_mb']:.1f}×); mmap keeps "
+        f"{mapped['private_mb']:.1f} MB private vs {compact['private_mb']:.1f} MB"
+    )
+    print(
+        f"All {args.workers} workers: {compact['pss_total_mb']:.1f} MB compact → "
+        f"{mapped['pss_total_mb']:.1f} MB mmap"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+bench_predict.py — Latency of the arrival-delay model behind /api/predict.
+
+Builds the live-feed train list from a raw snapshot (as app.live_feed does
+for the API), then times the three ways the model can be called:
+
+  * one batch call over every stop of every live train (/api/predict/live)
+  * one batch call per train (/api/predict/{train_key})
+  * one call per stop — the shape a naive per-row inference loop has
+
+and checks the per-request p99 of the first two against PREDICT_BUDGET_MS.
+Feature building is included in the timings; the feed fetch is not.
+
+Usage:
+    python benchmarks/bench_predict.py [--model models/arrival_model.joblib] [--repeat 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = REPO_ROOT / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app.arrival_model import MODEL_PATH, ArrivalModel, live_stop_frame  # noqa: E402
+from app.live_feed import build_trains  # noqa: E402
+
+RAW_DIR = REPO_ROOT / "raw_data"
+
+# Per-request model time the API is allowed to spend (p99)
+PREDICT_BUDGET_MS = 25.0
+
+
+# ---------------------------------------------------------------------------
+# Harness
+# ---------------------------------------------------------------------------
+def _latest_snapshot() -> tuple[list[dict], datetime] | None:
+    paths = sorted(RAW_DIR.glob("Via_data_*.json"))
+    if not paths:
+        return None
+    with open(paths[-1], encoding="utf-8") as fh:
+        raw = json.load(fh)
+    # Evaluate the snapshot as of the moment it was scraped
+    stamp = datetime.fromisoformat(paths[-1].name[9:28] + "+00:00")
+    return build_trains(raw), stamp
+
+
+def _timings(fn, repeat: int) -> np.ndarray:
+    fn()  # warm-up
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - start
+    return samples * 1000
+
+
+def _report(label: str, ms: np.ndarray, budget: float | None = None) -> bool:
+    p50, p99 = np.percentile(ms, [50, 99])
+    verdict = ""
+    if budget is not None:
+        verdict = "  ok" if p99 <= budget else f"  OVER BUDGET ({budget:g} ms)"
+    print(f"  {label:<24}p50 {p50:8.2f} ms   p99 {p99:8.2f} ms{verdict}")
+    return budget is None or p99 <= budget
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark arrival-model inference")
+    parser.add_argument("--model", type=Path, default=MODEL_PATH, help="Model artifact to load")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed calls per variant")
+    parser.add_argument("--budget-ms", type=float, default=PREDICT_BUDGET_MS, help="p99 budget per request")
+    args = parser.parse_args(argv)
+
+    if not args.model.exists():
+        print(f"No model at {args.model} — run train_model.py first")
+        return
+    snapshot = _latest_snapshot()
+    if snapshot is None:
+        print(f"No raw snapshots found in {RAW_DIR}")
+        return
+    trains, now = snapshot
+
+    start = time.perf_counter()
+    model = ArrivalModel.load(args.model)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    frame = live_stop_frame(trains, now)
+    # The longest run is the slowest single-train request
+    train = max(trains, key=lambda t: len(t.get("stops") or []))
+    one = live_stop_frame([train], now)
+
+    # Sanity check: batching must not change any prediction
+    batched = model.predict(frame)
+    per_train = np.concatenate([model.predict(live_stop_frame([t], now)) for t in trains])
+    if not np.allclose(batched, per_train):
+        raise SystemExit("Batched and per-train predictions differ")
+
+    print(
+        f"{model.trees.n_iter_} trees, depth {model.trees.max_depth}; load {load_ms:.1f} ms\n"
+        f"{len(trains)} live trains, {len(frame):,} stops (longest train: {len(one)} stops), "
+        f"{args.repeat} calls each"
+    )
+    ok = _report("all trains, 1 batch", _timings(
+        lambda: model.predict(live_stop_frame(trains, now)), args.repeat), args.budget_ms)
+    ok &= _report("one train, 1 batch", _timings(
+        lambda: model.predict(live_stop_frame([train], now)), args.repeat), args.budget_ms)
+    _report("one train, per stop", _timings(
+        lambda: [model.predict(one.iloc[[i]]) for i in range(len(one))], max(args.repeat // 5, 1)))
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+"""
+bench_suite.py — Reproducible benchmark of the ingest pipeline and the API
+on synthetic data.
+
+For every --scales factor S a workspace is filled with synthetic
+``allData.json`` snapshots — the latest real snapshot's fleet replicated S
+times (renumbered trains, seeded random delays) over S × --days days of
+history, one snapshot per EST day, the last one today — and then, each
+stage in a fresh interpreter so its peak RSS is its own:
+
+* ingest.flatten — ``flatten_file`` over every snapshot (rows/s)
+* ingest.build   — ``build_historical.main`` (rows/s; --workers processes)
+* ingest.update  — ``update_dataset.main`` on a newer scrape of today
+* api.load       — first dataset load + index / rollup / priors warm-up
+* api.<endpoint> — each /api/* endpoint through FastAPI's TestClient:
+                   p50 / p99 latency with the response cache emptied before
+                   every request, and the p50 of cache hits
+
+Results (with the git commit, Python and platform) are written as JSON, so
+runs of two commits can be compared with --compare.  The real raw_data/ and
+clean_data/ are never touched.
+
+100× is opt-in: with the default --days it is 4 000+ trains a day for 300
+days — around 15 million stop rows and several GB of JSON.
+
+Usage:
+    python benchmarks/bench_suite.py                        # 1× and 10×
+    python benchmarks/bench_suite.py --scales 1 10 100 --days 7
+    python benchmarks/bench_suite.py --compare old.json new.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = REPO_ROOT / "backend"
+RAW_DIR = REPO_ROOT / "raw_data"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+RUN_LOG_NAME = "run_log.jsonl"
+for path in (REPO_ROOT, BACKEND_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from pipeline.schema import EST, UTC  # noqa: E402
+
+STAGES = ["flatten", "build", "update", "api"]
+
+# Stop fields the pipeline and the live feed read; the rest (alerts, GPS,
+# …) is left out of the synthetic snapshots
+_TRAIN_FIELDS = ("from", "to", "instance", "departed", "arrived")
+_STOP_FIELDS = ("station", "code", "tz", "eta")
+_TIME_FIELDS = ("arrival", "departure")
+
+# Scrape times (UTC) of the synthetic snapshots: the build reads the first,
+# the nightly update a newer one of today
+_BUILD_SCRAPE = "22:00:00.000000"
+_UPDATE_SCRAPE = "23:00:00.000000"
+
+
+# ---------------------------------------------------------------------------
+# Synthetic snapshots
+# ---------------------------------------------------------------------------
+def _template() -> dict[str, Any]:
+    paths = sorted(RAW_DIR.glob("Via_data_*.json"))
+    if not paths:
+        raise SystemExit(f"No raw snapshots found in {RAW_DIR} to use as a template")
+    with open(paths[-1], encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _parse(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+
+
+class SnapshotGenerator:
+    """Replicates the template fleet on any service day with random delays."""
+
+    def __init__(self, template: dict[str, Any], scale: int, seed: int = 0) -> None:
+        self.scale = scale
+        self.rng = np.random.default_rng(seed)
+        self.trains = []
+        for key, train in template.items():
+            instance = date.fromisoformat(train.get("instance") or "1970-01-01")
+            stops = []
+            for stop in train.get("times") or []:
+                times = {
+                    field: _parse((stop.get(field) or {}).get("scheduled"))
+                    for field in _TIME_FIELDS
+                }
+                stops.append(({f: stop.get(f) for f in _STOP_FIELDS}, times))
+            self.trains.append((key, train, instance, stops))
+        self.stops_per_day = scale * sum(len(s) for *_, s in self.trains)
+
+    def snapshot(self, day: date, final: bool) -> dict[str, Any]:
+        """The fleet running on *day*; with *final* every run has arrived."""
+        snapshot: dict[str, Any] = {}
+        for replica in range(self.scale):
+            for key, train, instance, stops in self.trains:
+                number = key.split()[0]
+                number = str(int(number) + 10_000 * replica) if number.isdigit() else f"{number}-{replica}"
+                shift = day - instance
+                out_key = f"{number} ({day:%m-%d})" if " " in key else number
+
+                # Delay builds up along the route from a per-run offset
+                drift = np.cumsum(self.rng.normal(0.8, 3.0, len(stops)))
+                delays = np.maximum(np.rint(self.rng.gamma(1.2, 8.0) - 4 + drift), 0).astype(int)
+                times = []
+                for (fields, scheduled), delay in zip(stops, delays.tolist()):
+                    stop = dict(fields)
+                    for field, at in scheduled.items():
+                        if at is not None:
+                            at = at + shift
+                            stop[field] = {
+                                "scheduled": at.isoformat(),
+                                "estimated": (at + timedelta(minutes=delay)).isoformat(),
+                            }
+                    stop["diffMin"] = delay
+                    stop["diff"] = "goo" if delay <= 5 else "bad"
+                    times.append(stop)
+
+                out = {f: train.get(f) for f in _TRAIN_FIELDS}
+                out["instance"] = day.isoformat()
+                if final:
+                    out["departed"] = out["arrived"] = True
+                out["times"] = times
+                snapshot[out_key] = out
+        return snapshot
+
+
+def _write_snapshot(raw_dir: Path, snapshot: dict[str, Any], day: date, clock: str) -> int:
+    path = raw_dir / f"Via_data_{day.isoformat()} {clock}.json"
+    payload = json.dumps(snapshot, separators=(",", ":")).encode()
+    path.write_bytes(payload)
+    return len(payload)
+
+
+def generate(workspace: Path, scale: int, days: int, seed: int) -> dict[str, Any]:
+    """Fill *workspace*/raw_data with the build's snapshots (today last)."""
+    raw_dir = workspace / "raw_data"
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    generator = SnapshotGenerator(_template(), scale, seed)
+    today = datetime.now(UTC).astimezone(EST).date()
+
+    start = time.perf_counter()
+    total_bytes = 0
+    for offset in range(days - 1, -1, -1):
+        day = today - timedelta(days=offset)
+        total_bytes += _write_snapshot(raw_dir, generator.snapshot(day, final=offset > 0), day, _BUILD_SCRAPE)
+    return {
+        "fleet": len(generator.trains) * scale,
+        "days": days,
+        "stops_per_day": generator.stops_per_day,
+        "raw_mb": round(total_bytes / 1e6, 1),
+        "generate_seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def add_update_snapshot(workspace: Path, scale: int, seed: int) -> None:
+    """A later scrape of today, with new delays, for the nightly update."""
+    generator = SnapshotGenerator(_template(), scale, seed + 1)
+    today = datetime.now(UTC).astimezone(EST).date()
+    _write_snapshot(workspace / "raw_data", generator.snapshot(today, final=True), today, _UPDATE_SCRAPE)
+
+
+# ---------------------------------------------------------------------------
+# Stages (each runs in its own interpreter)
+# ---------------------------------------------------------------------------
+def _peak_rss_mb() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / 1024, 1)
+
+
+def _script(path: Path, name: str, workspace: Path) -> Any:
+    """Import a pipeline script with its paths pointed into *workspace*."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module  # worker processes unpickle functions by module name
+    spec.loader.exec_module(module)
+    module.RAW_DIR = workspace / "raw_data"
+    module.DATASET_DIR = workspace / "clean_data" / "via_rail"
+    module.SNAPSHOT_DIR = workspace / "clean_data" / "via_rail_snapshots"
+    return module
+
+
+def _dataset_rows(workspace: Path) -> int:
+    from pipeline.dataset import open_dataset
+
+    return open_dataset(workspace / "clean_data" / "via_rail").count_rows()
+
+
+def _stage_seconds(run_log: Path) -> dict[str, float]:
+    """Wall seconds per stage of the last run in *run_log* (see pipeline/runlog.py)."""
+    records = [json.loads(line) for line in run_log.read_text().splitlines()]
+    run_id = records[-1]["run_id"]
+    totals: dict[str, float] = {}
+    for record in records:
+        if record["run_id"] == run_id and record["stage"] != "run" and not record.get("nested"):
+            totals[record["stage"]] = totals.get(record["stage"], 0.0) + record["wall_s"]
+    return {name: round(seconds, 4) for name, seconds in sorted(totals.items(), key=lambda kv: -kv[1])}
+
+
+def stage_flatten(workspace: Path, args: argparse.Namespace) -> list[dict[str, Any]]:
+    from pipeline.flatten import flatten_file
+    from pipeline.raw_files import est_date_of
+
+    paths = sorted((workspace / "raw_data").glob("Via_data_*.json"))
+    start = time.perf_counter()
+    rows = sum(flatten_file(path, est_date_of(path.name)).num_rows for path in paths)
+    seconds = time.perf_counter() - start
+    return [{"name": "ingest.flatten", "seconds": seconds, "rows": rows,
+             "rows_per_s": rows / seconds, "files": len(paths)}]
+
+
+def stage_build(workspace: Path, args: argparse.Namespace) -> list[dict[str, Any]]:
+    build = _script(REPO_ROOT / "clean_data" / "build_historical.py", "build_historical", workspace)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        build.main(["--workers", str(args.workers), "--run-log", str(workspace / RUN_LOG_NAME)])
+    seconds = time.perf_counter() - start
+    rows = _dataset_rows(workspace)
+    return [{"name": "ingest.build", "seconds": seconds, "rows": rows,
+             "rows_per_s": rows / seconds, "workers": args.workers,
+             "stages": _stage_seconds(workspace / RUN_LOG_NAME)}]
+
+
+def stage_update(workspace: Path, args: argparse.Namespace) -> list[dict[str, Any]]:
+    from pipeline.dataset import read_partition
+
+    update = _script(REPO_ROOT / "update_dataset.py", "update_dataset", workspace)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        update.main(["--run-log", str(workspace / RUN_LOG_NAME)])
+    seconds = time.perf_counter() - start
+    today = datetime.now(UTC).astimezone(EST).date()
+    rows = read_partition(update.DATASET_DIR, today).num_rows
+    return [{"name": "ingest.update", "seconds": seconds, "rows": rows, "rows_per_s": rows / seconds,
+             "stages": _stage_seconds(workspace / RUN_LOG_NAME)}]
+
+
+def _point_backend_at(workspace: Path) -> None:
+    """Rebase every dataset path of app.data_loader onto *workspace*."""
+    from app import arrival_model, data_loader
+
+    old_root = data_loader._DATASET_DIR
+    new_root = workspace / "clean_data" / "via_rail"
+    for name, value in list(vars(data_loader).items()):
+        if isinstance(value, Path) and value.is_relative_to(old_root):
+            setattr(data_loader, name, new_root / value.relative_to(old_root))
+    data_loader._PARQUET_PATH = workspace / "clean_data" / "via_rail_clean.parquet"
+    # Predictions come from the priors: no model in the workspace
+    arrival_model.MODEL_PATH = workspace / "models" / "arrival_model.joblib"
+
+
+def _latencies(client: Any, url: str, requests: int, clear: Any) -> np.ndarray:
+    samples = np.empty(requests)
+    for i in range(requests):
+        if clear is not None:
+            clear()
+        start = time.perf_counter()
+        response = client.get(url)
+        samples[i] = time.perf_counter() - start
+        if response.status_code != 200:
+            raise SystemExit(f"{url} → HTTP {response.status_code}: {response.text[:200]}")
+    return samples * 1000
+
+
+def stage_api(workspace: Path, args: argparse.Namespace) -> list[dict[str, Any]]:
+    _point_backend_at(workspace)
+    from fastapi.testclient import TestClient
+
+    from app import data_loader
+    from app.main import app
+    from app.result_cache import cache
+
+    start = time.perf_counter()
+    data = data_loader.current()
+    load_seconds = time.perf_counter() - start
+    results = [{"name": "api.load", "seconds": load_seconds, "rows": len(data.df),
+                "rows_per_s": len(data.df) / load_seconds}]
+
+    counts = data.df["train_number"].value_counts()
+    train_number = str(counts.index[0])
+    station = str(data.df["station_code"].value_counts().index[0])
+    week_ago = (data.df["scrape_date_est"].max() - np.timedelta64(6, "D")).date()
+    endpoints = [
+        ("performance", "/api/performance?period=30d", True),
+        ("performance.corridor_365d", "/api/performance?period=365d&corridor_only=true", True),
+        ("performance.station", f"/api/performance?period=30d&station_code={station}", True),
+        ("performance.columns", "/api/performance?period=365d&shape=columns", True),
+        ("performance.late_30", "/api/performance?period=365d&late_threshold=30", True),
+        ("summary", "/api/summary?period=30d", True),
+        ("summary.train", f"/api/summary?period=365d&train_number={train_number}", True),
+        ("stations", "/api/stations", True),
+        ("predict", f"/api/predict/{train_number}", False),
+        ("export.arrow_7d", f"/api/export?format=arrow&from={week_ago}", False),
+        ("export.parquet_7d", f"/api/export?format=parquet&from={week_ago}", False),
+    ]
+
+    client = TestClient(app)
+    for name, url, cached in endpoints:
+        cold = _latencies(client, url, args.requests, cache.clear if cached else None)
+        p50, p99 = np.percentile(cold, [50, 99])
+        result = {"name": f"api.{name}", "url": url, "p50_ms": p50, "p99_ms": p99}
+        if cached:
+            result["cached_p50_ms"] = float(np.median(_latencies(client, url, args.requests, None)))
+        results.append(result)
+    return results
+
+
+_STAGE_FUNCTIONS = {
+    "flatten": stage_flatten,
+    "build": stage_build,
+    "update": stage_update,
+    "api": stage_api,
+}
+
+
+def run_stage(stage: str, workspace: Path, args: argparse.Namespace) -> list[dict[str, Any]]:
+    """Run *stage* in a fresh interpreter and return its result records."""
+    command = [
+        sys.executable, __file__, "--stage", stage, "--workspace", str(workspace),
+        "--workers", str(args.workers), "--requests", str(args.requests),
+    ]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+def _git_commit() -> dict[str, Any]:
+    def git(*cmd: str) -> str:
+        return subprocess.run(
+            ["git", *cmd], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def _print_record(record: dict[str, Any]) -> None:
+    name = record["name"]
+    if "p50_ms" in record:
+        cached = f"  cached p50 {record['cached_p50_ms']:7.2f} ms" if "cached_p50_ms" in record else ""
+        print(f"  {name:<30}p50 {record['p50_ms']:8.2f} ms  p99 {record['p99_ms']:8.2f} ms{cached}")
+    else:
+        print(
+            f"  {name:<30}{record['seconds']:8.2f} s  {record['rows']:>12,} rows  "
+            f"{record['rows_per_s']:>12,.0f} rows/s  peak RSS {record['peak_rss_mb']:7.1f} MB"
+        )
+
+
+# (metric, higher is better)
+_COMPARED = [("rows_per_s", True), ("p50_ms", False), ("p99_ms", False), ("peak_rss_mb", False)]
+
+
+def compare(old_path: Path, new_path: Path) -> None:
+    old, new = (json.loads(p.read_text()) for p in (old_path, new_path))
+    print(f"{old['meta']['commit'][:10]} → {new['meta']['commit'][:10]}  (ratio new/old)")
+    before = {(r["scale"], r["name"]): r for r in old["results"]}
+    for record in new["results"]:
+        previous = before.get((record["scale"], record["name"]))
+        if previous is None:
+            continue
+        cells = []
+        for metric, higher_is_better in _COMPARED:
+            if metric in record and metric in previous and previous[metric]:
+                ratio = record[metric] / previous[metric]
+                worse = ratio < 0.9 if higher_is_better else ratio > 1.1
+                cells.append(f"{metric} {ratio:5.2f}×{' !' if worse else '  '}")
+        print(f"  {record['scale']:>4}×  {record['name']:<30}" + "   ".join(cells))
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark ingest and API on synthetic data")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10], help="Fleet and history multipliers")
+    parser.add_argument("--days", type=int, default=3, help="Days of history at 1× (default: 3)")
+    parser.add_argument("--workers", type=int, default=4, help="build_historical --workers (default: 4)")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per endpoint (default: 20)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Results file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--workdir", type=Path, help="Where workspaces are generated (default: a temp dir)")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated workspaces")
+    parser.add_argument("--compare", type=Path, nargs=2, metavar=("OLD", "NEW"), help="Compare two results files")
+    parser.add_argument("--stage", choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument("--workspace", type=Path, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.stage:
+        with contextlib.redirect_stdout(sys.stderr):
+            records = _STAGE_FUNCTIONS[args.stage](args.workspace, args)
+        for record in records:
+            record["peak_rss_mb"] = _peak_rss_mb()
+        print(json.dumps(records))
+        return
+
+    workdir = Path(tempfile.mkdtemp(prefix="via_bench_", dir=args.workdir))
+    meta = {
+        **_git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "days": args.days,
+        "workers": args.workers,
+        "requests": args.requests,
+        "seed": args.seed,
+    }
+    results: list[dict[str, Any]] = []
+    try:
+        for scale in args.scales:
+            workspace = workdir / f"scale-{scale}"
+            info = generate(workspace, scale, args.days * scale, args.seed)
+            print(
+                f"\n{scale}× — {info['fleet']:,} trains × {info['days']} days, "
+                f"{info['stops_per_day']:,} stops/day, {info['raw_mb']:,} MB of JSON "
+                f"(generated in {info['generate_seconds']:.1f}s)"
+            )
+            for stage in STAGES:
+                if stage == "update":
+                    add_update_snapshot(workspace, scale, args.seed)
+                for record in run_stage(stage, workspace, args):
+                    record.update(scale=scale, **info)
+                    _print_record(record)
+                    results.append(record)
+            if not args.keep:
+                shutil.rmtree(workspace)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{meta['commit'][:10]}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"meta": meta, "results": results}, indent=2, default=float) + "\n")
+    print(f"\nResults → {output}")
+
+
+if __name__ == "__main__":
+    main()
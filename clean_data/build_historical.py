@@ -1,241 +1,296 @@
 """
-build_historical.py — Process all raw JSON snapshots in raw_data/ into a
-master Parquet dataset at clean_data/via_rail_clean.parquet.
+build_historical.py — Process all raw JSON snapshots in raw_data/ into the
+Hive-partitioned master dataset at clean_data/via_rail/ (one partition per
+EST day, see pipeline/dataset.py).
 
 File-selection rule:
     Scrapes run at ~03:00–04:30 UTC (~22:00–00:30 EST).  For each EST
     calendar day we keep only the *latest* scrape file whose UTC timestamp
     converts to that EST date.  This captures the final state of every
     train for that operating day.
+
+Each partition's daily rollup cube (see pipeline/rollup.py) and delay
+histogram (see pipeline/priors.py) are written to clean_data/via_rail/_rollup/
+and _priors/ at the same time, and the histograms are summed into the delay
+priors table (_priors.parquet).  The API's memory-mappable serving files are
+not built here (see pipeline/serving.py).
+
+Wall time, CPU time, rows and peak memory of every stage of every file
+(JSON decode, flattening, timestamp parsing, dedup, Parquet writes, …) are
+appended to a JSON-lines run log (see pipeline/runlog.py); --profile keeps
+cProfile dumps of the slowest files.
+
+With --all-snapshots every scrape (not just the last one of each day) is
+also stored, as a per-day delta stream in clean_data/via_rail_snapshots/
+(see pipeline/snapshots.py).
+
+Usage:
+    python clean_data/build_historical.py              # sequential
+    python clean_data/build_historical.py --workers 8  # process pool
+    python clean_data/build_historical.py --all-snapshots
+    python clean_data/build_historical.py --profile 10
 """
 
 from __future__ import annotations
 
-import json
-import os
-import re
-from datetime import date, datetime, timedelta, timezone
+import argparse
+import shutil
+import sys
+from collections import defaultdict, deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import date, datetime
+from functools import partial
 from pathlib import Path
+from typing import TypeVar
 
-import pandas as pd
 import pyarrow as pa
-import pyarrow.parquet as pq
 
 # ---------------------------------------------------------------------------
 # Paths
 # ---------------------------------------------------------------------------
 REPO_ROOT = Path(__file__).resolve().parent.parent
 RAW_DIR = REPO_ROOT / "raw_data"
-OUTPUT_PATH = Path(__file__).resolve().parent / "via_rail_clean.parquet"
-
-# ---------------------------------------------------------------------------
-# Timezone helpers
-# ---------------------------------------------------------------------------
-UTC = timezone.utc
-EST = timezone(timedelta(hours=-5))
-
-# ---------------------------------------------------------------------------
-# Windsor–Québec corridor station codes
-# ---------------------------------------------------------------------------
-CORRIDOR_STATION_CODES: set[str] = {
-    "WDON", "CHAT", "GLNC", "LNDN", "INGR", "WDST", "BRTF", "ALDR",
-    "OAKV", "TRTO", "GUIL", "OSHA", "CBRG", "PHOP", "TRNJ", "BLVL",
-    "NAPN", "KGON", "GANA", "BRKV", "CWLL", "ALEX", "CSLM", "OTTW",
-    "FALL", "SMTF", "SLAM", "MTRL", "DORV", "COTO", "SHYA", "DRMV",
-    "SFOY", "QBEC", "CHNY",
-}
-
-# ---------------------------------------------------------------------------
-# Filename parsing
-# ---------------------------------------------------------------------------
-_FILENAME_RE = re.compile(
-    r"Via_data_(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})"
-)
-
-
-def parse_utc_timestamp(filename: str) -> datetime | None:
-    """Return the UTC datetime encoded in a raw-data filename, or None."""
-    m = _FILENAME_RE.search(filename)
-    if not m:
-        return None
-    return datetime.strptime(m.group(1), "%Y-%m-%d %H:%M:%S").replace(tzinfo=UTC)
+DATASET_DIR = Path(__file__).resolve().parent / "via_rail"
+SNAPSHOT_DIR = Path(__file__).resolve().parent / "via_rail_snapshots"
+
+# The shared pipeline package lives at the repo root; make it importable when
+# this file is run as a script from any working directory.
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from pipeline import runlog  # noqa: E402
+from pipeline.dataset import SORT_KEYS, swap_dataset_dir, write_partition  # noqa: E402
+from pipeline.flatten import dedup_table, flatten_file  # noqa: E402
+from pipeline.manifest import record_day, save_manifest, scan_raw_dir  # noqa: E402
+from pipeline.priors import write_histogram, write_priors  # noqa: E402
+from pipeline.raw_files import parse_utc_timestamp  # noqa: E402
+from pipeline.raw_store import SnapshotRef, iter_snapshots  # noqa: E402
+from pipeline.rollup import write_rollup  # noqa: E402
+from pipeline.schema import EST, SCHEMA  # noqa: E402
+from pipeline.snapshots import write_day  # noqa: E402
 
 
 # ---------------------------------------------------------------------------
 # File selection: one file per EST calendar day (latest UTC timestamp)
 # ---------------------------------------------------------------------------
-def select_files(raw_dir: Path) -> dict[date, Path]:
+def select_files(raw_dir: Path) -> dict[date, SnapshotRef]:
     """
-    Return a mapping of {est_date: path_to_latest_file_for_that_day}.
+    Return a mapping of {est_date: latest_snapshot_for_that_day}, looking at
+    loose files and raw-store bundles alike.
     """
-    best: dict[date, tuple[datetime, Path]] = {}
+    best: dict[date, tuple[datetime, SnapshotRef]] = {}
 
-    for path in sorted(raw_dir.glob("Via_data_*.json")):
-        ts_utc = parse_utc_timestamp(path.name)
+    for ref in sorted(iter_snapshots(raw_dir), key=lambda r: r.name):
+        ts_utc = parse_utc_timestamp(ref.name)
         if ts_utc is None:
             continue
         est_date = ts_utc.astimezone(EST).date()
         if est_date not in best or ts_utc > best[est_date][0]:
-            best[est_date] = (ts_utc, path)
+            best[est_date] = (ts_utc, ref)
 
     return {d: info[1] for d, info in best.items()}
 
 
-# ---------------------------------------------------------------------------
-# Datetime helpers
-# ---------------------------------------------------------------------------
-def _parse_dt(value: str | None) -> datetime | None:
-    """Parse an ISO-8601 UTC string to an aware datetime, or None."""
-    if not value:
-        return None
-    try:
-        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
-        return dt.astimezone(UTC)
-    except ValueError:
-        return None
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Tasks submitted ahead of the one being consumed, per worker: enough to
+# keep every worker busy, few enough that finished batches cannot pile up
+# when writing falls behind flattening.
+IN_FLIGHT_PER_WORKER = 2
 
 
 # ---------------------------------------------------------------------------
-# Flattening a single JSON file
+# Per-file worker — runs in a child process when --workers > 1
 # ---------------------------------------------------------------------------
-def flatten_file(path: Path, scrape_date_est: date) -> list[dict]:
-    """Return a list of row dicts for one raw JSON snapshot."""
-    with open(path, encoding="utf-8") as fh:
-        data = json.load(fh)
+def flatten_to_batch(
+    task: tuple[date, SnapshotRef], profile_dir: Path | None = None
+) -> tuple[pa.RecordBatch, list[dict]]:
+    """
+    Flatten one (est_date, path) pair into a deduplicated RecordBatch, and
+    return it with the run-log records of its stages.
+
+    Every selected file maps to a distinct scrape_date_est, so duplicates can
+    only occur within a single file and deduplicating per file is equivalent
+    to deduplicating the whole dataset.
+    """
+    est_date, path = task
+    with runlog.collect() as records, runlog.profiled(profile_dir, path.name):
+        with runlog.stage("file", file=path.name, est_date=est_date.isoformat()) as record:
+            table = dedup_table(flatten_file(path, est_date)).combine_chunks()
+            record["rows"] = table.num_rows
+    batches = table.to_batches()
+    batch = batches[0] if batches else pa.RecordBatch.from_pylist([], schema=SCHEMA)
+    return batch, records
 
-    rows: list[dict] = []
 
-    for train_key, train in data.items():
-        # Numeric part of the key (e.g. "2 (03-28)" → "2", "60" → "60")
-        train_number = train_key.split()[0]
+def _imap(fn: Callable[[T], R], tasks: list[T], workers: int) -> Iterator[R]:
+    """
+    Yield fn(task) for each task, in task order.
+
+    With workers <= 1 tasks run in-process; otherwise they are fanned out to
+    a process pool with at most IN_FLIGHT_PER_WORKER × workers of them
+    submitted and not yet consumed, so peak memory does not grow with the
+    number of tasks.
+    """
+    if workers <= 1:
+        yield from map(fn, tasks)
+        return
 
-        # Service date from the "instance" field
+    window = IN_FLIGHT_PER_WORKER * workers
+    pending: deque[Future] = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
         try:
-            service_date = date.fromisoformat(train.get("instance", ""))
-        except ValueError:
-            service_date = None
-
-        origin = train.get("from", "")
-        destination = train.get("to", "")
-        departed = bool(train.get("departed", False))
-        arrived = bool(train.get("arrived", False))
-
-        for seq, stop in enumerate(train.get("times", [])):
-            delay_minutes = stop.get("diffMin")
-            if delay_minutes is None:
-                delay_minutes_int = None
-                is_on_time = None
-                is_late_15 = None
-                is_late_60 = None
-            else:
-                delay_minutes_int = int(delay_minutes)
-                is_on_time = delay_minutes_int <= 5
-                is_late_15 = delay_minutes_int >= 15
-                is_late_60 = delay_minutes_int >= 60
-
-            arrival = stop.get("arrival") or {}
-            departure = stop.get("departure") or {}
-            station_code = stop.get("code", "")
-
-            rows.append({
-                "scrape_date_est": scrape_date_est,
-                "train_key": train_key,
-                "train_number": train_number,
-                "service_date": service_date,
-                "origin": origin,
-                "destination": destination,
-                "departed": departed,
-                "arrived": arrived,
-                "stop_sequence": seq,
-                "station_name": stop.get("station", ""),
-                "station_code": station_code,
-                "scheduled_arrival_utc": _parse_dt(arrival.get("scheduled")),
-                "estimated_arrival_utc": _parse_dt(arrival.get("estimated")),
-                "scheduled_departure_utc": _parse_dt(departure.get("scheduled")),
-                "estimated_departure_utc": _parse_dt(departure.get("estimated")),
-                "delay_minutes": delay_minutes_int,
-                "diff_status": stop.get("diff"),
-                "is_on_time": is_on_time,
-                "is_late_15": is_late_15,
-                "is_late_60": is_late_60,
-                "is_corridor": station_code in CORRIDOR_STATION_CODES,
-            })
-
-    return rows
+            for task in tasks:
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+                pending.append(pool.submit(fn, task))
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def iter_batches(
+    tasks: list[tuple[date, SnapshotRef]], workers: int, profile_dir: Path | None = None
+) -> Iterator[tuple[pa.RecordBatch, list[dict]]]:
+    """
+    Yield one flattened RecordBatch (and its run-log records) per
+    (est_date, snapshot) task, in order.
+    """
+    return _imap(partial(flatten_to_batch, profile_dir=profile_dir), tasks, workers)
 
 
 # ---------------------------------------------------------------------------
-# PyArrow schema — keeps dtypes deterministic even for empty files
+# All-snapshots mode — one delta-stream partition per EST day
 # ---------------------------------------------------------------------------
-SCHEMA = pa.schema([
-    pa.field("scrape_date_est", pa.date32()),
-    pa.field("train_key", pa.string()),
-    pa.field("train_number", pa.string()),
-    pa.field("service_date", pa.date32()),
-    pa.field("origin", pa.string()),
-    pa.field("destination", pa.string()),
-    pa.field("departed", pa.bool_()),
-    pa.field("arrived", pa.bool_()),
-    pa.field("stop_sequence", pa.int32()),
-    pa.field("station_name", pa.string()),
-    pa.field("station_code", pa.string()),
-    pa.field("scheduled_arrival_utc", pa.timestamp("us", tz="UTC")),
-    pa.field("estimated_arrival_utc", pa.timestamp("us", tz="UTC")),
-    pa.field("scheduled_departure_utc", pa.timestamp("us", tz="UTC")),
-    pa.field("estimated_departure_utc", pa.timestamp("us", tz="UTC")),
-    pa.field("delay_minutes", pa.int32()),
-    pa.field("diff_status", pa.string()),
-    pa.field("is_on_time", pa.bool_()),
-    pa.field("is_late_15", pa.bool_()),
-    pa.field("is_late_60", pa.bool_()),
-    pa.field("is_corridor", pa.bool_()),
-])
+def _write_snapshot_day(task: tuple[Path, date, list[SnapshotRef]]) -> tuple[int, int, int]:
+    root, est_date, refs = task
+    return write_day(root, refs, est_date)
+
+
+def build_snapshots(raw_dir: Path, workers: int) -> None:
+    by_day: dict[date, list[SnapshotRef]] = defaultdict(list)
+    for ref in iter_snapshots(raw_dir):
+        ts_utc = parse_utc_timestamp(ref.name)
+        if ts_utc is not None:
+            by_day[ts_utc.astimezone(EST).date()].append(ref)
+
+    staging = SNAPSHOT_DIR.with_name(f"{SNAPSHOT_DIR.name}.tmp")
+    if staging.exists():
+        shutil.rmtree(staging)
+
+    tasks = [(staging, d, by_day[d]) for d in sorted(by_day)]
+    delta_total = removed_total = full_total = 0
+    for (_, est_date, refs), (delta_rows, removed_rows, full_rows) in zip(
+        tasks, _imap(_write_snapshot_day, tasks, workers)
+    ):
+        delta_total += delta_rows
+        removed_total += removed_rows
+        full_total += full_rows
+        print(
+            f"  {est_date}  {len(refs)} scrape(s)  → "
+            f"{delta_rows:,} delta rows + {removed_rows:,} removals ({full_rows:,} in full)"
+        )
+
+    if delta_total == 0:
+        print("No snapshot rows produced — nothing to write.")
+        return
+
+    swap_dataset_dir(staging, SNAPSHOT_DIR)
+    print(
+        f"\nWrote {delta_total:,} delta rows and {removed_total:,} removals for "
+        f"{full_total:,} scraped stop records → {SNAPSHOT_DIR}"
+    )
 
 
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
-def main() -> None:
-    selected = select_files(RAW_DIR)
-    print(f"Selected {len(selected)} file(s) (one per EST day) from {RAW_DIR}")
-
-    all_rows: list[dict] = []
-
-    for est_date, path in sorted(selected.items()):
-        rows = flatten_file(path, est_date)
-        all_rows.extend(rows)
-        print(f"  {est_date}  {path.name}  → {len(rows):,} rows")
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to flatten files (default: 1, in-process)",
+    )
+    parser.add_argument(
+        "--all-snapshots",
+        action="store_true",
+        help="Also store every scrape as a delta stream in clean_data/via_rail_snapshots/",
+    )
+    runlog.add_arguments(parser)
+    return parser.parse_args(argv)
 
-    if not all_rows:
-        print("No rows produced — nothing to write.")
-        return
 
-    df = pd.DataFrame(all_rows)
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    log = runlog.RunLog(
+        "build_historical", args.run_log, profile_top=args.profile,
+        workers=args.workers, all_snapshots=args.all_snapshots,
+    )
+    with log:
+        build(args, log)
+    log.report()
 
-    # Cast columns to the correct pandas dtypes before writing to Parquet
-    df["scrape_date_est"] = pd.to_datetime(df["scrape_date_est"])
-    df["service_date"] = pd.to_datetime(df["service_date"], errors="coerce")
-    df["stop_sequence"] = df["stop_sequence"].astype("Int32")
-    df["delay_minutes"] = df["delay_minutes"].astype("Int32")
 
-    for col in ("scheduled_arrival_utc", "estimated_arrival_utc",
-                "scheduled_departure_utc", "estimated_departure_utc"):
-        df[col] = pd.to_datetime(df[col], utc=True, errors="coerce")
+def build(args: argparse.Namespace, log: runlog.RunLog) -> None:
+    with runlog.stage("select_files") as record:
+        selected = select_files(RAW_DIR)
+        record["files"] = len(selected)
+    print(f"Selected {len(selected)} file(s) (one per EST day) from {RAW_DIR}")
 
-    # Drop duplicates on the natural key
-    df.drop_duplicates(
-        subset=["train_key", "service_date", "station_code", "scrape_date_est"],
-        keep="last",
-        inplace=True,
-    )
+    tasks = sorted(selected.items())
+    with runlog.stage("scan_raw_dir"):
+        manifest, _ = scan_raw_dir(RAW_DIR, {})
+    total_rows = 0
+    partitions = 0
+    staging = DATASET_DIR.with_name(f"{DATASET_DIR.name}.tmp")
+    if staging.exists():
+        shutil.rmtree(staging)
+
+    # Each batch is written to its own partition as it arrives, so peak
+    # memory is bounded by the size of a handful of files rather than the
+    # whole archive.  The finished tree replaces DATASET_DIR in one swap.
+    batches = iter_batches(tasks, args.workers, log.profile_dir)
+    for (est_date, path), (batch, records) in zip(tasks, batches):
+        log.add(records)
+        print(f"  {est_date}  {path.name}  → {batch.num_rows:,} rows")
+        record_day(manifest, est_date, path.name, batch.num_rows)
+        if batch.num_rows == 0:
+            continue
+        table = pa.Table.from_batches([batch])
+        with runlog.stage("write", file=path.name, est_date=est_date.isoformat(), rows=table.num_rows):
+            with runlog.stage("write_partition"):
+                write_partition(staging, table, est_date, SORT_KEYS)
+            with runlog.stage("write_rollup"):
+                write_rollup(staging, table, est_date)
+            with runlog.stage("write_histogram"):
+                write_histogram(staging, table, est_date)
+        total_rows += batch.num_rows
+        partitions += 1
+
+    if partitions == 0:
+        print("No rows produced — nothing to write.")
+        return
 
-    table = pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+    with runlog.stage("write_priors"):
+        write_priors(staging)
+    with runlog.stage("save_manifest"):
+        save_manifest(staging, manifest)
+        swap_dataset_dir(staging, DATASET_DIR)
+    log.summary.update(rows=total_rows, partitions=partitions)
 
-    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    pq.write_table(table, OUTPUT_PATH)
+    print(f"\nWrote {total_rows:,} rows in {partitions} partition(s) → {DATASET_DIR}")
+    print(SCHEMA)
 
-    print(f"\nWrote {len(df):,} rows → {OUTPUT_PATH}")
-    print(df.dtypes)
+    if args.all_snapshots:
+        print(f"\nBuilding intraday delta streams → {SNAPSHOT_DIR}")
+        with runlog.stage("build_snapshots"):
+            build_snapshots(RAW_DIR, args.workers)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,49 @@
+import type { LiveDiff, LiveTrain } from './types'
+
+const BASE_URL = import.meta.env.VITE_API_BASE ?? ''
+
+export interface LiveSubscription {
+  corridorOnly?: boolean
+  trainNumbers?: string[]
+}
+
+/**
+ * Subscribe to GET /api/live/stream.  Keeps a train_key → LiveTrain map in
+ * sync by applying the server's diffs and calls `onChange` after every
+ * snapshot or diff.  Returns a function that closes the stream.
+ */
+export function subscribeLive(
+  sub: LiveSubscription,
+  onChange: (trains: Map<string, LiveTrain>, version: number) => void,
+): () => void {
+  const url = new URL(BASE_URL + '/api/live/stream', window.location.origin)
+  if (sub.corridorOnly) url.searchParams.set('corridor_only', 'true')
+  for (const n of sub.trainNumbers ?? []) url.searchParams.append('train_number', n)
+
+  let trains = new Map<string, LiveTrain>()
+  const source = new EventSource(url.toString())
+
+  source.addEventListener('snapshot', (e) => {
+    const data = JSON.parse((e as MessageEvent).data) as { version: number; trains: LiveTrain[] }
+    trains = new Map(data.trains.map((t) => [t.train_key, t]))
+    onChange(trains, data.version)
+  })
+
+  source.addEventListener('diff', (e) => {
+    const diff = JSON.parse((e as MessageEvent).data) as LiveDiff
+    for (const t of diff.added) trains.set(t.train_key, t)
+    for (const key of diff.removed) trains.delete(key)
+    for (const { stops, ...fields } of diff.updated) {
+      const train = trains.get(fields.train_key)
+      if (!train) continue
+      Object.assign(train, fields)
+      if (stops) {
+        const byCode = new Map(stops.map((s) => [s.code, s]))
+        train.stops = train.stops.map((s) => byCode.get(s.code) ?? s)
+      }
+    }
+    onChange(trains, diff.version)
+  })
+
+  return () => source.close()
+}
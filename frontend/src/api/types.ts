@@ -44,3 +44,32 @@ export interface StationRecord {
   on_time_pct:       number
   total_stops:       number
 }
+
+/** One stop of a live train from GET /api/live */
+export interface LiveStop {
+  station:           string | null
+  code:              string
+  diff_status:       string | null
+  delay_minutes:     number | null
+  estimated_arrival: string | null
+  scheduled_arrival: string | null
+}
+
+/** One live train from GET /api/live and /api/live/stream */
+export interface LiveTrain {
+  train_key:    string
+  from:         string | null
+  to:           string | null
+  departed:     boolean
+  arrived:      boolean
+  service_date: string | null
+  stops:        LiveStop[]
+}
+
+/** `diff` event payload from GET /api/live/stream */
+export interface LiveDiff {
+  version: number
+  added:   LiveTrain[]
+  updated: (Partial<Omit<LiveTrain, 'stops'>> & { train_key: string; stops?: LiveStop[] })[]
+  removed: string[]
+}
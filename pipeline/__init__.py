@@ -0,0 +1,4 @@
+"""
+pipeline — Ingest code shared by clean_data/build_historical.py and
+update_dataset.py.
+"""
@@ -0,0 +1,141 @@
+"""
+dataset.py — Hive-partitioned layout of the clean dataset.
+
+One directory per EST scrape day, each holding a single Parquet file:
+
+    clean_data/via_rail/
+        scrape_date_est=2025-04-01/part-0.parquet
+        scrape_date_est=2025-04-02/part-0.parquet
+        ...
+
+The partition column is encoded in the directory name only, as usual for
+Hive layouts.  Partitions are written to a temporary file and renamed into
+place, so readers never observe a half-written day.
+
+Files are split into row groups of at most ROW_GROUP_ROWS rows, each with
+min/max statistics, and the stop-level dataset's rows are sorted by
+SORT_KEYS (station first).  A scan filtered on a date range skips whole
+directories; one filtered on a station skips every row group whose
+station range excludes it.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+from datetime import date
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from pipeline.schema import SCHEMA
+
+PARTITION_COLUMN = "scrape_date_est"
+PART_FILENAME = "part-0.parquet"
+
+PARTITIONING = ds.partitioning(
+    pa.schema([SCHEMA.field(PARTITION_COLUMN)]), flavor="hive"
+)
+
+SORT_KEYS = ["station_code", "train_key", "stop_sequence"]
+ROW_GROUP_ROWS = 8_192
+
+
+# ---------------------------------------------------------------------------
+# Paths
+# ---------------------------------------------------------------------------
+def partition_dir(root: Path, scrape_date_est: date) -> Path:
+    """Return the directory holding the partition for *scrape_date_est*."""
+    return root / f"{PARTITION_COLUMN}={scrape_date_est.isoformat()}"
+
+
+def partition_path(root: Path, scrape_date_est: date) -> Path:
+    """Return the Parquet file path for the partition of *scrape_date_est*."""
+    return partition_dir(root, scrape_date_est) / PART_FILENAME
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+def partition_days(root: Path) -> list[date]:
+    """Return the days that have a partition under *root*, oldest first."""
+    prefix = f"{PARTITION_COLUMN}="
+    days = []
+    for directory in root.glob(f"{prefix}*"):
+        try:
+            days.append(date.fromisoformat(directory.name[len(prefix):]))
+        except ValueError:
+            continue
+    return sorted(days)
+
+
+def open_dataset(root: Path, schema: pa.Schema = SCHEMA) -> ds.Dataset:
+    """Return a pyarrow Dataset over every partition under *root*."""
+    return ds.dataset(root, schema=schema, format="parquet", partitioning=PARTITIONING)
+
+
+def read_partition(
+    root: Path, scrape_date_est: date, schema: pa.Schema = SCHEMA
+) -> pa.Table | None:
+    """Return the *schema* table stored for *scrape_date_est*, or None."""
+    path = partition_path(root, scrape_date_est)
+    if not path.exists():
+        return None
+    index = schema.get_field_index(PARTITION_COLUMN)
+    table = pq.read_table(path, schema=schema.remove(index))
+    day = pa.repeat(pa.scalar(scrape_date_est, pa.date32()), table.num_rows)
+    return table.add_column(index, PARTITION_COLUMN, day)
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+def write_partition(
+    root: Path,
+    table: pa.Table,
+    scrape_date_est: date,
+    sort_keys: list[str] | None = None,
+) -> Path:
+    """
+    Atomically replace the partition for *scrape_date_est* with *table*.
+
+    *table* must have a scrape_date_est column (SCHEMA or an extension of
+    it); the column is dropped because the value lives in the directory name.
+    With *sort_keys* the rows are stored sorted by those columns.
+    """
+    path = partition_path(root, scrape_date_est)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    table = table.drop_columns([PARTITION_COLUMN])
+    if sort_keys:
+        table = table.sort_by([(k, "ascending") for k in sort_keys])
+    pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_ROWS, write_statistics=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+def delete_partition(root: Path, scrape_date_est: date) -> bool:
+    """Remove the partition for *scrape_date_est*; return True if one existed."""
+    directory = partition_dir(root, scrape_date_est)
+    if not directory.exists():
+        return False
+    shutil.rmtree(directory)
+    return True
+
+
+def swap_dataset_dir(staging: Path, root: Path) -> None:
+    """
+    Replace the dataset directory *root* with the fully-written *staging*
+    directory.  The old tree is moved aside first and deleted afterwards so
+    *root* is only missing for the duration of two renames.
+    """
+    old = root.with_name(f"{root.name}.old")
+    if old.exists():
+        shutil.rmtree(old)
+    if root.exists():
+        os.replace(root, old)
+    os.replace(staging, root)
+    if old.exists():
+        shutil.rmtree(old)
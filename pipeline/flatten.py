@@ -0,0 +1,228 @@
+"""
+flatten.py — Columnar flattening of a raw allData.json snapshot into an
+Arrow table that matches SCHEMA.
+
+The JSON is walked once, appending each field to a plain Python list (one
+per column).  ``flatten_file`` decodes the snapshot one train at a time
+(pipeline/json_stream.py) and flattens each train as soon as it is
+decoded, so the full tree of dicts never exists.  Train-level fields are
+stored once per train and expanded with a single ``take``; the four
+timestamp columns are parsed together in one vectorized ``strptime``
+call; is_corridor is computed with an Arrow compute kernel.  No per-stop
+dict and no pandas round-trip is involved.  On-time and lateness are not
+stored at all — they are derived from delay_minutes where they are counted
+(pipeline/lateness.py).
+
+The steps are timed as pipeline/runlog.py stages — read, flatten (decoding
+and the walk), parse_timestamps, build_table and dedup — when the caller
+collects a run log.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import date
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from pipeline import runlog
+from pipeline.json_stream import iter_items
+from pipeline.raw_store import SnapshotRef, read_snapshot_bytes
+from pipeline.schema import CORRIDOR_STATION_CODES, DEDUP_KEYS, SCHEMA
+
+_TIMESTAMP_COLUMNS = (
+    "scheduled_arrival_utc",
+    "estimated_arrival_utc",
+    "scheduled_departure_utc",
+    "estimated_departure_utc",
+)
+
+# Raw timestamps are either "...Z" or carry an explicit offset ("...-05:00");
+# %z accepts both.  Unparseable or empty strings become null.
+_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+
+_CORRIDOR_VALUE_SET = pa.array(sorted(CORRIDOR_STATION_CODES), pa.string())
+
+
+# ---------------------------------------------------------------------------
+# Vectorized parsing helpers
+# ---------------------------------------------------------------------------
+def _parse_timestamps(values: list[str | None]) -> pa.Array:
+    """Parse ISO-8601 strings to timestamp[us, UTC]; invalid values → null."""
+    parsed = pc.strptime(
+        pa.array(values, pa.string()),
+        format=_TIMESTAMP_FORMAT,
+        unit="us",
+        error_is_null=True,
+    )
+    return parsed.cast(pa.timestamp("us", tz="UTC"))
+
+
+def _parse_dates(values: list[str | None]) -> pa.Array:
+    """Parse YYYY-MM-DD strings to date32; invalid values → null."""
+    parsed = pc.strptime(
+        pa.array(values, pa.string()),
+        format="%Y-%m-%d",
+        unit="s",
+        error_is_null=True,
+    )
+    return parsed.cast(pa.date32())
+
+
+# ---------------------------------------------------------------------------
+# Flattening
+# ---------------------------------------------------------------------------
+def flatten_data(data: dict[str, Any], scrape_date_est: date) -> pa.Table:
+    """Return a SCHEMA-conformant table for one parsed JSON snapshot."""
+    return flatten_trains(data.items(), scrape_date_est)
+
+
+def flatten_trains(
+    trains: Iterable[tuple[str, dict[str, Any]]], scrape_date_est: date
+) -> pa.Table:
+    """
+    Return a SCHEMA-conformant table for the (train_key, train) members of
+    one snapshot, consumed in order — each train is done with before the
+    next is taken.
+    """
+    laps = runlog.laps()
+
+    # Train-level buffers (one entry per train with at least one stop)
+    train_keys: list[str] = []
+    instances: list[str | None] = []
+    origins: list[str | None] = []
+    destinations: list[str | None] = []
+    departed: list[bool] = []
+    arrived: list[bool] = []
+    stop_counts: list[int] = []
+
+    # Stop-level buffers
+    station_names: list[str | None] = []
+    station_codes: list[str | None] = []
+    delays: list[Any] = []
+    diffs: list[str | None] = []
+    # All four timestamp columns share one buffer, laid out column after
+    # column, so they can be parsed in a single call.
+    timestamps: list[list[str | None]] = [[] for _ in _TIMESTAMP_COLUMNS]
+    sched_arr, est_arr, sched_dep, est_dep = (t.append for t in timestamps)
+
+    for train_key, train in trains:
+        times = train.get("times", [])
+        if not times:
+            continue
+
+        train_keys.append(train_key)
+        instances.append(train.get("instance", ""))
+        origins.append(train.get("from", ""))
+        destinations.append(train.get("to", ""))
+        departed.append(bool(train.get("departed", False)))
+        arrived.append(bool(train.get("arrived", False)))
+        stop_counts.append(len(times))
+
+        for stop in times:
+            arrival = stop.get("arrival") or {}
+            departure = stop.get("departure") or {}
+            station_names.append(stop.get("station", ""))
+            station_codes.append(stop.get("code", ""))
+            delays.append(stop.get("diffMin"))
+            diffs.append(stop.get("diff"))
+            sched_arr(arrival.get("scheduled"))
+            est_arr(arrival.get("estimated"))
+            sched_dep(departure.get("scheduled"))
+            est_dep(departure.get("estimated"))
+
+    n_rows = len(station_codes)
+    laps.lap("flatten", rows=n_rows)
+    if n_rows == 0:
+        return SCHEMA.empty_table()
+
+    # Expand train-level values to one entry per stop
+    counts = np.asarray(stop_counts, dtype=np.int64)
+    train_index = pa.array(np.repeat(np.arange(len(counts)), counts))
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    stop_sequence = np.arange(n_rows, dtype=np.int64) - starts
+
+    def per_stop(values: list, type_: pa.DataType) -> pa.Array:
+        return pa.array(values, type_).take(train_index)
+
+    train_key_arr = pa.array(train_keys, pa.string())
+    train_number_arr = pa.array([k.split()[0] for k in train_keys], pa.string())
+
+    parsed_ts = _parse_timestamps([v for col in timestamps for v in col])
+    laps.lap("parse_timestamps", rows=n_rows)
+    ts_columns = {
+        name: parsed_ts.slice(i * n_rows, n_rows)
+        for i, name in enumerate(_TIMESTAMP_COLUMNS)
+    }
+
+    # int() semantics of the legacy path: floats are truncated, not rejected
+    delay_arr = pa.array(delays).cast(pa.int32(), safe=False)
+    station_code_arr = pa.array(station_codes, pa.string())
+
+    columns = {
+        "scrape_date_est": pa.repeat(pa.scalar(scrape_date_est, pa.date32()), n_rows),
+        "train_key": train_key_arr.take(train_index),
+        "train_number": train_number_arr.take(train_index),
+        "service_date": _parse_dates(instances).take(train_index),
+        "origin": per_stop(origins, pa.string()),
+        "destination": per_stop(destinations, pa.string()),
+        "departed": per_stop(departed, pa.bool_()),
+        "arrived": per_stop(arrived, pa.bool_()),
+        "stop_sequence": pa.array(stop_sequence).cast(pa.int32()),
+        "station_name": pa.array(station_names, pa.string()),
+        "station_code": station_code_arr,
+        **ts_columns,
+        "delay_minutes": delay_arr,
+        "diff_status": pa.array(diffs, pa.string()),
+        "is_corridor": pc.fill_null(
+            pc.is_in(station_code_arr, value_set=_CORRIDOR_VALUE_SET), False
+        ),
+    }
+
+    table = pa.Table.from_arrays(
+        [columns[name] for name in SCHEMA.names], schema=SCHEMA
+    )
+    laps.lap("build_table", rows=n_rows)
+    return table
+
+
+def flatten_file(source: Path | SnapshotRef, scrape_date_est: date) -> pa.Table:
+    """
+    Return a SCHEMA-conformant table for one raw snapshot, given either the
+    path of a loose JSON file or a SnapshotRef from the raw store.
+    """
+    with runlog.stage("read") as record:
+        payload = read_snapshot_bytes(source)
+        record["bytes"] = len(payload)
+    return flatten_trains(iter_items(payload), scrape_date_est)
+
+
+# ---------------------------------------------------------------------------
+# Deduplication
+# ---------------------------------------------------------------------------
+def dedup_table(table: pa.Table, keys: list[str] = DEDUP_KEYS) -> pa.Table:
+    """
+    Drop duplicate rows on *keys*, keeping the last occurrence and the
+    original row order (same semantics as ``drop_duplicates(keep="last")``).
+    """
+    with runlog.stage("dedup", rows=table.num_rows):
+        return _dedup(table, keys)
+
+
+def _dedup(table: pa.Table, keys: list[str]) -> pa.Table:
+    if table.num_rows == 0:
+        return table
+    last = (
+        table.select(keys)
+        .append_column("_row", pa.array(np.arange(table.num_rows)))
+        .group_by(keys, use_threads=False)
+        .aggregate([("_row", "max")])
+        .column("_row_max")
+    )
+    if len(last) == table.num_rows:
+        return table
+    return table.take(np.sort(last.to_numpy()))
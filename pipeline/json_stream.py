@@ -0,0 +1,158 @@
+"""
+json_stream.py — Incremental decoding of a snapshot's top-level object, one
+train at a time.
+
+allData.json is a single object mapping each train key to its train.
+``json.loads`` builds the whole tree before anything can look at it, so
+the payload and every train's dicts are alive at once, and nothing
+downstream starts until the last byte has been decoded.  ``ObjectItems``
+instead yields the object's members as they complete: each value is
+decoded by the stdlib's C scanner (``JSONDecoder.raw_decode``) straight
+from the buffer, only the framing between members — braces, colons and
+commas — is walked in Python, and a consumer that keeps what it needs
+from each train lets the train itself be freed before the next one is
+decoded.
+
+Data can be fed in arbitrary chunks (a network stream); a member split
+across chunks is decoded again once the buffered part has doubled, so
+tiny chunks cost amortized linear time.  ``iter_items`` is the one-shot
+form for a payload already in memory.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from collections.abc import Iterator
+from typing import Any
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Parser states
+_START, _FIRST_KEY, _KEY, _AFTER_VALUE, _END = range(5)
+
+
+class ObjectItems:
+    """
+    Incremental parser for one JSON object: ``feed`` it bytes (or text) and
+    iterate the (key, value) members completed so far; ``close`` checks that
+    the object was complete.  Malformed input raises json.JSONDecodeError
+    (a ValueError), as ``json.loads`` would.
+    """
+
+    def __init__(self) -> None:
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._state = _START
+        # Buffered length of an incomplete member before it is retried
+        self._retry_at = 0
+
+    def feed(self, chunk: bytes | str) -> Iterator[tuple[str, Any]]:
+        """
+        Add *chunk* and yield the members it completes.  Consume the
+        iterator before feeding the next chunk.
+        """
+        text = chunk if isinstance(chunk, str) else self._utf8.decode(chunk)
+        if text:
+            self._buffer = self._buffer[self._pos:] + text
+            self._pos = 0
+        return self._items(final=False)
+
+    def close(self) -> Iterator[tuple[str, Any]]:
+        """Yield any last members and raise if the object is incomplete."""
+        tail = self._utf8.decode(b"", final=True)
+        if tail:
+            self._buffer = self._buffer[self._pos:] + tail
+            self._pos = 0
+        yield from self._items(final=True)
+        if self._state != _END:
+            raise json.JSONDecodeError("Unterminated object", self._buffer, len(self._buffer))
+
+    def _error(self, message: str, pos: int) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self._buffer, pos)
+
+    def _skip(self, pos: int) -> int:
+        return _WHITESPACE.match(self._buffer, pos).end()
+
+    def _decode(self, pos: int, final: bool) -> tuple[Any, int] | None:
+        """Decode the value at *pos*, or None if it may continue in a later chunk."""
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None
+        # A number (or literal) running to the end of the buffer may be cut
+        if end == len(self._buffer) and not final:
+            return None
+        return value, end
+
+    def _items(self, final: bool) -> Iterator[tuple[str, Any]]:
+        buffer = self._buffer
+        while True:
+            pos = self._skip(self._pos)
+            if pos == len(buffer):
+                self._pos = pos
+                return
+            char = buffer[pos]
+
+            if self._state == _START:
+                if char != "{":
+                    raise self._error("Expecting '{'", pos)
+                self._pos, self._state = pos + 1, _FIRST_KEY
+
+            elif self._state in (_FIRST_KEY, _KEY):
+                if char == "}" and self._state == _FIRST_KEY:
+                    self._pos, self._state = pos + 1, _END
+                    continue
+                if char != '"':
+                    raise self._error("Expecting property name enclosed in double quotes", pos)
+                # Key, colon and value are consumed together: nothing is
+                # committed until the whole member is in the buffer.
+                if not final and len(buffer) - pos < self._retry_at:
+                    return
+                self._retry_at = 2 * (len(buffer) - pos)
+                decoded = self._decode(pos, final)
+                if decoded is None:
+                    return
+                key, end = decoded
+                colon = self._skip(end)
+                if colon == len(buffer):
+                    if final:
+                        raise self._error("Expecting ':' delimiter", colon)
+                    return
+                if buffer[colon] != ":":
+                    raise self._error("Expecting ':' delimiter", colon)
+                start = self._skip(colon + 1)
+                if start == len(buffer):
+                    if final:
+                        raise self._error("Expecting value", start)
+                    return
+                decoded = self._decode(start, final)
+                if decoded is None:
+                    return
+                value, end = decoded
+                self._pos, self._state, self._retry_at = end, _AFTER_VALUE, 0
+                yield key, value
+
+            elif self._state == _AFTER_VALUE:
+                if char == ",":
+                    self._state = _KEY
+                elif char == "}":
+                    self._state = _END
+                else:
+                    raise self._error("Expecting ',' delimiter", pos)
+                self._pos = pos + 1
+
+            else:
+                raise self._error("Extra data", pos)
+
+
+def iter_items(payload: bytes | str) -> Iterator[tuple[str, Any]]:
+    """Yield the (key, value) members of the JSON object in *payload*, in order."""
+    parser = ObjectItems()
+    yield from parser.feed(payload)
+    yield from parser.close()
@@ -0,0 +1,42 @@
+"""
+lateness.py — On-time and lateness definitions, derived from delay_minutes.
+
+The stop-level partitions store only delay_minutes; whether a stop counts as
+on time or N minutes late is decided here, with Arrow compute kernels over
+the whole column, where the counts are needed — the rollup cube (see
+pipeline/rollup.py).  Changing a threshold below therefore means rebuilding
+the rollups (build_historical.py), not re-ingesting the raw snapshots, and
+the API applies any other threshold to delay_minutes at query time
+(``?late_threshold=N``).
+"""
+
+from __future__ import annotations
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# ---------------------------------------------------------------------------
+# Thresholds (minutes)
+# ---------------------------------------------------------------------------
+ON_TIME_MAX_MINUTES = 5
+LATE_THRESHOLDS = (15, 60)
+
+
+def late_measure(threshold: int) -> str:
+    """Name of the count of stops at least *threshold* minutes late."""
+    return f"late_{threshold}"
+
+
+# Counts derived from delay_minutes, in rollup order
+LATENESS_MEASURES = ["on_time", *(late_measure(t) for t in LATE_THRESHOLDS)]
+
+
+def lateness_flags(delay: pa.Array | pa.ChunkedArray) -> dict[str, pa.Array | pa.ChunkedArray]:
+    """
+    Return one boolean column per LATENESS_MEASURES entry for the
+    delay_minutes column *delay*; stops without delay data are null.
+    """
+    flags = {"on_time": pc.less_equal(delay, ON_TIME_MAX_MINUTES)}
+    for threshold in LATE_THRESHOLDS:
+        flags[late_measure(threshold)] = pc.greater_equal(delay, threshold)
+    return flags
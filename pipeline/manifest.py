@@ -0,0 +1,170 @@
+"""
+manifest.py — Record of which raw snapshots have been processed.
+
+The manifest lives next to the partitions as ``_manifest.parquet`` (the
+leading underscore keeps it out of dataset scans) and holds one entry per
+raw file:
+
+    name      file name inside raw_data/
+    size      size in bytes
+    mtime_ns  modification time
+    sha256    content hash
+    est_date  EST calendar day the scrape belongs to
+    rows      rows this file contributed to its partition, or null if the
+              file was superseded by a later scrape of the same day
+
+A rescan only hashes files whose size or mtime changed (bundle members
+carry their hash, so packing never forces a rehash), and only EST days
+whose set of files actually changed content need to be rebuilt.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import asdict, dataclass, replace
+from datetime import date
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pipeline.raw_files import est_date_of
+from pipeline.raw_store import iter_snapshots
+
+MANIFEST_FILENAME = "_manifest.parquet"
+
+MANIFEST_SCHEMA = pa.schema([
+    pa.field("name", pa.string()),
+    pa.field("size", pa.int64()),
+    pa.field("mtime_ns", pa.int64()),
+    pa.field("sha256", pa.string()),
+    pa.field("est_date", pa.date32()),
+    pa.field("rows", pa.int64()),
+])
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    name: str
+    size: int
+    mtime_ns: int
+    sha256: str
+    est_date: date
+    rows: int | None = None
+
+
+# ---------------------------------------------------------------------------
+# Persistence
+# ---------------------------------------------------------------------------
+def manifest_path(dataset_dir: Path) -> Path:
+    return dataset_dir / MANIFEST_FILENAME
+
+
+def load_manifest(dataset_dir: Path) -> dict[str, ManifestEntry]:
+    """Return the manifest keyed by file name (empty if none exists yet)."""
+    path = manifest_path(dataset_dir)
+    if not path.exists():
+        return {}
+    rows = pq.read_table(path, schema=MANIFEST_SCHEMA).to_pylist()
+    return {row["name"]: ManifestEntry(**row) for row in rows}
+
+
+def save_manifest(dataset_dir: Path, entries: dict[str, ManifestEntry]) -> None:
+    """Atomically write *entries* as the manifest of *dataset_dir*."""
+    ordered = [entries[name] for name in sorted(entries)]
+    table = pa.Table.from_pylist([asdict(e) for e in ordered], schema=MANIFEST_SCHEMA)
+    path = manifest_path(dataset_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+# ---------------------------------------------------------------------------
+# Scanning
+# ---------------------------------------------------------------------------
+def file_digest(path: Path) -> str:
+    """Return the SHA-256 hex digest of *path*."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def scan_raw_dir(
+    raw_dir: Path,
+    manifest: dict[str, ManifestEntry],
+    since: date | None = None,
+) -> tuple[dict[str, ManifestEntry], set[date]]:
+    """
+    Reconcile *manifest* with the snapshots currently in *raw_dir* (loose
+    files and bundle members alike).
+
+    Returns ``(entries, dirty_days)``: the updated manifest and the EST days
+    whose files were added, removed or changed content.  Files that still
+    match their manifest size and mtime are not re-read.  With *since*,
+    days before that date are left exactly as recorded.
+    """
+    entries: dict[str, ManifestEntry] = {}
+    dirty_days: set[date] = set()
+
+    for ref in iter_snapshots(raw_dir, since=since):
+        name = ref.name
+        old = manifest.get(name)
+        est_date = old.est_date if old else est_date_of(name)
+        if est_date is None:
+            continue
+        if since is not None and est_date < since:
+            if old:
+                entries[name] = old
+            continue
+
+        if old and old.size == ref.size and old.mtime_ns == ref.mtime_ns:
+            entries[name] = old
+            continue
+
+        # Size or mtime changed (a fresh git checkout touches every file, and
+        # packing moves it into a bundle), so fall back to the content hash
+        # to decide whether it is new.
+        digest = ref.sha256 or file_digest(ref.container)
+        if old and old.sha256 == digest:
+            entries[name] = replace(old, size=ref.size, mtime_ns=ref.mtime_ns)
+            continue
+
+        entries[name] = ManifestEntry(
+            name=name,
+            size=ref.size,
+            mtime_ns=ref.mtime_ns,
+            sha256=digest,
+            est_date=est_date,
+        )
+        dirty_days.add(est_date)
+
+    for name, old in manifest.items():
+        if name in entries:
+            continue
+        if since is not None and old.est_date < since:
+            entries[name] = old
+            continue
+        dirty_days.add(old.est_date)
+
+    return entries, dirty_days
+
+
+def files_for_day(entries: dict[str, ManifestEntry], est_date: date) -> list[str]:
+    """Return the names of all files of *est_date*, oldest scrape first."""
+    # Names embed an ISO timestamp, so lexical order is chronological.
+    return sorted(name for name, e in entries.items() if e.est_date == est_date)
+
+
+def record_day(
+    entries: dict[str, ManifestEntry],
+    est_date: date,
+    selected: str | None,
+    rows: int | None,
+) -> None:
+    """Mark *selected* as the file behind *est_date*'s partition, in place."""
+    for name in files_for_day(entries, est_date):
+        entries[name] = replace(entries[name], rows=rows if name == selected else None)
@@ -0,0 +1,208 @@
+"""
+priors.py — Historical delay priors for fallback predictions.
+
+The API answers /api/predict without a trained model (and fills gaps the
+model cannot cover) from the historical delay distribution of each
+
+    (train_number, station_code, day_of_week)
+
+where day_of_week is the weekday of the run's service date (Monday = 0),
+and of each run key (train_key, e.g. "2 (03-28)"), which is what the API
+asks for when it has no station to go by.  The pipeline keeps two things
+inside the dataset directory:
+
+* ``_priors/scrape_date_est=YYYY-MM-DD/part-0.parquet`` — one delay
+  histogram per partition: the number of stops of each key (and run key)
+  with each delay (whole minutes).  Histograms are additive, so a day is replaced
+  without reading any other day's rows, exactly like the rollup cube;
+* ``_priors.parquet`` — the priors table: count, mean, median and p90 of
+  the delay for every key, and for the coarser keys of the fallback chain
+  (train_number, station_code), (train_key,) and (train_number,), with the
+  dropped columns null.  It is recomputed from the summed histograms, which are a
+  few hundred thousand rows whatever the age of the history.
+
+Quantiles are exact: median and p90 are interpolated linearly between
+order statistics, as ``pandas.Series.quantile`` does on the raw delays.
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from pipeline.dataset import (
+    PARTITION_COLUMN,
+    delete_partition,
+    partition_days,
+    partition_path,
+    read_partition,
+    write_partition,
+)
+from pipeline.schema import SCHEMA
+
+PRIORS_DIRNAME = "_priors"
+PRIORS_FILENAME = "_priors.parquet"
+
+PRIOR_KEYS = ["train_key", "train_number", "station_code", "day_of_week"]
+
+# Fallback chain, most specific first: a run key's own history comes before
+# that of every run of its train number
+PRIOR_LEVELS = [
+    ("train_number", "station_code", "day_of_week"),
+    ("train_number", "station_code"),
+    ("train_key",),
+    ("train_number",),
+]
+
+HISTOGRAM_SCHEMA = pa.schema([
+    SCHEMA.field(PARTITION_COLUMN),
+    SCHEMA.field("train_key"),
+    SCHEMA.field("train_number"),
+    SCHEMA.field("station_code"),
+    pa.field("day_of_week", pa.int8()),
+    SCHEMA.field("delay_minutes"),
+    pa.field("count", pa.int64()),
+])
+
+PRIORS_SCHEMA = pa.schema([
+    SCHEMA.field("train_key"),
+    SCHEMA.field("train_number"),
+    SCHEMA.field("station_code"),
+    pa.field("day_of_week", pa.int8()),
+    pa.field("count", pa.int64()),
+    pa.field("mean", pa.float64()),
+    pa.field("median", pa.float64()),
+    pa.field("p90", pa.float64()),
+])
+
+
+def priors_dir(root: Path) -> Path:
+    """Return the per-day histogram directory of the dataset at *root*."""
+    return root / PRIORS_DIRNAME
+
+
+def priors_path(root: Path) -> Path:
+    """Return the priors table of the dataset at *root*."""
+    return root / PRIORS_FILENAME
+
+
+# ---------------------------------------------------------------------------
+# Per-day histograms
+# ---------------------------------------------------------------------------
+def build_histogram(table: pa.Table) -> pa.Table:
+    """Count the SCHEMA rows with delay data per PRIOR_KEYS × delay_minutes."""
+    table = table.filter(pc.is_valid(table["delay_minutes"]))
+    day_of_week = pc.day_of_week(table["service_date"], count_from_zero=True, week_start=1)
+    table = table.select([PARTITION_COLUMN, "train_key", "train_number", "station_code", "delay_minutes"])
+    table = table.append_column("day_of_week", day_of_week.cast(pa.int8()))
+
+    keys = [PARTITION_COLUMN, *PRIOR_KEYS, "delay_minutes"]
+    grouped = table.group_by(keys, use_threads=False).aggregate(
+        [("delay_minutes", "count", pc.CountOptions("all"))]
+    )
+    columns = {k: grouped[k] for k in keys}
+    columns["count"] = grouped["delay_minutes_count"]
+    histogram = pa.table(columns).select(HISTOGRAM_SCHEMA.names).cast(HISTOGRAM_SCHEMA)
+    return histogram.sort_by([(k, "ascending") for k in keys])
+
+
+def write_histogram(root: Path, table: pa.Table, scrape_date_est: date) -> Path:
+    """Store the delay histogram of one day's SCHEMA *table* under *root*/_priors/."""
+    return write_partition(priors_dir(root), build_histogram(table), scrape_date_est)
+
+
+def delete_histogram(root: Path, scrape_date_est: date) -> bool:
+    """Remove the histogram partition for *scrape_date_est*, if any."""
+    return delete_partition(priors_dir(root), scrape_date_est)
+
+
+def _histogram_current(root: Path, scrape_date_est: date) -> bool:
+    names = pq.read_schema(partition_path(priors_dir(root), scrape_date_est)).names
+    return set(HISTOGRAM_SCHEMA.names).difference([PARTITION_COLUMN]).issubset(names)
+
+
+# ---------------------------------------------------------------------------
+# Priors table
+# ---------------------------------------------------------------------------
+def _summarize_level(histogram: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    counts = (
+        histogram
+        .groupby([*keys, "delay_minutes"], sort=True, dropna=False)["count"]
+        .sum()
+    )
+    delay = counts.index.get_level_values("delay_minutes").to_numpy(dtype=np.float64)
+    count = counts.to_numpy(dtype=np.int64)
+    per_key = pd.DataFrame({"count": count, "weighted": delay * count}, index=counts.index)
+    grouped = per_key.groupby(level=keys, sort=False, dropna=False).sum()
+
+    n = grouped["count"].to_numpy()
+    start = np.cumsum(n) - n
+    cumulative = np.cumsum(count)
+
+    def quantile(q: float) -> np.ndarray:
+        # Linear interpolation between the order statistics around q·(n-1)
+        position = q * (n - 1)
+        lower, upper = np.floor(position), np.ceil(position)
+        low = delay[np.searchsorted(cumulative, start + lower, side="right")]
+        high = delay[np.searchsorted(cumulative, start + upper, side="right")]
+        return low + (position - lower) * (high - low)
+
+    level = grouped.index.to_frame(index=False)
+    level["count"] = n
+    level["mean"] = grouped["weighted"].to_numpy() / n
+    level["median"] = quantile(0.5)
+    level["p90"] = quantile(0.9)
+    return level
+
+
+def build_priors(histogram: pa.Table) -> pa.Table:
+    """Sum HISTOGRAM_SCHEMA rows over days into the PRIORS_SCHEMA table."""
+    frame = histogram.select([*PRIOR_KEYS, "delay_minutes", "count"]).to_pandas()
+    levels = []
+    for keys in PRIOR_LEVELS:
+        # Runs without a service date only count towards the coarser levels
+        subset = frame.dropna(subset=["day_of_week"]) if "day_of_week" in keys else frame
+        levels.append(_summarize_level(subset, list(keys)))
+    priors = pd.concat(levels, ignore_index=True)
+    for column in PRIOR_KEYS:
+        if column not in priors:
+            priors[column] = None
+    return pa.Table.from_pandas(priors[PRIORS_SCHEMA.names], schema=PRIORS_SCHEMA, preserve_index=False)
+
+
+def write_priors(root: Path) -> Path:
+    """
+    (Re)write the priors table of the dataset at *root* from its histogram
+    partitions; call after the partitions are final.  Histograms missing
+    for a partition (datasets built before priors existed) or without a
+    key column (built before it was added) are built from it first, and
+    histograms of removed partitions are dropped.
+    """
+    days = set(partition_days(root))
+    histogram_days = set(partition_days(priors_dir(root)))
+    current_days = {day for day in histogram_days & days if _histogram_current(root, day)}
+    for day in sorted(days - current_days):
+        write_histogram(root, read_partition(root, day), day)
+    for day in sorted(histogram_days - days):
+        delete_histogram(root, day)
+
+    path = priors_path(root)
+    if not days:
+        path.unlink(missing_ok=True)
+        return path
+
+    histogram = ds.dataset(
+        priors_dir(root), schema=HISTOGRAM_SCHEMA, format="parquet", partitioning="hive"
+    ).to_table()
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    pq.write_table(build_priors(histogram), tmp_path)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,35 @@
+"""
+raw_files.py — Naming conventions of the raw snapshots in raw_data/.
+
+Each scrape is saved as ``Via_data_<UTC timestamp>.json``; the timestamp in
+the name is the only record of when the scrape ran.
+"""
+
+from __future__ import annotations
+
+import re
+from datetime import date, datetime
+
+from pipeline.schema import EST, UTC
+
+RAW_GLOB = "Via_data_*.json"
+
+_FILENAME_RE = re.compile(
+    r"Via_data_(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})"
+)
+
+
+def parse_utc_timestamp(filename: str) -> datetime | None:
+    """Return the UTC datetime encoded in a raw-data filename, or None."""
+    m = _FILENAME_RE.search(filename)
+    if not m:
+        return None
+    return datetime.strptime(m.group(1), "%Y-%m-%d %H:%M:%S").replace(tzinfo=UTC)
+
+
+def est_date_of(filename: str) -> date | None:
+    """Return the EST calendar day a raw-data filename belongs to, or None."""
+    ts_utc = parse_utc_timestamp(filename)
+    if ts_utc is None:
+        return None
+    return ts_utc.astimezone(EST).date()
@@ -0,0 +1,308 @@
+"""
+raw_store.py — Compressed archive of raw snapshots.
+
+Scrapes land in raw_data/ as loose ``Via_data_<UTC timestamp>.json`` files.
+Once an EST day is complete its files can be packed into a single bundle:
+
+    raw_data/bundles/Via_bundle_YYYY-MM-DD.parquet
+
+A bundle is a Parquet file with one row per snapshot (name, sha256, size,
+payload).  The payload column is zstd-compressed as a single page, so the
+alert texts, station lists and schedules that repeat from one scrape to the
+next are stored roughly once per day; on the existing archive this is
+~15–20× smaller than the loose JSON.  Payload bytes are kept verbatim, so
+hashes recorded in the manifest stay valid after packing, and the name /
+sha256 / size columns can be read without decompressing any payload.
+
+Readers never need to know where a snapshot lives: ``iter_snapshots``
+lists loose files and bundle members alike, and ``load_snapshot`` accepts
+either a loose-file Path or a SnapshotRef.
+
+Usage (one-shot migration of the existing archive, then nightly):
+    python -m pipeline.raw_store pack --all
+    python -m pipeline.raw_store pack
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+from collections import defaultdict
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pipeline.raw_files import RAW_GLOB, est_date_of
+from pipeline.schema import EST, UTC
+
+BUNDLE_DIRNAME = "bundles"
+BUNDLE_PREFIX = "Via_bundle_"
+
+BUNDLE_SCHEMA = pa.schema([
+    pa.field("name", pa.string()),
+    pa.field("sha256", pa.string()),
+    pa.field("size", pa.int64()),
+    pa.field("payload", pa.binary()),
+])
+
+_COMPRESSION_LEVEL = 9
+# One page per column chunk lets zstd see every snapshot of the day at once.
+_DATA_PAGE_SIZE = 1 << 28
+
+
+@dataclass(frozen=True)
+class SnapshotRef:
+    """Location of one raw snapshot, either a loose file or a bundle member."""
+
+    name: str
+    container: Path
+    size: int
+    mtime_ns: int
+    sha256: str | None = None  # known up front for bundle members only
+
+    @property
+    def in_bundle(self) -> bool:
+        return self.container.name != self.name
+
+
+# ---------------------------------------------------------------------------
+# Paths
+# ---------------------------------------------------------------------------
+def bundle_dir(raw_dir: Path) -> Path:
+    return raw_dir / BUNDLE_DIRNAME
+
+
+def bundle_path(raw_dir: Path, est_date: date) -> Path:
+    return bundle_dir(raw_dir) / f"{BUNDLE_PREFIX}{est_date.isoformat()}.parquet"
+
+
+def _bundle_date(path: Path) -> date | None:
+    try:
+        return date.fromisoformat(path.stem[len(BUNDLE_PREFIX):])
+    except ValueError:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Listing
+# ---------------------------------------------------------------------------
+def _bundle_members(path: Path) -> Iterator[SnapshotRef]:
+    st = path.stat()
+    index = pq.read_table(path, columns=["name", "sha256", "size"])
+    for row in index.to_pylist():
+        yield SnapshotRef(
+            name=row["name"],
+            container=path,
+            size=row["size"],
+            mtime_ns=st.st_mtime_ns,
+            sha256=row["sha256"],
+        )
+
+
+def iter_snapshots(raw_dir: Path, since: date | None = None) -> Iterator[SnapshotRef]:
+    """
+    Yield every snapshot in *raw_dir*, loose or bundled.
+
+    A loose file shadows a bundle member of the same name.  With *since*,
+    bundles of earlier EST days are skipped without being opened (loose
+    files are always yielded; callers filter them by name).
+    """
+    loose: set[str] = set()
+    for path in raw_dir.glob(RAW_GLOB):
+        st = path.stat()
+        loose.add(path.name)
+        yield SnapshotRef(
+            name=path.name, container=path, size=st.st_size, mtime_ns=st.st_mtime_ns
+        )
+
+    for path in sorted(bundle_dir(raw_dir).glob(f"{BUNDLE_PREFIX}*.parquet")):
+        day = _bundle_date(path)
+        if day is None or (since is not None and day < since):
+            continue
+        for ref in _bundle_members(path):
+            if ref.name not in loose:
+                yield ref
+
+
+def find_snapshot(raw_dir: Path, name: str) -> SnapshotRef | None:
+    """Return the SnapshotRef for *name*, or None if it is not in the store."""
+    path = raw_dir / name
+    if path.exists():
+        st = path.stat()
+        return SnapshotRef(name=name, container=path, size=st.st_size, mtime_ns=st.st_mtime_ns)
+
+    day = est_date_of(name)
+    if day is None:
+        return None
+    bundle = bundle_path(raw_dir, day)
+    if not bundle.exists():
+        return None
+    return next((ref for ref in _bundle_members(bundle) if ref.name == name), None)
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+def read_snapshot_bytes(source: Path | SnapshotRef) -> bytes:
+    """Return the raw JSON bytes of a loose file or bundle member."""
+    if isinstance(source, Path):
+        return source.read_bytes()
+    if not source.in_bundle:
+        return source.container.read_bytes()
+    table = pq.read_table(
+        source.container,
+        columns=["payload"],
+        filters=[("name", "=", source.name)],
+    )
+    if table.num_rows == 0:
+        raise FileNotFoundError(f"{source.name} not found in {source.container}")
+    return table.column("payload")[0].as_py()
+
+
+def load_snapshot(source: Path | SnapshotRef) -> dict[str, Any]:
+    """Return the parsed allData.json payload of one snapshot."""
+    return json.loads(read_snapshot_bytes(source))
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+def snapshot_name(scraped_at: datetime) -> str:
+    """Return the loose-file name for a scrape taken at *scraped_at*."""
+    return f"Via_data_{scraped_at.astimezone(UTC).replace(tzinfo=None)}.json"
+
+
+def write_snapshot(raw_dir: Path, payload: bytes, scraped_at: datetime) -> Path:
+    """
+    Atomically add one scrape to *raw_dir* as a loose file.  The payload is
+    written under a dot-prefixed temporary name (invisible to RAW_GLOB) and
+    renamed into place, so readers never see a partial snapshot.
+    """
+    path = raw_dir / snapshot_name(scraped_at)
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "wb") as fh:
+        fh.write(payload)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Packing
+# ---------------------------------------------------------------------------
+def pack_day(raw_dir: Path, est_date: date, paths: list[Path]) -> Path:
+    """
+    Add the loose files *paths* (all from *est_date*) to that day's bundle
+    and delete them once the bundle has been written and verified.
+    """
+    members: dict[str, tuple[str, bytes]] = {}
+
+    target = bundle_path(raw_dir, est_date)
+    if target.exists():
+        existing = pq.read_table(target, schema=BUNDLE_SCHEMA)
+        for row in existing.to_pylist():
+            members[row["name"]] = (row["sha256"], row["payload"])
+
+    for path in paths:
+        payload = path.read_bytes()
+        members[path.name] = (hashlib.sha256(payload).hexdigest(), payload)
+
+    names = sorted(members)
+    table = pa.table(
+        {
+            "name": names,
+            "sha256": [members[n][0] for n in names],
+            "size": [len(members[n][1]) for n in names],
+            "payload": [members[n][1] for n in names],
+        },
+        schema=BUNDLE_SCHEMA,
+    )
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.tmp")
+    pq.write_table(
+        table,
+        tmp_path,
+        compression="zstd",
+        compression_level=_COMPRESSION_LEVEL,
+        use_dictionary=False,
+        data_page_size=_DATA_PAGE_SIZE,
+    )
+
+    # Never drop a loose file unless the bundle provably holds its bytes.
+    written = pq.read_table(tmp_path, columns=["name", "sha256"]).to_pydict()
+    if dict(zip(written["name"], written["sha256"])) != {n: members[n][0] for n in names}:
+        tmp_path.unlink()
+        raise RuntimeError(f"Verification of {target.name} failed; loose files kept")
+
+    os.replace(tmp_path, target)
+    for path in paths:
+        path.unlink()
+    return target
+
+
+def pack(raw_dir: Path, include_today: bool = False) -> None:
+    """Pack loose files of every complete EST day (or every day) into bundles."""
+    today_est = datetime.now(UTC).astimezone(EST).date()
+
+    by_day: dict[date, list[Path]] = defaultdict(list)
+    for path in raw_dir.glob(RAW_GLOB):
+        day = est_date_of(path.name)
+        if day is None or (day >= today_est and not include_today):
+            continue
+        by_day[day].append(path)
+
+    if not by_day:
+        print("No loose snapshots to pack.")
+        return
+
+    before = after = 0
+    for day in sorted(by_day):
+        paths = sorted(by_day[day])
+        size = sum(p.stat().st_size for p in paths)
+        target = pack_day(raw_dir, day, paths)
+        before += size
+        after += target.stat().st_size
+        print(f"  {day}  {len(paths)} file(s)  {size / 1e6:6.1f} MB → {target.name}")
+
+    print(
+        f"\nPacked {len(by_day)} day(s): {before / 1e6:,.1f} MB of loose JSON "
+        f"into bundles totalling {after / 1e6:,.1f} MB"
+    )
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Manage the compressed raw snapshot store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pack_cmd = sub.add_parser("pack", help="Pack loose snapshots into daily bundles")
+    pack_cmd.add_argument(
+        "--all",
+        action="store_true",
+        help="Also pack today's EST day (use once to migrate the whole archive)",
+    )
+    pack_cmd.add_argument(
+        "--raw-dir",
+        type=Path,
+        default=Path(__file__).resolve().parent.parent / "raw_data",
+        help="Raw snapshot directory (default: raw_data/)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "pack":
+        pack(args.raw_dir, include_today=args.all)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+replay_server.py — Local stand-in for tsimobile.viarail.ca that serves
+recorded snapshots from the raw store.
+
+Every ``--advance`` seconds the next recorded snapshot (oldest first,
+wrapping around) becomes current.  Responses carry an ETag (the snapshot's
+SHA-256) and Last-Modified header and honour If-None-Match /
+If-Modified-Since with 304, like a well-behaved CDN.  ``--fail-rate``
+injects random 503s to exercise the scraper's backoff.
+
+Usage:
+    python -m pipeline.replay_server --port 8765 --advance 5
+    python -m pipeline.scraper --url http://127.0.0.1:8765/data/allData.json \\
+        --interval 1 --raw-dir /tmp/replayed
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import random
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from pipeline.raw_files import parse_utc_timestamp
+from pipeline.raw_store import SnapshotRef, iter_snapshots, read_snapshot_bytes
+
+FEED_PATH = "/data/allData.json"
+
+
+class Replay:
+    """Thread-safe cursor over the recorded snapshots."""
+
+    def __init__(self, refs: list[SnapshotRef], advance: float) -> None:
+        self.refs = refs
+        self.advance = advance
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._cached: tuple[int, bytes, str, float] | None = None
+
+    def current(self) -> tuple[bytes, str, float]:
+        """Return (payload, etag, last_modified_epoch) of the current snapshot."""
+        index = int((time.monotonic() - self.started) / self.advance) % len(self.refs)
+        with self._lock:
+            if self._cached is None or self._cached[0] != index:
+                ref = self.refs[index]
+                payload = read_snapshot_bytes(ref)
+                etag = f'"{hashlib.sha256(payload).hexdigest()}"'
+                scraped = parse_utc_timestamp(ref.name)
+                modified = scraped.timestamp() if scraped else time.time()
+                self._cached = (index, payload, etag, modified)
+            _, payload, etag, modified = self._cached
+        return payload, etag, modified
+
+
+def make_handler(replay: Replay, fail_rate: float) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def do_GET(self) -> None:  # noqa: N802 — http.server API
+            if self.path.split("?")[0] != FEED_PATH:
+                self.send_error(404)
+                return
+            if random.random() < fail_rate:
+                self.send_error(503, "Injected failure")
+                return
+
+            payload, etag, modified = replay.current()
+            if self._not_modified(etag, modified):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", formatdate(modified, usegmt=True))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _not_modified(self, etag: str, modified: float) -> bool:
+            if_none_match = self.headers.get("If-None-Match")
+            if if_none_match is not None:
+                return etag in [t.strip() for t in if_none_match.split(",")]
+            if_modified_since = self.headers.get("If-Modified-Since")
+            if if_modified_since:
+                try:
+                    since = parsedate_to_datetime(if_modified_since).timestamp()
+                except (TypeError, ValueError):
+                    return False
+                return int(modified) <= since
+            return False
+
+        def log_message(self, format: str, *args) -> None:  # noqa: A002
+            pass
+
+    return Handler
+
+
+def serve(raw_dir: Path, host: str, port: int, advance: float, fail_rate: float) -> ThreadingHTTPServer:
+    """Return a server replaying *raw_dir*; call serve_forever() to start it."""
+    refs = sorted(iter_snapshots(raw_dir), key=lambda r: r.name)
+    if not refs:
+        raise SystemExit(f"No snapshots found in {raw_dir}")
+    return ThreadingHTTPServer((host, port), make_handler(Replay(refs, advance), fail_rate))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded snapshots over HTTP")
+    parser.add_argument(
+        "--raw-dir",
+        type=Path,
+        default=Path(__file__).resolve().parent.parent / "raw_data",
+        help="Raw store to replay (default: raw_data/)",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--advance", type=float, default=60.0, help="Seconds per recorded snapshot")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args(argv)
+
+    server = serve(args.raw_dir, args.host, args.port, args.advance, args.fail_rate)
+    print(f"Replaying {args.raw_dir} on http://{args.host}:{args.port}{FEED_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+rollup.py — Daily rollup cube of the clean dataset.
+
+Alongside every partition of clean_data/via_rail/ the pipeline stores a
+pre-aggregated partition with one row per
+
+    (scrape_date_est, train_number, station_code, origin, destination, is_corridor)
+
+holding additive counts and sums — stop count, stops with delay data, the
+delay sum and the on-time / ≥N minutes late counts, derived from
+delay_minutes with the thresholds of pipeline/lateness.py.  Any ratio the
+API serves (on-time %, average delay, …) for any combination of those
+dimensions is a sum of rows of this cube, so /api/performance and
+/api/summary never need the stop-level rows.
+
+The cube lives inside the dataset directory, in ``_rollup/`` (the leading
+underscore hides it from dataset scans of the stop-level partitions):
+
+    clean_data/via_rail/_rollup/scrape_date_est=YYYY-MM-DD/part-0.parquet
+
+so a full rebuild swaps it in together with the partitions it summarises.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from pipeline.dataset import PARTITION_COLUMN, delete_partition, write_partition
+from pipeline.lateness import LATENESS_MEASURES, lateness_flags
+from pipeline.schema import SCHEMA
+
+ROLLUP_DIRNAME = "_rollup"
+
+ROLLUP_DIMS = ["train_number", "station_code", "origin", "destination", "is_corridor"]
+ROLLUP_KEYS = [PARTITION_COLUMN, *ROLLUP_DIMS]
+
+# Additive measures.  delay_stops counts rows with delay data, which are
+# exactly the rows the on_time / late_* flags are defined for.
+ROLLUP_MEASURES = ["stops", "delay_stops", "delay_sum", *LATENESS_MEASURES]
+
+ROLLUP_SCHEMA = pa.schema(
+    [SCHEMA.field(k) for k in ROLLUP_KEYS]
+    + [pa.field(m, pa.int64()) for m in ROLLUP_MEASURES]
+)
+
+# (source column, aggregate function, measure)
+_AGGREGATES = [
+    ("train_key", "count_all", "stops"),
+    ("delay_minutes", "count", "delay_stops"),
+    ("delay_minutes", "sum", "delay_sum"),
+    # lateness_flags columns, added by build_rollup
+    *((f"_{m}", "sum", m) for m in LATENESS_MEASURES),
+]
+
+
+def rollup_dir(root: Path) -> Path:
+    """Return the rollup cube directory of the dataset at *root*."""
+    return root / ROLLUP_DIRNAME
+
+
+def build_rollup(table: pa.Table) -> pa.Table:
+    """Aggregate SCHEMA rows into ROLLUP_SCHEMA rows, sorted by ROLLUP_KEYS."""
+    table = table.select([*ROLLUP_KEYS, "train_key", "delay_minutes"])
+    for measure, flag in lateness_flags(table["delay_minutes"]).items():
+        table = table.append_column(f"_{measure}", flag)
+    grouped = table.group_by(ROLLUP_KEYS, use_threads=False).aggregate(
+        [(col, "count", pc.CountOptions("all")) if fn == "count_all" else (col, fn)
+         for col, fn, _ in _AGGREGATES]
+    )
+    columns = {k: grouped[k] for k in ROLLUP_KEYS}
+    for col, fn, measure in _AGGREGATES:
+        agg = "count" if fn == "count_all" else fn
+        columns[measure] = grouped[f"{col}_{agg}"].cast(pa.int64()).fill_null(0)
+    rollup = pa.table(columns, schema=ROLLUP_SCHEMA)
+    return rollup.sort_by([(k, "ascending") for k in ROLLUP_KEYS])
+
+
+def write_rollup(root: Path, table: pa.Table, scrape_date_est: date) -> Path:
+    """Store the rollup of one day's SCHEMA *table* under *root*/_rollup/."""
+    return write_partition(rollup_dir(root), build_rollup(table), scrape_date_est)
+
+
+def delete_rollup(root: Path, scrape_date_est: date) -> bool:
+    """Remove the rollup partition for *scrape_date_est*, if any."""
+    return delete_partition(rollup_dir(root), scrape_date_est)
@@ -0,0 +1,290 @@
+"""
+runlog.py — Per-stage timing and memory instrumentation for the pipeline.
+
+Code under measurement marks its stages with ``stage`` (a context manager)
+or, for straight-line code, ``laps``:
+
+    with runlog.stage("write_partition", rows=table.num_rows):
+        write_partition(...)
+
+Each finished stage becomes one record:
+
+    {"stage": "flatten", "file": "Via_data_….json", "est_date": "…",
+     "wall_s": 0.012, "cpu_s": 0.011, "rows": 474, "peak_rss_mb": 88.1}
+
+Nested stages inherit the fields of the enclosing one (file, est_date, …),
+so every record of a file can be grouped on ``file``; a stage that
+contains others is marked ``"nested": true`` (its time includes theirs).
+``peak_rss_mb`` is the high-water mark of the process's resident set
+during the stage: the kernel's peak (VmHWM) is reset when a stage starts
+(Linux /proc/self/clear_refs) and an enclosing stage reports the largest
+peak of its children too.  Where the reset is unavailable the process-wide peak
+(ru_maxrss) is reported instead.
+
+Records are only kept inside ``collect()`` — elsewhere ``stage`` costs two
+function calls — so the pipeline modules can be instrumented
+unconditionally.  Worker processes collect their own records and return
+them with their results.
+
+``RunLog`` is the scripts' side: it collects the main process's records,
+accepts the workers', and appends them all to a JSON-lines run log,
+preceded by one ``"stage": "run"`` summary line per run.  With profiling
+on, ``profiled`` wraps each file's processing in cProfile; the dumps of
+the slowest files are kept (pstats format: ``python -m pstats``,
+snakeviz, …) and the rest deleted.
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+RUN_LOG_PATH = Path(__file__).resolve().parent.parent / "logs" / "pipeline_runs.jsonl"
+DEFAULT_PROFILE_TOP = 5
+
+_STATUS_PATH = Path("/proc/self/status")
+_CLEAR_REFS_PATH = Path("/proc/self/clear_refs")
+
+# Records of the current collect() block (None: not collecting) and the
+# stack of open stages
+_records: list[dict[str, Any]] | None = None
+_open: list[_Span] = []
+_can_reset_peak: bool | None = None
+
+
+# ---------------------------------------------------------------------------
+# Memory
+# ---------------------------------------------------------------------------
+def _reset_peak() -> bool:
+    """Reset the kernel's peak-RSS counter of this process, if possible."""
+    global _can_reset_peak
+    if _can_reset_peak is False:
+        return False
+    try:
+        _CLEAR_REFS_PATH.write_text("5")
+        _can_reset_peak = True
+    except OSError:
+        _can_reset_peak = False
+    return _can_reset_peak
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set since the last reset (else since process start)."""
+    if _can_reset_peak:
+        for line in _STATUS_PATH.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+# ---------------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------------
+class _Span:
+    def __init__(self, name: str, fields: dict[str, Any], stacked: bool = True) -> None:
+        inherited = _open[-1].context if _open else {}
+        self.context = {k: v for k, v in {**inherited, **fields}.items() if k != "rows"}
+        self.record: dict[str, Any] = {"stage": name, **inherited, **fields}
+        self.stacked = stacked
+        self.peak = 0.0
+        _reset_peak()
+        if stacked:
+            _open.append(self)
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+    def finish(self) -> dict[str, Any]:
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        if self.stacked:
+            _open.remove(self)
+        # The enclosing stage's peak must cover the resets made by its children
+        peak = max(self.peak, _peak_rss_mb())
+        if _open:
+            _open[-1].peak = max(_open[-1].peak, peak)
+            _open[-1].record["nested"] = True
+        self.record.update(wall_s=round(wall, 6), cpu_s=round(cpu, 6), peak_rss_mb=round(peak, 1))
+        if _records is not None:
+            _records.append(self.record)
+        return self.record
+
+
+@contextmanager
+def stage(name: str, **fields: Any) -> Iterator[dict[str, Any]]:
+    """
+    Time the enclosed block as stage *name*.  Yields the record, so the
+    block can fill in fields known only at the end (``record["rows"] = n``).
+    """
+    if _records is None:
+        yield {}
+        return
+    span = _Span(name, fields)
+    try:
+        yield span.record
+    finally:
+        span.finish()
+
+
+class laps:
+    """
+    Consecutive stages of straight-line code: each ``lap(name)`` closes the
+    stage that ran since the previous lap (or since construction).  Laps
+    cannot contain stages; whatever runs after the last lap is left to the
+    enclosing stage.
+    """
+
+    def __init__(self) -> None:
+        self._span = _Span("", {}, stacked=False) if _records is not None else None
+
+    def lap(self, name: str, **fields: Any) -> None:
+        if self._span is None:
+            return
+        self._span.record.update(stage=name, **fields)
+        self._span.finish()
+        self._span = _Span("", {}, stacked=False)
+
+
+@contextmanager
+def collect() -> Iterator[list[dict[str, Any]]]:
+    """Keep the records of every stage finished inside the block."""
+    global _records
+    previous, _records = _records, []
+    try:
+        yield _records
+    finally:
+        _records = previous
+
+
+@contextmanager
+def profiled(profile_dir: Path | None, name: str) -> Iterator[None]:
+    """Run the block under cProfile and dump it to *profile_dir*/<name>.prof."""
+    if profile_dir is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(profile_dir / f"{name}.prof"))
+
+
+# ---------------------------------------------------------------------------
+# Run log
+# ---------------------------------------------------------------------------
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the scripts' --run-log and --profile options to *parser*."""
+    parser.add_argument(
+        "--run-log", type=Path, default=RUN_LOG_PATH,
+        help=f"JSON-lines file the per-stage timings are appended to (default: {RUN_LOG_PATH})",
+    )
+    parser.add_argument(
+        "--profile", type=int, nargs="?", const=DEFAULT_PROFILE_TOP, default=0, metavar="N",
+        help=f"cProfile every file and keep the dumps of the N slowest (default N: {DEFAULT_PROFILE_TOP})",
+    )
+
+
+class RunLog:
+    """The records of one script run, appended to a JSON-lines file on exit."""
+
+    def __init__(
+        self,
+        script: str,
+        path: Path,
+        profile_top: int = 0,
+        profile_root: Path | None = None,
+        **fields: Any,
+    ) -> None:
+        started = datetime.now(timezone.utc)
+        self.run_id = f"{script}-{started:%Y%m%dT%H%M%S}-{os.getpid()}"
+        self.path = path
+        self.summary: dict[str, Any] = {
+            "stage": "run", "run_id": self.run_id, "script": script,
+            "started_at": started.isoformat(timespec="seconds"), **fields,
+        }
+        self.records: list[dict[str, Any]] = []
+        self.profile_top = profile_top
+        self.profile_dir = (
+            (profile_root or path.parent / "profiles") / self.run_id if profile_top else None
+        )
+
+    def add(self, records: list[dict[str, Any]]) -> None:
+        """Add records collected in a worker process."""
+        self.records.extend(records)
+
+    def __enter__(self) -> RunLog:
+        self._collect = collect()
+        self._own = self._collect.__enter__()
+        self._span = _Span("total", {})
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        total = self._span.finish()
+        self._collect.__exit__(exc_type, exc, tb)
+        self.records.extend(r for r in self._own if r is not total)
+        self.summary.update(
+            status="failed" if exc_type else "ok",
+            wall_s=total["wall_s"],
+            cpu_s=total["cpu_s"],
+            peak_rss_mb=total["peak_rss_mb"],
+        )
+        if self.profile_dir is not None:
+            self.summary["profiles"] = [str(p) for p in self._keep_slowest_profiles()]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as fh:
+            for record in [self.summary, *self.records]:
+                fh.write(json.dumps({"run_id": self.run_id, **record}, default=str) + "\n")
+
+    def _keep_slowest_profiles(self) -> list[Path]:
+        if not self.profile_dir.exists():
+            return []
+        files = sorted(
+            (r for r in self.records if r["stage"] == "file" and "file" in r),
+            key=lambda r: r["wall_s"],
+            reverse=True,
+        )
+        keep = {f"{r['file']}.prof" for r in files[: self.profile_top]}
+        kept = []
+        for path in sorted(self.profile_dir.glob("*.prof")):
+            if path.name in keep:
+                kept.append(path)
+            else:
+                path.unlink()
+        return kept
+
+    def slowest(self, n: int = 5) -> list[tuple[str, float, float]]:
+        """The *n* stages with the most total wall time: (stage, wall_s, cpu_s)."""
+        totals: dict[str, list[float]] = {}
+        for record in self.records:
+            if record.get("nested"):  # counted in its sub-stages
+                continue
+            wall_cpu = totals.setdefault(record["stage"], [0.0, 0.0])
+            wall_cpu[0] += record["wall_s"]
+            wall_cpu[1] += record["cpu_s"]
+        ranked = sorted(totals.items(), key=lambda kv: kv[1][0], reverse=True)
+        return [(name, wall, cpu) for name, (wall, cpu) in ranked[:n]]
+
+    def report(self, n: int = 5) -> None:
+        """Print the run's totals and its slowest stages."""
+        print(
+            f"\nRun {self.run_id}: {self.summary['wall_s']:.2f}s wall, "
+            f"{self.summary['cpu_s']:.2f}s CPU, peak RSS {self.summary['peak_rss_mb']:.0f} MB "
+            f"→ {self.path}"
+        )
+        for name, wall, cpu in self.slowest(n):
+            print(f"  {name:<20}{wall:9.2f}s wall {cpu:9.2f}s CPU")
+        for path in self.summary.get("profiles", []):
+            print(f"  profile: {path}")
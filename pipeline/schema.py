@@ -0,0 +1,57 @@
+"""
+schema.py — Constants shared by every stage of the ingest pipeline: time
+zones, corridor station codes, the canonical Arrow schema and the natural
+key of a stop record.
+"""
+
+from __future__ import annotations
+
+from datetime import timedelta, timezone
+
+import pyarrow as pa
+
+# ---------------------------------------------------------------------------
+# Timezone helpers
+# ---------------------------------------------------------------------------
+UTC = timezone.utc
+EST = timezone(timedelta(hours=-5))
+
+# ---------------------------------------------------------------------------
+# Windsor–Québec corridor station codes
+# ---------------------------------------------------------------------------
+CORRIDOR_STATION_CODES: set[str] = {
+    "WDON", "CHAT", "GLNC", "LNDN", "INGR", "WDST", "BRTF", "ALDR",
+    "OAKV", "TRTO", "GUIL", "OSHA", "CBRG", "PHOP", "TRNJ", "BLVL",
+    "NAPN", "KGON", "GANA", "BRKV", "CWLL", "ALEX", "CSLM", "OTTW",
+    "FALL", "SMTF", "SLAM", "MTRL", "DORV", "COTO", "SHYA", "DRMV",
+    "SFOY", "QBEC", "CHNY",
+}
+
+# ---------------------------------------------------------------------------
+# PyArrow schema — keeps dtypes deterministic even for empty files
+# ---------------------------------------------------------------------------
+# On-time / late flags are not stored: they are derived from delay_minutes
+# where they are counted (see pipeline/lateness.py).
+SCHEMA = pa.schema([
+    pa.field("scrape_date_est", pa.date32()),
+    pa.field("train_key", pa.string()),
+    pa.field("train_number", pa.string()),
+    pa.field("service_date", pa.date32()),
+    pa.field("origin", pa.string()),
+    pa.field("destination", pa.string()),
+    pa.field("departed", pa.bool_()),
+    pa.field("arrived", pa.bool_()),
+    pa.field("stop_sequence", pa.int32()),
+    pa.field("station_name", pa.string()),
+    pa.field("station_code", pa.string()),
+    pa.field("scheduled_arrival_utc", pa.timestamp("us", tz="UTC")),
+    pa.field("estimated_arrival_utc", pa.timestamp("us", tz="UTC")),
+    pa.field("scheduled_departure_utc", pa.timestamp("us", tz="UTC")),
+    pa.field("estimated_departure_utc", pa.timestamp("us", tz="UTC")),
+    pa.field("delay_minutes", pa.int32()),
+    pa.field("diff_status", pa.string()),
+    pa.field("is_corridor", pa.bool_()),
+])
+
+# Columns used to identify a unique stop record
+DEDUP_KEYS = ["train_key", "service_date", "station_code", "scrape_date_est"]
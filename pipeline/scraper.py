@@ -0,0 +1,176 @@
+"""
+scraper.py — Long-running asyncio scraper for the Via Rail live feed.
+
+Polls allData.json on a fixed interval over one keep-alive connection and
+adds every *new* payload to the raw store (see raw_store.write_snapshot):
+
+* conditional requests (If-None-Match / If-Modified-Since) let the server
+  answer 304 when nothing changed, and a payload whose SHA-256 matches the
+  last saved one is skipped even when the server sends it in full;
+* responses that are not a JSON object are treated as errors, so a captive
+  portal or truncated body never lands in raw_data/;
+* errors — HTTP failures, bad payloads and failed writes alike — back off
+  exponentially with full jitter, capped at --max-backoff, and never stop
+  the daemon;
+* files are named from the UTC scrape time and written atomically.
+
+Usage:
+    python -m pipeline.scraper --interval 60
+    python -m pipeline.scraper --url http://127.0.0.1:8765/data/allData.json  # replay_server
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import signal
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+from pipeline.raw_store import write_snapshot
+from pipeline.schema import UTC
+
+VIA_RAIL_URL = "https://tsimobile.viarail.ca/data/allData.json"
+DEFAULT_RAW_DIR = Path(__file__).resolve().parent.parent / "raw_data"
+
+log = logging.getLogger("via_scraper")
+
+
+class Scraper:
+    """Polling state: validators of the last response and the error streak."""
+
+    def __init__(
+        self,
+        url: str,
+        raw_dir: Path,
+        interval: float,
+        max_backoff: float,
+        timeout: float = 30.0,
+    ) -> None:
+        self.url = url
+        self.raw_dir = raw_dir
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.etag: str | None = None
+        self.last_modified: str | None = None
+        self.last_digest: str | None = None
+        self.failures = 0
+
+    # -----------------------------------------------------------------------
+    def _conditional_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def next_delay(self) -> float:
+        """Seconds to wait before the next poll."""
+        if self.failures == 0:
+            return self.interval
+        # Full jitter: uniform over [0, capped exponential], never below 1 s
+        ceiling = min(self.max_backoff, self.interval * 2 ** (self.failures - 1))
+        return max(1.0, random.uniform(0, ceiling))
+
+    async def poll_once(self, client: httpx.AsyncClient) -> Path | None:
+        """Fetch the feed once; return the path written, or None if unchanged."""
+        response = await client.get(self.url, headers=self._conditional_headers())
+        if response.status_code == 304:
+            log.debug("304 Not Modified")
+            return None
+        response.raise_for_status()
+
+        payload = response.content
+        if not isinstance(json.loads(payload), dict):
+            raise ValueError("payload is not a JSON object")
+
+        digest = hashlib.sha256(payload).hexdigest()
+        path = None
+        if digest == self.last_digest:
+            log.debug("payload unchanged (sha256 %s…)", digest[:12])
+        else:
+            path = write_snapshot(self.raw_dir, payload, datetime.now(UTC))
+            self.last_digest = digest
+            log.info("saved %s (%.0f kB)", path.name, len(payload) / 1000)
+
+        # Only once the payload is stored: after a failed write the next
+        # poll must get it in full again, not a 304
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        return path
+
+    async def run(self, stop: asyncio.Event, max_polls: int | None = None) -> None:
+        """Poll until *stop* is set (or *max_polls* polls have been made)."""
+        polls = 0
+        async with httpx.AsyncClient(timeout=self.timeout, follow_redirects=True) as client:
+            while not stop.is_set():
+                try:
+                    await self.poll_once(client)
+                    self.failures = 0
+                except (httpx.HTTPError, ValueError, OSError) as exc:
+                    self.failures += 1
+                    log.warning("poll failed (%d in a row): %s", self.failures, exc)
+
+                polls += 1
+                if max_polls is not None and polls >= max_polls:
+                    return
+
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.next_delay())
+                except asyncio.TimeoutError:
+                    pass
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+async def _main(args: argparse.Namespace) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # e.g. Windows
+            pass
+
+    scraper = Scraper(
+        url=args.url,
+        raw_dir=args.raw_dir,
+        interval=args.interval,
+        max_backoff=args.max_backoff,
+    )
+    log.info("polling %s every %.0f s → %s", args.url, args.interval, args.raw_dir)
+    await scraper.run(stop, max_polls=args.max_polls)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Poll the Via Rail feed into raw_data/")
+    parser.add_argument("--url", default=VIA_RAIL_URL, help="Feed URL")
+    parser.add_argument("--raw-dir", type=Path, default=DEFAULT_RAW_DIR, help="Raw store directory")
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between polls (default: 60)")
+    parser.add_argument(
+        "--max-backoff", type=float, default=900.0, help="Upper bound for error backoff in seconds"
+    )
+    parser.add_argument("--max-polls", type=int, default=None, help="Stop after this many polls")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every poll")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    for noisy in ("httpx", "httpcore"):
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+serving.py — Memory-mappable copy of the dataset for the API workers.
+
+The API keeps the whole dataset in memory as a pandas frame.  Decoding the
+Parquet partitions gives every uvicorn worker a private copy; instead, the
+dataset (and its rollup cube) is also written as uncompressed Arrow IPC
+files laid out so that every pandas column can be a view of the file:
+
+    clean_data/via_rail/_serving/rows.arrow
+    clean_data/via_rail/_serving/rollup.arrow
+
+Workers ``pa.memory_map`` these files and wrap the buffers directly, so N
+workers share one page-cache copy and start without decoding anything.
+Arrow's own null bitmaps and dictionary arrays cannot be handed to pandas
+without a copy, so columns are stored in pandas' physical layout instead
+and described by field metadata (``pandas`` key):
+
+* ``category``  — int8/16/32 codes (-1 = null); ``categories`` holds the
+  sorted categories as a JSON list;
+* ``Int32`` / ``boolean`` — values with nulls zero-filled, plus a uint8
+  mask column named by ``mask`` (1 = null), as in pandas' masked arrays;
+* ``datetime``  — int64 with NaT (int64 min) for nulls, ``unit`` and ``tz``;
+* anything else — stored as is (int64 / float64 without nulls).
+
+The files are a cache of the partitions, not part of the dataset: they are
+git-ignored, never written by the nightly update, and built where the API
+runs — by the first worker that loads a dataset version they do not match
+(``ensure_serving``, under a lock the other workers wait on), or ahead of
+time at deploy with
+
+    python -m pipeline.serving
+
+They carry a content fingerprint of what they were built from (schema
+metadata ``partitions``, see ``partitions_fingerprint``); readers ignore
+them when it does not match the dataset on disk.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from pipeline.dataset import PART_FILENAME, PARTITION_COLUMN, open_dataset, partition_days
+from pipeline.manifest import file_digest
+from pipeline.rollup import ROLLUP_SCHEMA, rollup_dir
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock, concurrent workers may both build
+    fcntl = None
+
+SERVING_DIRNAME = "_serving"
+ROWS_FILENAME = "rows.arrow"
+ROLLUP_FILENAME = "rollup.arrow"
+
+_NAT = np.iinfo(np.int64).min
+_MS_PER_DAY = 86_400_000
+
+
+def serving_dir(root: Path) -> Path:
+    return root / SERVING_DIRNAME
+
+
+def partitions_fingerprint(root: Path) -> str:
+    """
+    Content fingerprint of the Parquet files the serving files are built
+    from: the partitions and the rollup cube under *root*, by day and
+    SHA-256.  Sizes and mtimes are not used, since a git checkout rewrites
+    every file without changing what it holds.
+    """
+    digest = hashlib.sha1()
+    for directory in (root, rollup_dir(root)):
+        for path in sorted(directory.glob(f"{PARTITION_COLUMN}=*/{PART_FILENAME}")):
+            digest.update(f"{path.parent.name}:{file_digest(path)}\n".encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Encoding
+# ---------------------------------------------------------------------------
+def _mask(col: pa.ChunkedArray) -> pa.Array:
+    return pc.is_null(col).cast(pa.uint8())
+
+
+def _encode_column(name: str, col: pa.ChunkedArray) -> list[tuple[pa.Field, pa.Array]]:
+    """Return the (field, array) pairs storing *col* in the serving layout."""
+    col = col.combine_chunks() if isinstance(col, pa.ChunkedArray) else col
+    typ = col.type
+
+    if pa.types.is_dictionary(typ) or pa.types.is_string(typ):
+        dense = col.cast(pa.string())
+        categories = pc.unique(dense).drop_null().sort()
+        n = len(categories)
+        code_type = pa.int8() if n < 2**7 else pa.int16() if n < 2**15 else pa.int32()
+        codes = pc.index_in(dense, categories).fill_null(-1).cast(code_type)
+        meta = {"pandas": "category", "categories": json.dumps(categories.to_pylist())}
+        return [(pa.field(name, code_type, metadata=meta), codes)]
+
+    if pa.types.is_boolean(typ) or pa.types.is_int32(typ):
+        kind = "boolean" if pa.types.is_boolean(typ) else "Int32"
+        values = col.fill_null(False if kind == "boolean" else 0)
+        if kind == "boolean":
+            values = values.cast(pa.uint8())
+        mask_name = f"{name}.mask"
+        meta = {"pandas": kind, "mask": mask_name}
+        return [
+            (pa.field(name, values.type, metadata=meta), values),
+            (pa.field(mask_name, pa.uint8()), _mask(col)),
+        ]
+
+    if pa.types.is_timestamp(typ) or pa.types.is_date32(typ):
+        if pa.types.is_date32(typ):
+            ints = pc.multiply(col.cast(pa.int32()).cast(pa.int64()), _MS_PER_DAY)
+            meta = {"pandas": "datetime", "unit": "ms", "tz": ""}
+        else:
+            ints = col.cast(pa.int64())
+            meta = {"pandas": "datetime", "unit": typ.unit, "tz": typ.tz or ""}
+        return [(pa.field(name, pa.int64(), metadata=meta), ints.fill_null(_NAT))]
+
+    if col.null_count:
+        raise ValueError(f"Column {name!r} ({typ}) has nulls and no serving encoding")
+    return [(pa.field(name, typ), col)]
+
+
+def encode_table(table: pa.Table, partitions: str) -> pa.Table:
+    """Return *table* in the serving layout, tagged with *partitions*."""
+    # Canonical column order: partition column first
+    names = [PARTITION_COLUMN] + [n for n in table.column_names if n != PARTITION_COLUMN]
+    table = table.select(names)
+    pairs = [
+        pair for name in table.column_names for pair in _encode_column(name, table[name])
+    ]
+    schema = pa.schema([f for f, _ in pairs], metadata={"partitions": partitions})
+    return pa.Table.from_arrays([a for _, a in pairs], schema=schema)
+
+
+def _write_ipc(path: Path, table: pa.Table) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table.combine_chunks())
+    os.replace(tmp_path, path)
+
+
+def write_serving(root: Path, partitions: str | None = None) -> Path:
+    """
+    (Re)write the serving files of the dataset at *root* from its current
+    partitions and rollup cube, tagged with *partitions* (by default the
+    current ``partitions_fingerprint``).
+    """
+    target = serving_dir(root)
+    if not partition_days(root):
+        shutil.rmtree(target, ignore_errors=True)
+        return target
+
+    if partitions is None:
+        partitions = partitions_fingerprint(root)
+    rows = open_dataset(root).to_table()
+    rollup = ds.dataset(
+        rollup_dir(root), schema=ROLLUP_SCHEMA, format="parquet", partitioning="hive"
+    ).to_table()
+
+    _write_ipc(target / ROWS_FILENAME, encode_table(rows, partitions))
+    _write_ipc(target / ROLLUP_FILENAME, encode_table(rollup, partitions))
+    return target
+
+
+# ---------------------------------------------------------------------------
+# Building on demand
+# ---------------------------------------------------------------------------
+def _fingerprint_of(path: Path) -> str | None:
+    try:
+        with pa.memory_map(str(path)) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    value = metadata.get(b"partitions")
+    return value.decode() if value is not None else None
+
+
+def is_current(root: Path, partitions: str | None = None) -> bool:
+    """Return True when both serving files match the dataset at *root*."""
+    if partitions is None:
+        partitions = partitions_fingerprint(root)
+    target = serving_dir(root)
+    return all(
+        _fingerprint_of(target / name) == partitions for name in (ROWS_FILENAME, ROLLUP_FILENAME)
+    )
+
+
+@contextmanager
+def _locked(directory: Path) -> Iterator[None]:
+    """Hold an exclusive lock on *directory* across processes."""
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / ".lock", "w") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        yield
+
+
+def ensure_serving(root: Path, partitions: str | None = None) -> bool:
+    """
+    Write the serving files of the dataset at *root* unless they match
+    *partitions* (by default the current ``partitions_fingerprint``).  Safe
+    to call from several processes at once: one writes while the others
+    wait, then find the files current.  Returns False when there is nothing
+    to serve (no partitions).
+    """
+    if not partition_days(root):
+        return False
+    if partitions is None:
+        partitions = partitions_fingerprint(root)
+    if is_current(root, partitions):
+        return True
+    with _locked(serving_dir(root)):
+        if not is_current(root, partitions):
+            write_serving(root, partitions)
+    return True
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Write the API's memory-mappable serving files")
+    parser.add_argument(
+        "--dataset-dir",
+        type=Path,
+        default=Path(__file__).resolve().parent.parent / "clean_data" / "via_rail",
+        help="Partitioned dataset directory (default: clean_data/via_rail/)",
+    )
+    args = parser.parse_args(argv)
+
+    if not ensure_serving(args.dataset_dir):
+        print(f"No partitions in {args.dataset_dir} — nothing to serve.")
+        return
+    print(f"Serving files are current in {serving_dir(args.dataset_dir)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+snapshots.py — Intraday history: every scrape of a day as a delta stream.
+
+The main dataset keeps only the last scrape of each EST day.  The optional
+"all snapshots" store keeps every scrape instead, without storing every
+scrape in full:
+
+    clean_data/via_rail_snapshots/scrape_date_est=YYYY-MM-DD/part-0.parquet
+
+Each partition starts with a keyframe (every stop of the day's first
+scrape) followed, for each later scrape, by only the stops whose values
+changed.  Stops that disappear from a scrape are recorded apart, as
+key-only rows (train_key, service_date, station_code, scrape_ts) in
+
+    clean_data/via_rail_snapshots/_removed/scrape_date_est=YYYY-MM-DD/part-0.parquet
+
+so a removal costs four columns instead of a full-width row of nulls.
+Rows are keyed by (train_key, service_date, station_code, scrape_ts) and
+written in scrape order, so storage grows with the number of changes rather
+than with scrape frequency × fleet size, and every day can be read on its
+own.
+
+``as_of`` rebuilds the state of all stops at any moment from a single
+day; ``train_history`` returns how one train's stops evolved.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from pipeline.dataset import (
+    PARTITION_COLUMN,
+    delete_partition,
+    open_dataset,
+    partition_days,
+    read_partition,
+    write_partition,
+)
+from pipeline.flatten import dedup_table, flatten_file
+from pipeline.raw_files import parse_utc_timestamp
+from pipeline.raw_store import SnapshotRef
+from pipeline.schema import EST, SCHEMA
+
+# Natural key of a stop within one EST day (scrape_date_est is implied by
+# the partition); scrape_ts versions it.
+DELTA_KEYS = ["train_key", "service_date", "station_code"]
+
+DELTA_SCHEMA = SCHEMA.append(pa.field("scrape_ts", pa.timestamp("us", tz="UTC")))
+
+REMOVED_DIRNAME = "_removed"
+
+REMOVED_SCHEMA = pa.schema([
+    SCHEMA.field(PARTITION_COLUMN),
+    *(SCHEMA.field(k) for k in DELTA_KEYS),
+    DELTA_SCHEMA.field("scrape_ts"),
+])
+
+_SCRAPE_TS_TYPE = DELTA_SCHEMA.field("scrape_ts").type
+
+_VALUE_COLUMNS = [
+    name for name in SCHEMA.names if name not in DELTA_KEYS and name != PARTITION_COLUMN
+]
+
+
+def removed_dir(root: Path) -> Path:
+    """Return the removals directory of the delta store at *root*."""
+    return root / REMOVED_DIRNAME
+
+
+# ---------------------------------------------------------------------------
+# Building one day's delta stream
+# ---------------------------------------------------------------------------
+def _with_version(table: pa.Table, scrape_ts: datetime) -> pa.Table:
+    return table.append_column(
+        "scrape_ts", pa.repeat(pa.scalar(scrape_ts, _SCRAPE_TS_TYPE), table.num_rows)
+    )
+
+
+def build_day(refs: list[SnapshotRef], est_date: date) -> tuple[pa.Table, pa.Table, int]:
+    """
+    Return ``(deltas, removed, full_rows)`` for all scrapes *refs* of
+    *est_date*: the DELTA_SCHEMA delta stream, the REMOVED_SCHEMA removals
+    and the number of rows the same scrapes would take if stored in full.
+    """
+    state: dict[tuple, tuple] = {}
+    chunks: list[pa.Table] = []
+    removals: list[dict] = []
+    full_rows = 0
+
+    for ref in sorted(refs, key=lambda r: r.name):
+        scrape_ts = parse_utc_timestamp(ref.name)
+        if scrape_ts is None:
+            continue
+        table = dedup_table(flatten_file(ref, est_date), keys=DELTA_KEYS)
+        full_rows += table.num_rows
+
+        keys = list(zip(*(table.column(k).to_pylist() for k in DELTA_KEYS)))
+        values = list(zip(*(table.column(c).to_pylist() for c in _VALUE_COLUMNS)))
+
+        changed = [i for i, (k, v) in enumerate(zip(keys, values)) if state.get(k) != v]
+        if changed:
+            chunks.append(_with_version(table.take(changed), scrape_ts))
+
+        current = set(keys)
+        removals += [
+            dict(zip(DELTA_KEYS, k), scrape_date_est=est_date, scrape_ts=scrape_ts)
+            for k in state
+            if k not in current
+        ]
+
+        state = dict(zip(keys, values))
+
+    removed = pa.Table.from_pylist(removals, schema=REMOVED_SCHEMA)
+    if not chunks:
+        return DELTA_SCHEMA.empty_table(), removed, full_rows
+    return pa.concat_tables(chunks).cast(DELTA_SCHEMA), removed, full_rows
+
+
+def write_day(root: Path, refs: list[SnapshotRef], est_date: date) -> tuple[int, int, int]:
+    """
+    Build and store *est_date*'s delta stream and removals; return
+    (delta_rows, removed_rows, full_rows).
+    """
+    deltas, removed, full_rows = build_day(refs, est_date)
+    for directory, table in ((root, deltas), (removed_dir(root), removed)):
+        if table.num_rows:
+            write_partition(directory, table, est_date)
+        else:
+            delete_partition(directory, est_date)
+    return deltas.num_rows, removed.num_rows, full_rows
+
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+def _read_day(root: Path, day: date) -> tuple[pa.Table | None, pa.Table | None]:
+    return (
+        read_partition(root, day, DELTA_SCHEMA),
+        read_partition(removed_dir(root), day, REMOVED_SCHEMA),
+    )
+
+
+def _latest_per_key(deltas: pa.Table, removed: pa.Table | None) -> pa.Table:
+    """Collapse a scrape-ordered delta stream and its removals to the live row of each stop."""
+    latest = dedup_table(deltas, keys=DELTA_KEYS)
+    if removed is None or removed.num_rows == 0:
+        return latest
+    # Interleave each stop's last change with its removals in scrape order:
+    # the stop is live when its last version is the change
+    versions = pa.concat_tables([
+        latest.select([*DELTA_KEYS, "scrape_ts"])
+        .append_column("_row", pa.array(np.arange(latest.num_rows))),
+        removed.select([*DELTA_KEYS, "scrape_ts"])
+        .append_column("_row", pa.repeat(pa.scalar(-1, pa.int64()), removed.num_rows)),
+    ])
+    versions = versions.take(pc.sort_indices(versions, [("scrape_ts", "ascending")]))
+    rows = dedup_table(versions, keys=DELTA_KEYS)["_row"].to_numpy()
+    return latest.take(np.sort(rows[rows >= 0]))
+
+
+def as_of(root: Path, moment: datetime) -> pa.Table:
+    """
+    Return the state of every stop as last scraped at or before *moment*
+    (an aware datetime): SCHEMA columns plus ``scrape_ts``, the time of the
+    scrape that last changed the row.  Empty if nothing was scraped yet.
+    """
+    day = moment.astimezone(EST).date()
+    ts = pa.scalar(moment, _SCRAPE_TS_TYPE)
+
+    deltas, removed = _read_day(root, day)
+    if deltas is not None:
+        deltas = deltas.filter(pc.less_equal(deltas["scrape_ts"], ts))
+    if removed is not None:
+        removed = removed.filter(pc.less_equal(removed["scrape_ts"], ts))
+
+    # Before the day's first scrape the previous scraped day's final state
+    # still holds.
+    if deltas is None or deltas.num_rows == 0:
+        earlier = [d for d in partition_days(root) if d < day]
+        if not earlier:
+            return DELTA_SCHEMA.empty_table()
+        deltas, removed = _read_day(root, earlier[-1])
+
+    return _latest_per_key(deltas, removed)
+
+
+def train_history(
+    root: Path, train_key: str, start: date | None = None, end: date | None = None
+) -> pa.Table:
+    """
+    Return every stored change of *train_key*'s stops, in scrape order, with
+    ``is_removed`` set (and the values null) where a stop disappeared.
+    """
+    expr = pc.field("train_key") == train_key
+    if start is not None:
+        expr &= pc.field(PARTITION_COLUMN) >= start
+    if end is not None:
+        expr &= pc.field(PARTITION_COLUMN) <= end
+    changes = open_dataset(root, DELTA_SCHEMA).to_table(filter=expr)
+    tables = [changes.append_column("is_removed", pa.repeat(False, changes.num_rows))]
+    if removed_dir(root).exists():
+        removals = open_dataset(removed_dir(root), REMOVED_SCHEMA).to_table(filter=expr)
+        tables.append(removals.append_column("is_removed", pa.repeat(True, removals.num_rows)))
+    table = pa.concat_tables(tables, promote_options="default")
+    return table.sort_by([("scrape_ts", "ascending"), ("stop_sequence", "ascending")])
@@ -0,0 +1,199 @@
+"""
+conftest.py — Shared fixtures: synthetic allData.json snapshots, a dataset
+built from them and the API serving it.
+
+The tests never read the repo's raw_data/ or clean_data/.  Snapshots are
+generated from a small fixed fleet with seeded random delays, in the raw
+JSON layout described in .github/copilot-instructions.md; the dataset is
+built once per session by build_historical.py in a temporary workspace,
+and the backend's paths are pointed at it the way
+benchmarks/bench_suite.py does.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import importlib.util
+import io
+import json
+import sys
+from collections.abc import Iterator
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = REPO_ROOT / "backend"
+for path in (REPO_ROOT, BACKEND_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from pipeline.raw_store import write_snapshot  # noqa: E402
+from pipeline.schema import EST, UTC  # noqa: E402
+
+# (train number, multi-day key, from, to, [(station, code)]) — corridor and
+# long-distance runs
+FLEET = [
+    ("60", False, "TORONTO", "MONTRÉAL", [("Toronto", "TRTO"), ("Kingston", "KGON"), ("Montréal", "MTRL")]),
+    ("41", False, "OTTAWA", "TORONTO", [("Ottawa", "OTTW"), ("Brockville", "BRKV"), ("Toronto", "TRTO")]),
+    ("15", False, "MONTRÉAL", "HALIFAX", [("Montréal", "MTRL"), ("Moncton", "MCTN"), ("Halifax", "HLFX")]),
+    ("2", True, "TORONTO", "VANCOUVER", [
+        ("Toronto", "TRTO"), ("Sudbury Junction", "SBJT"), ("Winnipeg", "WNPG"), ("Vancouver", "VCVR"),
+    ]),
+]
+
+_STOP_MINUTES = 90
+
+# Days of history in the session dataset, the last one today
+DATASET_DAYS = 21
+
+
+def _timestamp(at: datetime, seq: int) -> str:
+    # Both spellings the feed uses: "...Z" and an explicit EST offset
+    if seq % 2:
+        return at.astimezone(EST).isoformat()
+    return at.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def make_snapshot(
+    day: date, seed: int, trains: list[str] | None = None, final: bool = True
+) -> dict[str, Any]:
+    """
+    The FLEET (or the *trains* numbers of it) running on *day*, with
+    delays drawn from *seed*; with *final* every run has arrived.
+    """
+    rng = np.random.default_rng(seed)
+    snapshot: dict[str, Any] = {}
+    for number, multi_day, origin, destination, stops in FLEET:
+        if trains is not None and number not in trains:
+            continue
+        start = datetime(day.year, day.month, day.day, 12, tzinfo=UTC)
+        times = []
+        for seq, (station, code) in enumerate(stops):
+            scheduled = start + timedelta(minutes=_STOP_MINUTES * seq)
+            delay = int(rng.integers(-3, 90))
+            stop: dict[str, Any] = {"station": station, "code": code, "eta": "ARR"}
+            if seq > 0:
+                stop["arrival"] = {
+                    "scheduled": _timestamp(scheduled, seq),
+                    "estimated": _timestamp(scheduled + timedelta(minutes=delay), seq),
+                }
+            if seq < len(stops) - 1:
+                stop["departure"] = {
+                    "scheduled": _timestamp(scheduled + timedelta(minutes=2), seq),
+                    "estimated": _timestamp(scheduled + timedelta(minutes=delay + 2), seq),
+                }
+            # A stop without delay data now and then
+            if rng.random() < 0.1:
+                stop["diff"] = None
+            else:
+                stop["diffMin"] = delay
+                stop["diff"] = "goo" if delay <= 5 else "med" if delay < 60 else "bad"
+            times.append(stop)
+
+        key = f"{number} ({day:%m-%d})" if multi_day else number
+        snapshot[key] = {
+            "departed": True,
+            "arrived": final,
+            "from": origin,
+            "to": destination,
+            "instance": day.isoformat(),
+            "times": times,
+        }
+    return snapshot
+
+
+def save_snapshot(raw_dir: Path, snapshot: dict[str, Any], scraped_at: datetime) -> Path:
+    """Write *snapshot* to *raw_dir* as the scrape taken at *scraped_at*."""
+    return write_snapshot(raw_dir, json.dumps(snapshot).encode(), scraped_at)
+
+
+@pytest.fixture
+def snapshot_factory() -> Callable[..., dict[str, Any]]:
+    return make_snapshot
+
+
+@pytest.fixture
+def raw_dir(tmp_path: Path) -> Path:
+    directory = tmp_path / "raw_data"
+    directory.mkdir()
+    return directory
+
+
+# ---------------------------------------------------------------------------
+# Session dataset and API
+# ---------------------------------------------------------------------------
+def load_build_historical() -> Any:
+    """Import clean_data/build_historical.py (not a package) as a module."""
+    spec = importlib.util.spec_from_file_location(
+        "build_historical", REPO_ROOT / "clean_data" / "build_historical.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["build_historical"] = module  # worker processes unpickle functions by module name
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def workspace(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """A workspace with DATASET_DAYS daily scrapes built into clean_data/via_rail/."""
+    root = tmp_path_factory.mktemp("workspace")
+    raw = root / "raw_data"
+    today = datetime.now(UTC).astimezone(EST).date()
+    for offset in range(DATASET_DAYS - 1, -1, -1):
+        day = today - timedelta(days=offset)
+        scraped_at = datetime(day.year, day.month, day.day, 22, tzinfo=EST)
+        save_snapshot(raw, make_snapshot(day, seed=offset, final=offset > 0), scraped_at)
+
+    build = load_build_historical()
+    build.RAW_DIR = raw
+    build.DATASET_DIR = root / "clean_data" / "via_rail"
+    build.SNAPSHOT_DIR = root / "clean_data" / "via_rail_snapshots"
+    with contextlib.redirect_stdout(io.StringIO()):
+        build.main(["--run-log", str(root / "run_log.jsonl")])
+    return root
+
+
+@pytest.fixture(scope="session")
+def dataset_dir(workspace: Path) -> Path:
+    return workspace / "clean_data" / "via_rail"
+
+
+def point_data_loader(mp: pytest.MonkeyPatch, dataset_dir: Path) -> None:
+    """Rebase every dataset path of app.data_loader onto *dataset_dir*."""
+    from app import data_loader
+
+    old_root = data_loader._DATASET_DIR
+    for name, value in list(vars(data_loader).items()):
+        if isinstance(value, Path) and value.is_relative_to(old_root):
+            mp.setattr(data_loader, name, dataset_dir / value.relative_to(old_root))
+    mp.setattr(data_loader, "_PARQUET_PATH", dataset_dir.with_name("via_rail_clean.parquet"))
+
+
+@pytest.fixture(scope="session")
+def backend(workspace: Path, dataset_dir: Path) -> Iterator[Any]:
+    """app.data_loader serving the session dataset (restored afterwards)."""
+    from app import arrival_model, data_loader
+    from app.result_cache import cache
+
+    with pytest.MonkeyPatch.context() as mp:
+        point_data_loader(mp, dataset_dir)
+        mp.setattr(data_loader, "_current", None)
+        # Predictions come from the priors: no model in the workspace
+        mp.setattr(arrival_model, "MODEL_PATH", workspace / "models" / "arrival_model.joblib")
+        cache.clear()
+        yield data_loader
+        cache.clear()
+
+
+@pytest.fixture(scope="session")
+def client(backend: Any) -> Any:
+    """TestClient of the app; the lifespan (live-feed poller) is not run."""
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    return TestClient(app)
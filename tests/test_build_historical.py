@@ -0,0 +1,48 @@
+"""
+test_build_historical.py — Ordered, bounded fan-out of the per-file work.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from conftest import load_build_historical
+
+
+@pytest.fixture(scope="module")
+def build():
+    return load_build_historical()
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_imap_yields_in_task_order(build, workers):
+    tasks = list(range(-20, 20))
+    assert list(build._imap(abs, tasks, workers)) == [abs(t) for t in tasks]
+
+
+def test_imap_bounds_tasks_in_flight(build, monkeypatch):
+    # Threads instead of processes, so the started tasks can be counted
+    monkeypatch.setattr(build, "ProcessPoolExecutor", ThreadPoolExecutor)
+    started = []
+    lock = threading.Lock()
+
+    def work(task: int) -> int:
+        with lock:
+            started.append(task)
+        return task * 2
+
+    workers = 3
+    window = build.IN_FLIGHT_PER_WORKER * workers
+    results = build._imap(work, list(range(100)), workers)
+    assert next(results) == 0
+    # The consumer stalls: no more than the window is ever submitted
+    time.sleep(0.2)
+    assert len(started) == window
+    assert next(results) == 2
+    time.sleep(0.2)
+    assert len(started) == window + 1
+    assert list(results) == [2 * t for t in range(2, 100)]
+    assert sorted(started) == list(range(100))
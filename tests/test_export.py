@@ -0,0 +1,94 @@
+"""
+test_export.py — /api/export against the Parquet dataset it streams.
+"""
+
+from __future__ import annotations
+
+import io
+from datetime import timedelta
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pytest
+
+from pipeline.dataset import PARTITION_COLUMN, open_dataset
+from pipeline.schema import SCHEMA
+
+
+def _read(response, fmt: str) -> pa.Table:
+    assert response.status_code == 200, response.text
+    if fmt == "arrow":
+        assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+        return pa.ipc.open_stream(response.content).read_all()
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    return pq.read_table(io.BytesIO(response.content))
+
+
+def _rows(dataset_dir, expr=None, columns=None) -> pa.Table:
+    table = open_dataset(dataset_dir).to_table(filter=expr)
+    return table.select(columns or SCHEMA.names)
+
+
+def _sorted(table: pa.Table) -> pa.Table:
+    keys = [k for k in (PARTITION_COLUMN, "train_key", "stop_sequence", "station_code") if k in table.column_names]
+    return table.sort_by([(k, "ascending") for k in keys])
+
+
+def _dates(table: pa.Table) -> list:
+    return sorted(set(table[PARTITION_COLUMN].to_pylist()))
+
+
+@pytest.fixture(scope="module")
+def days(dataset_dir) -> list:
+    return _dates(_rows(dataset_dir))
+
+
+@pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+def test_round_trip(client, dataset_dir, fmt):
+    table = _read(client.get(f"/api/export?format={fmt}"), fmt)
+    assert table.column_names == SCHEMA.names
+    assert _sorted(table).equals(_sorted(_rows(dataset_dir).cast(table.schema)))
+
+
+@pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+def test_date_range(client, dataset_dir, days, fmt):
+    first, last = days[3], days[-5]
+    table = _read(client.get(f"/api/export?format={fmt}&from={first}&to={last}"), fmt)
+    assert _dates(table) == [d for d in days if first <= d <= last]
+    expr = (pc.field(PARTITION_COLUMN) >= first) & (pc.field(PARTITION_COLUMN) <= last)
+    assert _sorted(table).equals(_sorted(_rows(dataset_dir, expr).cast(table.schema)))
+
+    since = _read(client.get(f"/api/export?format={fmt}&from={days[-1]}"), fmt)
+    assert _dates(since) == [days[-1]]
+    empty = _read(client.get(f"/api/export?format={fmt}&to={days[0] - timedelta(days=1)}"), fmt)
+    assert empty.num_rows == 0 and empty.column_names == SCHEMA.names
+
+
+def test_corridor_only(client, dataset_dir):
+    table = _read(client.get("/api/export?corridor_only=true"), "arrow")
+    assert table.num_rows and all(table["is_corridor"].to_pylist())
+    expected = _rows(dataset_dir, pc.field("is_corridor"))
+    assert _sorted(table).equals(_sorted(expected.cast(table.schema)))
+
+
+@pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+def test_column_projection(client, dataset_dir, fmt):
+    columns = ["train_key", "station_code", "delay_minutes"]
+    table = _read(client.get(f"/api/export?format={fmt}&columns= {' , '.join(columns)} "), fmt)
+    assert set(table.column_names) == set(columns)
+    assert table.num_rows == _rows(dataset_dir).num_rows
+    expected = _rows(dataset_dir, columns=table.column_names)
+    assert _sorted(table).equals(_sorted(expected.cast(table.schema)))
+
+
+@pytest.mark.parametrize("columns", [",", " , ", ""])
+def test_empty_projection_exports_every_column(client, columns):
+    table = _read(client.get(f"/api/export?columns={columns}"), "arrow")
+    assert table.column_names == SCHEMA.names
+
+
+def test_unknown_column_is_400(client):
+    response = client.get("/api/export?columns=train_key,nope")
+    assert response.status_code == 400
+    assert "nope" in response.json()["detail"]
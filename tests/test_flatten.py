@@ -0,0 +1,161 @@
+"""
+test_flatten.py — The columnar flattener against the row-wise one it replaced.
+
+``_row_wise_flatten`` is the per-stop dict flattener that build_historical.py
+and update_dataset.py used before pipeline/flatten.py, kept verbatim apart
+from reading an already-parsed snapshot.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+
+import pyarrow as pa
+import pytest
+from conftest import save_snapshot
+
+from pipeline.flatten import flatten_data, flatten_file
+from pipeline.lateness import late_measure, lateness_flags
+from pipeline.schema import CORRIDOR_STATION_CODES, SCHEMA, UTC
+
+DAY = date(2025, 4, 1)
+
+
+def _parse_dt(value: str | None) -> datetime | None:
+    """Parse an ISO-8601 UTC string to an aware datetime, or None."""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return dt.astimezone(UTC)
+    except ValueError:
+        return None
+
+
+def _row_wise_flatten(data: dict, scrape_date_est: date) -> list[dict]:
+    """Return a list of row dicts for one raw JSON snapshot."""
+    rows: list[dict] = []
+
+    for train_key, train in data.items():
+        train_number = train_key.split()[0]
+
+        try:
+            service_date = date.fromisoformat(train.get("instance", ""))
+        except ValueError:
+            service_date = None
+
+        origin = train.get("from", "")
+        destination = train.get("to", "")
+        departed = bool(train.get("departed", False))
+        arrived = bool(train.get("arrived", False))
+
+        for seq, stop in enumerate(train.get("times", [])):
+            delay_minutes = stop.get("diffMin")
+            if delay_minutes is None:
+                delay_minutes_int = None
+                is_on_time = None
+                is_late_15 = None
+                is_late_60 = None
+            else:
+                delay_minutes_int = int(delay_minutes)
+                is_on_time = delay_minutes_int <= 5
+                is_late_15 = delay_minutes_int >= 15
+                is_late_60 = delay_minutes_int >= 60
+
+            arrival = stop.get("arrival") or {}
+            departure = stop.get("departure") or {}
+            station_code = stop.get("code", "")
+
+            rows.append({
+                "scrape_date_est": scrape_date_est,
+                "train_key": train_key,
+                "train_number": train_number,
+                "service_date": service_date,
+                "origin": origin,
+                "destination": destination,
+                "departed": departed,
+                "arrived": arrived,
+                "stop_sequence": seq,
+                "station_name": stop.get("station", ""),
+                "station_code": station_code,
+                "scheduled_arrival_utc": _parse_dt(arrival.get("scheduled")),
+                "estimated_arrival_utc": _parse_dt(arrival.get("estimated")),
+                "scheduled_departure_utc": _parse_dt(departure.get("scheduled")),
+                "estimated_departure_utc": _parse_dt(departure.get("estimated")),
+                "delay_minutes": delay_minutes_int,
+                "diff_status": stop.get("diff"),
+                "is_on_time": is_on_time,
+                "is_late_15": is_late_15,
+                "is_late_60": is_late_60,
+                "is_corridor": station_code in CORRIDOR_STATION_CODES,
+            })
+
+    return rows
+
+
+def _odd_trains() -> dict:
+    """Runs with the irregular values the feed has been seen to send."""
+    return {
+        # No service date, fractional delay, no station code
+        "97": {
+            "from": "WINNIPEG",
+            "to": "CHURCHILL",
+            "times": [
+                {"station": "Winnipeg", "code": "WNPG", "diffMin": 12.7, "diff": "med",
+                 "departure": {"scheduled": "2025-04-01T17:05:00Z", "estimated": "2025-04-01T17:17:00Z"}},
+                {"station": "The Pas", "diffMin": -4, "diff": "goo",
+                 "arrival": {"scheduled": "2025-04-02T03:00:00-05:00", "estimated": None}},
+            ],
+        },
+        # Unparseable instance and timestamps, empty arrival/departure
+        "185 (03-31)": {
+            "instance": "n/a",
+            "departed": False,
+            "times": [
+                {"station": "Jonquière", "code": "JONQ", "diffMin": 60,
+                 "arrival": {}, "departure": {"scheduled": "soon", "estimated": ""}},
+            ],
+        },
+        # No stops at all
+        "14": {"instance": "2025-04-01", "from": "MONTRÉAL", "to": "HALIFAX", "times": []},
+    }
+
+
+def _expected(data: dict, scrape_date_est: date) -> tuple[pa.Table, list[dict]]:
+    rows = _row_wise_flatten(data, scrape_date_est)
+    table = pa.Table.from_pylist([{k: r[k] for k in SCHEMA.names} for r in rows], schema=SCHEMA)
+    return table, rows
+
+
+@pytest.fixture
+def snapshot(snapshot_factory) -> dict:
+    return {**snapshot_factory(DAY, seed=7, final=False), **_odd_trains()}
+
+
+def test_flatten_data_matches_row_wise(snapshot):
+    expected, _ = _expected(snapshot, DAY)
+    table = flatten_data(snapshot, DAY)
+    assert table.schema == SCHEMA
+    assert table.num_rows == expected.num_rows
+    assert table.equals(expected)
+
+
+def test_flatten_file_matches_row_wise(snapshot, raw_dir):
+    path = save_snapshot(raw_dir, snapshot, datetime(2025, 4, 2, 3, 0, tzinfo=UTC))
+    expected, _ = _expected(snapshot, DAY)
+    assert flatten_file(path, DAY).equals(expected)
+
+
+def test_lateness_flags_match_stored_flags(snapshot):
+    # The row-wise flattener stored is_on_time / is_late_*; they are now
+    # derived from delay_minutes
+    table = flatten_data(snapshot, DAY)
+    _, rows = _expected(snapshot, DAY)
+    flags = lateness_flags(table["delay_minutes"])
+    assert flags["on_time"].to_pylist() == [r["is_on_time"] for r in rows]
+    for threshold in (15, 60):
+        assert flags[late_measure(threshold)].to_pylist() == [r[f"is_late_{threshold}"] for r in rows]
+
+
+def test_empty_snapshot():
+    assert flatten_data({}, DAY).equals(SCHEMA.empty_table())
@@ -0,0 +1,74 @@
+"""
+test_lateness.py — ``?late_threshold=N`` against the stored lateness counts.
+
+For the thresholds the rollup cube holds (LATE_THRESHOLDS) late_pct must be
+the endpoint's own late_N_pct; any other threshold is counted from
+delay_minutes on the stop-level rows and must agree with the same count
+done with pandas.
+"""
+
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from pipeline.lateness import LATE_THRESHOLDS, late_measure
+
+FILTERS = ["", "&corridor_only=true", "&train_number=60", "&station_code=trto", "&origin=toronto"]
+
+
+def _pct(count: float, total: float) -> float:
+    return round(count / total * 100, 1)
+
+
+@pytest.mark.parametrize("threshold", LATE_THRESHOLDS)
+@pytest.mark.parametrize("filters", FILTERS)
+def test_summary_threshold_equals_stored_measure(client, threshold, filters):
+    summary = client.get(f"/api/summary?period=30d&late_threshold={threshold}{filters}").json()
+    assert summary["total_stops"] > 0
+    assert summary["late_threshold"] == threshold
+    assert summary["late_pct"] == summary[f"late_{threshold}_pct"]
+
+
+@pytest.mark.parametrize("threshold", LATE_THRESHOLDS)
+@pytest.mark.parametrize("filters", FILTERS)
+def test_performance_threshold_equals_stored_measure(client, threshold, filters):
+    days = client.get(f"/api/performance?period=30d&late_threshold={threshold}{filters}").json()
+    assert days
+    for day in days:
+        assert day["late_pct"] == day[f"late_{threshold}_pct"], day["date"]
+
+
+@pytest.mark.parametrize("threshold", LATE_THRESHOLDS)
+def test_row_counts_equal_rollup_measure(backend, threshold):
+    # The stop-level path the API takes for other thresholds, run on the
+    # cube's own thresholds
+    data = backend.current()
+    for filters in ({}, {"is_corridor": True}, {"train_number": "2"}, {"origin": "TORONTO"}):
+        cube = data.select_rollup(filters, 30)
+        stored = cube.groupby("scrape_date_est", observed=True, sort=True)[late_measure(threshold)].sum()
+        counted = data.count_late(filters, threshold, 30).reindex(stored.index, fill_value=0)
+        assert counted.tolist() == stored.tolist(), filters
+
+
+@pytest.mark.parametrize("threshold", [0, 15, 30, 60, 200])
+def test_summary_other_thresholds_match_rows(client, backend, threshold):
+    rows = backend.current().df
+    recent = rows[rows["scrape_date_est"] > rows["scrape_date_est"].max() - pd.Timedelta(days=7)]
+    delays = recent["delay_minutes"].dropna().astype("int64")
+
+    summary = client.get(f"/api/summary?period=7d&late_threshold={threshold}").json()
+    assert summary["total_stops"] == len(delays)
+    assert summary["late_pct"] == _pct((delays >= threshold).sum(), len(delays))
+
+
+@pytest.mark.parametrize("threshold", [*LATE_THRESHOLDS, 30])
+def test_stations_threshold_matches_rows(client, backend, threshold):
+    rows = backend.current().df.dropna(subset=["delay_minutes"])
+    late = (rows["delay_minutes"].astype("int64") >= threshold).groupby(
+        rows["station_code"].astype(str)
+    ).mean()
+    stations = client.get(f"/api/stations?late_threshold={threshold}").json()
+    assert stations
+    for station in stations:
+        assert station["late_pct"] == round(late[station["station_code"]] * 100, 1), station["station_code"]
@@ -0,0 +1,47 @@
+"""
+test_live_feed.py — Background revalidation of the live-feed snapshot.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from app.live_feed import LiveFeed
+
+
+def _revalidate(refresh) -> list[dict]:
+    """Run one background refresh with *refresh*; return the loop's unhandled errors."""
+    errors: list[dict] = []
+
+    async def scenario() -> None:
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        feed = LiveFeed(url="http://127.0.0.1:9/data/allData.json")
+        feed.trains = []
+        feed.refresh = refresh
+        feed._revalidate_in_background()
+        task = feed._refresh_task
+        await asyncio.sleep(0)
+        if not task.done():
+            task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    return errors
+
+
+def test_cancelled_refresh_is_not_an_error():
+    async def hang() -> None:
+        await asyncio.Event().wait()
+
+    assert _revalidate(hang) == []
+
+
+def test_failed_refresh_is_logged(caplog):
+    async def fail() -> None:
+        raise RuntimeError("upstream exploded")
+
+    with caplog.at_level(logging.WARNING, logger="app.live_feed"):
+        assert _revalidate(fail) == []
+    assert "upstream exploded" in caplog.text
@@ -0,0 +1,117 @@
+"""
+test_priors.py — Delay priors from summed histograms against the raw delays.
+
+The priors table is computed from per-day delay histograms; every level's
+count, mean, median and p90 must equal what pandas computes on the
+stop-level delays themselves.
+"""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pytest
+
+from app.priors import Priors
+from pipeline.dataset import PARTITION_COLUMN, open_dataset
+from pipeline.priors import PRIOR_KEYS, PRIOR_LEVELS, build_histogram, build_priors, priors_path
+from pipeline.schema import SCHEMA
+
+
+def _expected(rows: pd.DataFrame, keys: tuple[str, ...]) -> pd.DataFrame:
+    """The priors of one level, computed on the raw delays with pandas."""
+    rows = rows.dropna(subset=["delay_minutes"])
+    if "day_of_week" in keys:
+        rows = rows.dropna(subset=["day_of_week"])
+    delays = rows.groupby(list(keys), sort=True)["delay_minutes"]
+    return pd.DataFrame({
+        "count": delays.count(),
+        "mean": delays.mean(),
+        "median": delays.quantile(0.5),
+        "p90": delays.quantile(0.9),
+    })
+
+
+def _level(priors: pd.DataFrame, keys: tuple[str, ...]) -> pd.DataFrame:
+    """The rows of *priors* at the level of *keys*."""
+    mask = np.ones(len(priors), dtype=bool)
+    for column in PRIOR_KEYS:
+        mask &= priors[column].notna().to_numpy() == (column in keys)
+    level = priors[mask].set_index(list(keys)).sort_index()
+    return level[["count", "mean", "median", "p90"]]
+
+
+def _with_weekday(rows: pd.DataFrame) -> pd.DataFrame:
+    service_date = pd.to_datetime(rows["service_date"])
+    rows = rows.assign(day_of_week=service_date.dt.dayofweek.astype("float64"))
+    rows["delay_minutes"] = rows["delay_minutes"].astype("float64")
+    return rows
+
+
+def _assert_levels_match(priors: pd.DataFrame, rows: pd.DataFrame) -> None:
+    for keys in PRIOR_LEVELS:
+        got = _level(priors, keys)
+        expected = _expected(rows, keys)
+        pd.testing.assert_frame_equal(
+            got, expected, check_dtype=False, check_index_type=False, obj=str(keys)
+        )
+
+
+@pytest.fixture
+def random_rows() -> pa.Table:
+    """Stop rows over several days with heavy ties, singleton and pair groups."""
+    rng = np.random.default_rng(42)
+    n = 5_000
+    start = date(2025, 3, 1)
+    days = [start + timedelta(days=int(d)) for d in rng.integers(0, 14, n)]
+    numbers = rng.choice(["60", "2", "15", "41"], n, p=[0.4, 0.3, 0.29, 0.01])
+    delays = rng.integers(-5, 120, n).astype(object)
+    delays[rng.random(n) < 0.05] = None
+    return pa.table({
+        PARTITION_COLUMN: pa.array(days, pa.date32()),
+        "train_key": [f"{t} ({d:%m-%d})" if t == "2" else str(t) for t, d in zip(numbers, days)],
+        "train_number": numbers.tolist(),
+        "service_date": pa.array(
+            [None if i % 97 == 0 else d for i, d in enumerate(days)], pa.date32()
+        ),
+        "station_code": rng.choice(["TRTO", "KGON", "MTRL", "OTTW", "QBEC"], n).tolist(),
+        "delay_minutes": pa.array(delays.tolist(), SCHEMA.field("delay_minutes").type),
+    })
+
+
+def test_build_priors_matches_series_quantile(random_rows):
+    # Histograms of separate days are summed, as in write_priors
+    histograms = [
+        build_histogram(random_rows.filter(pc.equal(random_rows[PARTITION_COLUMN], day)))
+        for day in random_rows[PARTITION_COLUMN].unique()
+    ]
+    priors = build_priors(pa.concat_tables(histograms)).to_pandas()
+    _assert_levels_match(priors, _with_weekday(random_rows.to_pandas()))
+
+
+def test_stored_priors_match_dataset(dataset_dir):
+    priors = pq.read_table(priors_path(dataset_dir)).to_pandas()
+    rows = open_dataset(dataset_dir).to_table().to_pandas()
+    _assert_levels_match(priors, _with_weekday(rows))
+
+
+def test_lookup_falls_back_along_levels(dataset_dir):
+    priors = Priors.from_frame(pq.read_table(priors_path(dataset_dir)).to_pandas())
+    rows = _with_weekday(open_dataset(dataset_dir).to_table().to_pandas()).dropna(subset=["delay_minutes"])
+    run = rows.iloc[0]
+
+    exact = priors.get(run["train_number"], run["station_code"], run["day_of_week"], run["train_key"])
+    assert exact.level == ("train_number", "station_code", "day_of_week")
+    # An unknown weekday falls back to the station, an unknown station to
+    # the run, an unknown run to the train number
+    assert priors.get(run["train_number"], run["station_code"], 7).level == ("train_number", "station_code")
+    by_run = priors.get(run["train_number"], "XXXX", train_key=run["train_key"])
+    assert by_run.level == ("train_key",)
+    assert by_run.count == (rows["train_key"] == run["train_key"]).sum()
+    assert priors.get(run["train_number"], "XXXX", train_key="none").level == ("train_number",)
+    assert priors.get("9999") is None
@@ -0,0 +1,60 @@
+"""
+test_result_cache.py — ETag revalidation of the cached analytics responses.
+"""
+
+from __future__ import annotations
+
+import pytest
+
+from app.result_cache import cache, etag_for
+
+ENDPOINTS = [
+    "/api/summary?period=30d",
+    "/api/performance?period=7d&corridor_only=true",
+    "/api/stations",
+]
+
+
+@pytest.mark.parametrize("url", ENDPOINTS)
+def test_if_none_match_answers_304(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    revalidated = client.get(url, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["ETag"] == etag
+    assert revalidated.headers["Cache-Control"] == response.headers["Cache-Control"]
+
+
+@pytest.mark.parametrize("header", ["W/{etag}", '"stale", {etag}', "*"])
+def test_if_none_match_forms(client, header):
+    url = ENDPOINTS[0]
+    etag = client.get(url).headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": header.format(etag=etag)}).status_code == 304
+
+
+def test_stale_or_other_etag_gets_body(client):
+    summary = client.get(ENDPOINTS[0])
+    other = client.get("/api/summary?period=7d")
+    assert other.headers["ETag"] != summary.headers["ETag"]
+
+    response = client.get(ENDPOINTS[0], headers={"If-None-Match": other.headers["ETag"]})
+    assert response.status_code == 200
+    assert response.content == summary.content
+
+
+def test_cached_body_matches_computed(client):
+    cache.clear()
+    computed = client.get(ENDPOINTS[1])
+    cached = client.get(ENDPOINTS[1])
+    assert cached.status_code == computed.status_code == 200
+    assert cached.content == computed.content
+    assert cached.headers["ETag"] == computed.headers["ETag"]
+
+
+def test_etag_changes_with_dataset_version():
+    key = ("summary", "30d", (), None)
+    assert etag_for("v1", key) == etag_for("v1", key)
+    assert etag_for("v1", key) != etag_for("v2", key)
@@ -0,0 +1,147 @@
+"""
+test_scraper.py — The polling scraper against the local replay server.
+
+pipeline/replay_server.py serves the snapshots of a temporary raw store on a
+free port; the scraper polls it into another one.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections.abc import Iterator
+from datetime import date, datetime
+from pathlib import Path
+
+import httpx
+import pytest
+from conftest import save_snapshot
+
+from pipeline.raw_store import RAW_GLOB
+from pipeline.replay_server import FEED_PATH, serve
+from pipeline.schema import UTC
+from pipeline.scraper import Scraper
+
+DAY = date(2025, 4, 1)
+
+
+@pytest.fixture
+def recorded(raw_dir, snapshot_factory) -> Path:
+    """A raw store with one recorded snapshot."""
+    return save_snapshot(raw_dir, snapshot_factory(DAY, seed=1), datetime(2025, 4, 1, 20, tzinfo=UTC))
+
+
+def _server(raw_dir: Path, fail_rate: float = 0.0) -> Iterator[str]:
+    server = serve(raw_dir, "127.0.0.1", 0, advance=3600.0, fail_rate=fail_rate)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}{FEED_PATH}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def feed_url(raw_dir, recorded) -> Iterator[str]:
+    yield from _server(raw_dir)
+
+
+@pytest.fixture
+def failing_url(raw_dir, recorded) -> Iterator[str]:
+    yield from _server(raw_dir, fail_rate=1.0)
+
+
+def _scraper(url: str, out_dir: Path) -> Scraper:
+    return Scraper(url=url, raw_dir=out_dir, interval=10.0, max_backoff=60.0, timeout=5.0)
+
+
+def _polls(scraper: Scraper, count: int) -> list[Path | None]:
+    async def poll() -> list[Path | None]:
+        async with httpx.AsyncClient(timeout=scraper.timeout) as client:
+            return [await scraper.poll_once(client) for _ in range(count)]
+
+    return asyncio.run(poll())
+
+
+def _saved(out_dir: Path) -> list[Path]:
+    return sorted(out_dir.glob(RAW_GLOB))
+
+
+def test_new_payload_is_saved(tmp_path, feed_url, recorded):
+    out_dir = tmp_path / "scraped"
+    [path] = _polls(_scraper(feed_url, out_dir), 1)
+    assert _saved(out_dir) == [path]
+    assert path.read_bytes() == recorded.read_bytes()
+
+
+def test_repeat_etag_gets_304(tmp_path, feed_url):
+    out_dir = tmp_path / "scraped"
+    scraper = _scraper(feed_url, out_dir)
+    _polls(scraper, 1)
+    assert scraper.etag is not None
+    # Without the digest a full response would be written again: only a
+    # 304 leaves nothing to save
+    scraper.last_digest = None
+    assert _polls(scraper, 1) == [None]
+    assert len(_saved(out_dir)) == 1
+
+
+def test_unchanged_payload_is_skipped(tmp_path, feed_url):
+    out_dir = tmp_path / "scraped"
+    scraper = _scraper(feed_url, out_dir)
+    _polls(scraper, 1)
+    # No validators: the server answers in full, with the same bytes
+    scraper.etag = scraper.last_modified = None
+    assert _polls(scraper, 1) == [None]
+    assert scraper.etag is not None
+    assert len(_saved(out_dir)) == 1
+
+
+def _run(scraper: Scraper, polls: int) -> list[float]:
+    """Run *polls* polls without sleeping; return the delays asked for."""
+    delays: list[float] = []
+    next_delay = scraper.next_delay
+
+    def record() -> float:
+        delays.append(next_delay())
+        return 0.0
+
+    scraper.next_delay = record
+    asyncio.run(scraper.run(asyncio.Event(), max_polls=polls))
+    return delays
+
+
+def test_http_errors_back_off(tmp_path, failing_url):
+    scraper = _scraper(failing_url, tmp_path / "scraped")
+    delays = _run(scraper, 4)
+    assert scraper.failures == 4
+    assert _saved(tmp_path / "scraped") == []
+    assert len(delays) == 3
+    for failures, delay in enumerate(delays, start=1):
+        assert 1.0 <= delay <= min(scraper.max_backoff, scraper.interval * 2 ** (failures - 1))
+
+
+def test_write_errors_back_off_and_keep_polling(tmp_path, feed_url):
+    out_dir = tmp_path / "not-a-directory"
+    out_dir.write_text("")
+    scraper = _scraper(feed_url, out_dir)
+    delays = _run(scraper, 3)
+    assert scraper.failures == 3
+    assert len(delays) == 2 and all(delay >= 1.0 for delay in delays)
+
+    # The daemon is still alive: once the disk is back the next poll saves
+    out_dir.unlink()
+    assert _run(scraper, 1) == []
+    assert scraper.failures == 0
+    assert len(_saved(out_dir)) == 1
+
+
+def test_backoff_is_jittered_and_capped(tmp_path):
+    scraper = _scraper("http://127.0.0.1:9", tmp_path)
+    assert scraper.next_delay() == scraper.interval
+    scraper.failures = 10
+    delays = [scraper.next_delay() for _ in range(200)]
+    assert min(delays) >= 1.0
+    assert max(delays) <= scraper.max_backoff
+    assert len(set(delays)) > 100
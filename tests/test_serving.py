@@ -0,0 +1,82 @@
+"""
+test_serving.py — The memory-mapped serving files against the Parquet dataset.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from pipeline import serving
+from pipeline.dataset import partition_days, partition_path, read_partition, write_partition
+from pipeline.serving import ROWS_FILENAME, ensure_serving, is_current, partitions_fingerprint, serving_dir
+
+
+def test_mapped_frame_equals_parquet_frame(backend, dataset_dir):
+    partitions = partitions_fingerprint(dataset_dir)
+    mapped = backend._load(mapped=True, partitions=partitions)
+    assert backend._map_serving(backend._SERVING_ROWS_PATH, partitions) is not None
+    parquet = backend._load(mapped=False)
+    pd.testing.assert_frame_equal(mapped, parquet)
+
+
+def test_mapped_rollup_equals_parquet_rollup(backend, dataset_dir):
+    backend._load(mapped=True)
+    mapped = backend._map_serving(backend._SERVING_ROLLUP_PATH, partitions_fingerprint(dataset_dir))
+    assert mapped is not None
+    dictionary_columns = [c for c in backend.ROLLUP_DIMS if c in backend._CATEGORICAL_COLUMNS]
+    dataset = ds.dataset(
+        backend._ROLLUP_DIR,
+        format=backend._parquet_format(dictionary_columns),
+        partitioning=backend._PARTITIONING,
+    )
+    parquet = backend._to_pandas(dataset.to_table())
+    pd.testing.assert_frame_equal(mapped, parquet)
+
+
+def test_serving_files_follow_partition_content(tmp_path, dataset_dir):
+    root = tmp_path / "via_rail"
+    shutil.copytree(dataset_dir, root, ignore=shutil.ignore_patterns("_serving"))
+    assert not is_current(root)
+    assert ensure_serving(root)
+    assert is_current(root)
+
+    # A checkout rewrites files without changing them: still current
+    rows = serving_dir(root) / ROWS_FILENAME
+    built_at = rows.stat().st_mtime_ns
+    day = partition_days(root)[-1]
+    table = read_partition(root, day)
+    write_partition(root, table, day)
+    os.utime(partition_path(root, day), ns=(0, 0))
+    assert is_current(root)
+
+    # New content is not, and is rebuilt on the next load
+    write_partition(root, table.slice(1), day)
+    assert not is_current(root)
+    assert ensure_serving(root)
+    assert is_current(root)
+    assert rows.stat().st_mtime_ns != built_at
+
+
+def test_nothing_to_serve(tmp_path):
+    assert not ensure_serving(tmp_path)
+    assert not serving_dir(tmp_path).exists()
+
+
+def test_load_fingerprints_partitions_once(backend, monkeypatch):
+    calls = []
+
+    def counted(root):
+        calls.append(root)
+        return partitions_fingerprint(root)
+
+    monkeypatch.setattr(backend, "partitions_fingerprint", counted)
+    monkeypatch.setattr(serving, "partitions_fingerprint", counted)
+    dataset = backend.Dataset.load("test").warm()
+    assert len(calls) == 1
+    # Rows and rollup cube both mapped from the serving files
+    assert dataset.partitions == partitions_fingerprint(backend._DATASET_DIR)
+    assert backend._map_serving(backend._SERVING_ROLLUP_PATH, dataset.partitions) is not None
@@ -0,0 +1,105 @@
+"""
+test_snapshots.py — The intraday delta store against full snapshots.
+
+Every state ``as_of`` rebuilds from the delta stream and its removals must
+equal the (deduplicated) full snapshot last scraped at that moment.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+import pyarrow as pa
+import pytest
+from conftest import save_snapshot
+
+from pipeline.flatten import dedup_table, flatten_file
+from pipeline.raw_files import est_date_of
+from pipeline.raw_store import iter_snapshots
+from pipeline.schema import EST, SCHEMA, UTC
+from pipeline.snapshots import DELTA_KEYS, as_of, train_history, write_day
+
+DAY = date(2025, 4, 1)
+PREVIOUS_DAY = DAY - timedelta(days=1)
+
+
+def _at(day: date, hour: int) -> datetime:
+    return datetime(day.year, day.month, day.day, hour, tzinfo=EST).astimezone(UTC)
+
+
+@pytest.fixture
+def scrapes(raw_dir, snapshot_factory) -> list[tuple[datetime, dict]]:
+    """
+    The previous day's single scrape, then a day where delays change,
+    nothing changes, a train disappears and comes back with new delays.
+    """
+    first = snapshot_factory(DAY, seed=1, final=False)
+    changed = {**first, "60": snapshot_factory(DAY, seed=2, trains=["60"], final=False)["60"]}
+    without_41 = {k: v for k, v in changed.items() if k != "41"}
+    scrapes = [
+        (_at(PREVIOUS_DAY, 20), snapshot_factory(PREVIOUS_DAY, seed=0)),
+        (_at(DAY, 8), first),
+        (_at(DAY, 10), changed),
+        (_at(DAY, 12), changed),
+        (_at(DAY, 14), without_41),
+        (_at(DAY, 16), snapshot_factory(DAY, seed=3)),
+    ]
+    for scraped_at, snapshot in scrapes:
+        save_snapshot(raw_dir, snapshot, scraped_at)
+    return scrapes
+
+
+@pytest.fixture
+def store(tmp_path, raw_dir, scrapes) -> tuple:
+    root = tmp_path / "via_rail_snapshots"
+    refs = sorted(iter_snapshots(raw_dir), key=lambda r: r.name)
+    by_day: dict[date, list] = {}
+    for ref in refs:
+        by_day.setdefault(est_date_of(ref.name), []).append(ref)
+    counts = {day: write_day(root, day_refs, day) for day, day_refs in by_day.items()}
+    return root, counts, refs
+
+
+def _state(table: pa.Table) -> pa.Table:
+    """SCHEMA columns sorted by stop, for comparing states."""
+    return table.select(SCHEMA.names).sort_by([(k, "ascending") for k in DELTA_KEYS])
+
+
+def _full(ref, scraped_at: datetime) -> pa.Table:
+    day = scraped_at.astimezone(EST).date()
+    return _state(dedup_table(flatten_file(ref, day), keys=DELTA_KEYS))
+
+
+def test_as_of_round_trips_every_scrape(store, scrapes):
+    root, _, refs = store
+    for (scraped_at, _), ref in zip(scrapes, refs):
+        for moment in (scraped_at, scraped_at + timedelta(minutes=59)):
+            assert _state(as_of(root, moment)).equals(_full(ref, scraped_at)), moment
+
+
+def test_as_of_before_first_scrape_of_day(store, scrapes):
+    root, _, refs = store
+    # Before the day's first scrape the previous day's final state holds
+    assert _state(as_of(root, _at(DAY, 7))).equals(_full(refs[0], scrapes[0][0]))
+    assert as_of(root, _at(PREVIOUS_DAY, 7)).num_rows == 0
+
+
+def test_deltas_store_only_changes(store):
+    _, counts, _ = store
+    delta_rows, removed_rows, full_rows = counts[DAY]
+    fleet, train_60, train_41 = 13, 3, 3
+    assert full_rows == 4 * fleet - train_41 + fleet
+    assert removed_rows == train_41
+    # The keyframe, train 60's new delays, nothing for the unchanged scrape
+    # or the removal, then every stop again (all runs have arrived)
+    assert 2 * fleet < delta_rows <= 2 * fleet + train_60
+
+
+def test_train_history_marks_removals(store):
+    root, _, _ = store
+    history = train_history(root, "41", start=DAY, end=DAY).to_pylist()
+    removed = [row for row in history if row["is_removed"]]
+    assert [row["scrape_ts"] for row in removed] == [_at(DAY, 14)] * 3
+    assert all(row["delay_minutes"] is None for row in removed)
+    # It comes back in the last scrape
+    assert history[-1]["scrape_ts"] == _at(DAY, 16) and not history[-1]["is_removed"]
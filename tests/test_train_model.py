@@ -0,0 +1,44 @@
+"""
+test_train_model.py — The offline training script on the session dataset.
+"""
+
+from __future__ import annotations
+
+import shutil
+
+import pytest
+from conftest import DATASET_DAYS, point_data_loader
+
+import train_model
+from app.arrival_model import ArrivalModel
+from pipeline.serving import serving_dir
+
+FAST = ["--trees", "5", "--min-leaf", "5"]
+
+
+@pytest.fixture
+def dataset(tmp_path, dataset_dir, monkeypatch):
+    """A copy of the session dataset without serving files, served by app.data_loader."""
+    root = tmp_path / "clean_data" / "via_rail"
+    shutil.copytree(dataset_dir, root, ignore=shutil.ignore_patterns("_serving"))
+    point_data_loader(monkeypatch, root)
+    return root
+
+
+def test_trains_and_validates(dataset, tmp_path, capsys):
+    output = tmp_path / "model.joblib"
+    train_model.main([*FAST, "--holdout-days", "7", "--output", str(output)])
+    model = ArrivalModel.load(output)
+    assert model.meta["validation"]["holdout_days"] == 7
+    assert model.meta["validation"]["holdout_samples"] > 0
+    assert "Validation on the last 7 days" in capsys.readouterr().out
+    # Read from Parquet: no serving files written as a side effect
+    assert not serving_dir(dataset).exists()
+
+
+@pytest.mark.parametrize("holdout_days", [DATASET_DAYS, 30])
+def test_holdout_longer_than_history_skips_validation(dataset, tmp_path, capsys, holdout_days):
+    output = tmp_path / "model.joblib"
+    train_model.main([*FAST, "--holdout-days", str(holdout_days), "--output", str(output)])
+    assert "skipping validation" in capsys.readouterr().out
+    assert ArrivalModel.load(output).meta["validation"] == {}
@@ -0,0 +1,122 @@
+"""
+train_model.py — Train the arrival-delay model served by /api/predict.
+
+Builds training samples from the clean dataset (see
+backend/app/arrival_model.py for the features), validates on the most
+recent --holdout-days days against the historical-average predictor the
+API used before, then refits on everything and saves
+models/arrival_model.joblib.  Running API workers pick the new model up on
+restart.  The model file is not committed: the weekly train-model workflow
+(.github/workflows/train-model.yml) runs this script on the committed
+dataset and publishes the file as a build artifact, to be copied into
+models/ where the API is deployed.
+
+Usage:
+    python train_model.py
+    python train_model.py --trees 300 --depth 7 --holdout-days 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent
+BACKEND_DIR = REPO_ROOT / "backend"
+
+# The model and its features live in the backend package
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app import data_loader  # noqa: E402
+from app.arrival_model import MODEL_PATH, ArrivalModel, training_samples  # noqa: E402
+
+
+def _mae(predicted: np.ndarray, actual: np.ndarray) -> float:
+    return float(np.mean(np.abs(predicted - actual)))
+
+
+def _validate(train: pd.DataFrame, test: pd.DataFrame, params: dict, holdout_days: int) -> dict[str, float]:
+    """Fit on *train*, print and return the MAEs on *test* against the historical mean."""
+    start = time.perf_counter()
+    model = ArrivalModel.fit(train, **params)
+    elapsed = time.perf_counter() - start
+
+    actual = test["delay"].to_numpy()
+    # The API's previous answer: mean historical delay of the train number
+    baseline = model.train_numbers.transform(test["train_number"])
+    validation = {
+        "holdout_days": holdout_days,
+        "holdout_samples": len(test),
+        "mae_model": _mae(model.predict(test), actual),
+        "mae_historical_mean": _mae(baseline, actual),
+    }
+    known = ~np.isnan(test["upstream_delay"].to_numpy())
+    if known.any():
+        validation["mae_model_with_upstream"] = _mae(model.predict(test[known]), actual[known])
+        validation["mae_upstream_persists"] = _mae(test["upstream_delay"].to_numpy()[known], actual[known])
+
+    print(f"Validation on the last {holdout_days} days ({len(test):,} samples, fit {elapsed:.1f}s):")
+    for name, value in validation.items():
+        if name.startswith("mae"):
+            print(f"  {name:<28}{value:>8.2f} min")
+    return validation
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Train the arrival-delay model")
+    parser.add_argument("--trees", type=int, default=200, help="Boosting rounds (default: 200)")
+    parser.add_argument("--depth", type=int, default=6, help="Tree depth (default: 6)")
+    parser.add_argument("--learning-rate", type=float, default=0.1)
+    parser.add_argument("--min-leaf", type=int, default=50, help="Minimum samples per leaf")
+    parser.add_argument(
+        "--holdout-days", type=int, default=30,
+        help="Validate on the most recent N days before the final fit (0 to skip)",
+    )
+    parser.add_argument("--output", type=Path, default=MODEL_PATH)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    # HistGradientBoostingRegressor parameters
+    params = {
+        "max_iter": args.trees,
+        "max_depth": args.depth,
+        "max_leaf_nodes": None,
+        "learning_rate": args.learning_rate,
+        "min_samples_leaf": args.min_leaf,
+    }
+
+    # Straight from Parquet: the memory-mapped serving files are the API's
+    samples = training_samples(data_loader._load(mapped=False))
+    print(f"{len(samples):,} training samples")
+    if samples.empty:
+        print("No samples — build the dataset first.")
+        return
+
+    validation: dict[str, float] = {}
+    if args.holdout_days:
+        cutoff = samples["scrape_date_est"].max() - pd.Timedelta(days=args.holdout_days - 1)
+        train, test = samples[samples["scrape_date_est"] < cutoff], samples[samples["scrape_date_est"] >= cutoff]
+        if train.empty or test.empty:
+            print(
+                f"History does not extend past the {args.holdout_days}-day holdout — "
+                "skipping validation (lower --holdout-days to validate)."
+            )
+        else:
+            validation = _validate(train, test, params, args.holdout_days)
+
+    model = ArrivalModel.fit(samples, **params)
+    model.meta["validation"] = validation
+    path = model.save(args.output)
+    print(f"Saved {model.trees.n_iter_} trees → {path}")
+
+
+if __name__ == "__main__":
+    main()
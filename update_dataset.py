@@ -1,259 +1,273 @@
 """
-update_dataset.py — Incremental daily update for clean_data/via_rail_clean.parquet.
+update_dataset.py — Incremental daily update for the partitioned dataset in
+clean_data/via_rail/.
 
 Selects the latest scrape file for TODAY's EST date, parses it into the
-canonical schema, appends to the master Parquet, and deduplicates so the
-script is safe to run multiple times on the same day.
+canonical schema and writes it as that day's partition.  Only the one
+partition (and its rollup and delay histogram, see pipeline/rollup.py and
+pipeline/priors.py) is read, deduplicated and atomically replaced, so the
+cost of a run does not depend on how much history has accumulated and the
+script is safe to run multiple times on the same day.  The delay priors
+table is then rewritten from the histograms, before the manifest is saved.
+
+With --catch-up (or --since YYYY-MM-DD) the processed-files manifest in
+clean_data/via_rail/_manifest.parquet is compared with raw_data/ instead,
+and every EST day with new or changed snapshots is rebuilt from its latest
+file — the same result build_historical.py would give for those days.
+
+With --all-snapshots the intraday delta stream of each processed day in
+clean_data/via_rail_snapshots/ is rebuilt as well (see pipeline/snapshots.py).
+
+Every run appends the wall time, CPU time, rows and peak memory of each of
+its stages to a JSON-lines run log (see pipeline/runlog.py); --profile
+keeps cProfile dumps of the slowest files.
 
 Cron usage:
     30 4 * * * python /path/to/save_via_data.py && python /path/to/update_dataset.py
+
+Backfill after missed runs:
+    python update_dataset.py --catch-up
+    python update_dataset.py --since 2025-04-01
 """
 
 from __future__ import annotations
 
-import json
-import re
-from datetime import date, datetime, timedelta, timezone
+import argparse
+from datetime import date, datetime
 from pathlib import Path
 
-import pandas as pd
 import pyarrow as pa
-import pyarrow.parquet as pq
+
+from pipeline import runlog
+from pipeline.dataset import SORT_KEYS, delete_partition, read_partition, write_partition
+from pipeline.flatten import dedup_table, flatten_file
+from pipeline.manifest import (
+    files_for_day,
+    load_manifest,
+    record_day,
+    save_manifest,
+    scan_raw_dir,
+)
+from pipeline.priors import delete_histogram, write_histogram, write_priors
+from pipeline.raw_files import est_date_of, parse_utc_timestamp
+from pipeline.raw_store import SnapshotRef, find_snapshot, iter_snapshots
+from pipeline.rollup import delete_rollup, write_rollup
+from pipeline.schema import EST, UTC
+from pipeline.snapshots import write_day
 
 # ---------------------------------------------------------------------------
 # Paths
 # ---------------------------------------------------------------------------
 REPO_ROOT = Path(__file__).resolve().parent
 RAW_DIR = REPO_ROOT / "raw_data"
-OUTPUT_PATH = REPO_ROOT / "clean_data" / "via_rail_clean.parquet"
-
-# ---------------------------------------------------------------------------
-# Timezone helpers
-# ---------------------------------------------------------------------------
-UTC = timezone.utc
-EST = timezone(timedelta(hours=-5))
-
-# ---------------------------------------------------------------------------
-# Windsor–Québec corridor station codes
-# ---------------------------------------------------------------------------
-CORRIDOR_STATION_CODES: set[str] = {
-    "WDON", "CHAT", "GLNC", "LNDN", "INGR", "WDST", "BRTF", "ALDR",
-    "OAKV", "TRTO", "GUIL", "OSHA", "CBRG", "PHOP", "TRNJ", "BLVL",
-    "NAPN", "KGON", "GANA", "BRKV", "CWLL", "ALEX", "CSLM", "OTTW",
-    "FALL", "SMTF", "SLAM", "MTRL", "DORV", "COTO", "SHYA", "DRMV",
-    "SFOY", "QBEC", "CHNY",
-}
-
-# ---------------------------------------------------------------------------
-# Filename parsing
-# ---------------------------------------------------------------------------
-_FILENAME_RE = re.compile(
-    r"Via_data_(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})"
-)
-
-
-def parse_utc_timestamp(filename: str) -> datetime | None:
-    """Return the UTC datetime encoded in a raw-data filename, or None."""
-    m = _FILENAME_RE.search(filename)
-    if not m:
-        return None
-    return datetime.strptime(m.group(1), "%Y-%m-%d %H:%M:%S").replace(tzinfo=UTC)
+DATASET_DIR = REPO_ROOT / "clean_data" / "via_rail"
+SNAPSHOT_DIR = REPO_ROOT / "clean_data" / "via_rail_snapshots"
 
 
 # ---------------------------------------------------------------------------
 # File selection: latest file for the given EST date
 # ---------------------------------------------------------------------------
-def select_file_for_date(raw_dir: Path, target_est: date) -> Path | None:
+def select_file_for_date(raw_dir: Path, target_est: date) -> SnapshotRef | None:
     """
-    Return the path to the latest scrape file whose UTC timestamp falls on
-    *target_est* when converted to EST, or None if no such file exists.
+    Return the latest snapshot (loose file or bundle member) whose UTC
+    timestamp falls on *target_est* when converted to EST, or None if no
+    such snapshot exists.
     """
     best_ts: datetime | None = None
-    best_path: Path | None = None
+    best_ref: SnapshotRef | None = None
 
-    for path in raw_dir.glob("Via_data_*.json"):
-        ts_utc = parse_utc_timestamp(path.name)
+    for ref in iter_snapshots(raw_dir, since=target_est):
+        ts_utc = parse_utc_timestamp(ref.name)
         if ts_utc is None:
             continue
         if ts_utc.astimezone(EST).date() != target_est:
             continue
         if best_ts is None or ts_utc > best_ts:
             best_ts = ts_utc
-            best_path = path
+            best_ref = ref
 
-    return best_path
+    return best_ref
 
 
 # ---------------------------------------------------------------------------
-# Datetime helpers
+# All-snapshots mode: rebuild one day's intraday delta stream
 # ---------------------------------------------------------------------------
-def _parse_dt(value: str | None) -> datetime | None:
-    """Parse an ISO-8601 UTC string to an aware datetime, or None."""
-    if not value:
-        return None
-    try:
-        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
-        return dt.astimezone(UTC)
-    except ValueError:
-        return None
+def refresh_snapshots(est_date: date, refs: list[SnapshotRef]) -> None:
+    if not refs:
+        delete_partition(SNAPSHOT_DIR, est_date)
+        return
+    delta_rows, removed_rows, full_rows = write_day(SNAPSHOT_DIR, refs, est_date)
+    print(
+        f"  {est_date}  {len(refs)} scrape(s)  → "
+        f"{delta_rows:,} delta rows + {removed_rows:,} removals ({full_rows:,} in full)"
+    )
 
 
 # ---------------------------------------------------------------------------
-# Flattening a single JSON file
+# Writing one day
 # ---------------------------------------------------------------------------
-def flatten_file(path: Path, scrape_date_est: date) -> list[dict]:
-    """Return a list of row dicts for one raw JSON snapshot."""
-    with open(path, encoding="utf-8") as fh:
-        data = json.load(fh)
-
-    rows: list[dict] = []
-
-    for train_key, train in data.items():
-        train_number = train_key.split()[0]
-
-        try:
-            service_date = date.fromisoformat(train.get("instance", ""))
-        except ValueError:
-            service_date = None
-
-        origin = train.get("from", "")
-        destination = train.get("to", "")
-        departed = bool(train.get("departed", False))
-        arrived = bool(train.get("arrived", False))
-
-        for seq, stop in enumerate(train.get("times", [])):
-            delay_minutes = stop.get("diffMin")
-            if delay_minutes is None:
-                delay_minutes_int = None
-                is_on_time = None
-                is_late_15 = None
-                is_late_60 = None
-            else:
-                delay_minutes_int = int(delay_minutes)
-                is_on_time = delay_minutes_int <= 5
-                is_late_15 = delay_minutes_int >= 15
-                is_late_60 = delay_minutes_int >= 60
-
-            arrival = stop.get("arrival") or {}
-            departure = stop.get("departure") or {}
-            station_code = stop.get("code", "")
-
-            rows.append({
-                "scrape_date_est": scrape_date_est,
-                "train_key": train_key,
-                "train_number": train_number,
-                "service_date": service_date,
-                "origin": origin,
-                "destination": destination,
-                "departed": departed,
-                "arrived": arrived,
-                "stop_sequence": seq,
-                "station_name": stop.get("station", ""),
-                "station_code": station_code,
-                "scheduled_arrival_utc": _parse_dt(arrival.get("scheduled")),
-                "estimated_arrival_utc": _parse_dt(arrival.get("estimated")),
-                "scheduled_departure_utc": _parse_dt(departure.get("scheduled")),
-                "estimated_departure_utc": _parse_dt(departure.get("estimated")),
-                "delay_minutes": delay_minutes_int,
-                "diff_status": stop.get("diff"),
-                "is_on_time": is_on_time,
-                "is_late_15": is_late_15,
-                "is_late_60": is_late_60,
-                "is_corridor": station_code in CORRIDOR_STATION_CODES,
-            })
-
-    return rows
+def store_day(table: pa.Table, est_date: date) -> Path:
+    """Replace the partition, rollup and delay histogram of *est_date*."""
+    with runlog.stage("write", rows=table.num_rows):
+        with runlog.stage("write_partition"):
+            path = write_partition(DATASET_DIR, table, est_date, SORT_KEYS)
+        with runlog.stage("write_rollup"):
+            write_rollup(DATASET_DIR, table, est_date)
+        with runlog.stage("write_histogram"):
+            write_histogram(DATASET_DIR, table, est_date)
+    return path
+
+
+def finish(entries: dict) -> None:
+    """Rewrite the dataset-wide files after the partitions are final."""
+    with runlog.stage("write_priors"):
+        write_priors(DATASET_DIR)
+    with runlog.stage("save_manifest"):
+        save_manifest(DATASET_DIR, entries)
 
 
 # ---------------------------------------------------------------------------
-# PyArrow schema — keeps dtypes deterministic even for empty files
+# Catch-up: rebuild every EST day whose snapshots changed since the manifest
 # ---------------------------------------------------------------------------
-SCHEMA = pa.schema([
-    pa.field("scrape_date_est", pa.date32()),
-    pa.field("train_key", pa.string()),
-    pa.field("train_number", pa.string()),
-    pa.field("service_date", pa.date32()),
-    pa.field("origin", pa.string()),
-    pa.field("destination", pa.string()),
-    pa.field("departed", pa.bool_()),
-    pa.field("arrived", pa.bool_()),
-    pa.field("stop_sequence", pa.int32()),
-    pa.field("station_name", pa.string()),
-    pa.field("station_code", pa.string()),
-    pa.field("scheduled_arrival_utc", pa.timestamp("us", tz="UTC")),
-    pa.field("estimated_arrival_utc", pa.timestamp("us", tz="UTC")),
-    pa.field("scheduled_departure_utc", pa.timestamp("us", tz="UTC")),
-    pa.field("estimated_departure_utc", pa.timestamp("us", tz="UTC")),
-    pa.field("delay_minutes", pa.int32()),
-    pa.field("diff_status", pa.string()),
-    pa.field("is_on_time", pa.bool_()),
-    pa.field("is_late_15", pa.bool_()),
-    pa.field("is_late_60", pa.bool_()),
-    pa.field("is_corridor", pa.bool_()),
-])
-
-# Columns used to identify a unique stop record
-DEDUP_KEYS = ["train_key", "service_date", "station_code", "scrape_date_est"]
+def catch_up(
+    since: date | None = None, all_snapshots: bool = False, profile_dir: Path | None = None
+) -> None:
+    manifest = load_manifest(DATASET_DIR)
+    if not manifest:
+        print("No manifest found — every EST day will be rebuilt.")
+
+    with runlog.stage("scan_raw_dir"):
+        entries, dirty_days = scan_raw_dir(RAW_DIR, manifest, since=since)
+    if not dirty_days:
+        save_manifest(DATASET_DIR, entries)
+        print("Manifest is up to date — nothing to do.")
+        return
+
+    print(f"{len(dirty_days)} EST day(s) with new or changed snapshots")
+
+    for est_date in sorted(dirty_days):
+        names = files_for_day(entries, est_date)
+        if all_snapshots:
+            refresh_snapshots(est_date, [find_snapshot(RAW_DIR, n) for n in names])
+        if not names:
+            delete_rollup(DATASET_DIR, est_date)
+            delete_histogram(DATASET_DIR, est_date)
+            if delete_partition(DATASET_DIR, est_date):
+                print(f"  {est_date}  no snapshots left — partition removed")
+            continue
+
+        selected = names[-1]
+        with runlog.profiled(profile_dir, selected):
+            with runlog.stage("file", file=selected, est_date=est_date.isoformat()) as record:
+                table = dedup_table(flatten_file(find_snapshot(RAW_DIR, selected), est_date))
+                record["rows"] = table.num_rows
+                if table.num_rows:
+                    store_day(table, est_date)
+                else:
+                    delete_partition(DATASET_DIR, est_date)
+                    delete_rollup(DATASET_DIR, est_date)
+                    delete_histogram(DATASET_DIR, est_date)
+        record_day(entries, est_date, selected, table.num_rows)
+        print(f"  {est_date}  {selected}  → {table.num_rows:,} rows")
+
+    finish(entries)
 
 
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
-def main() -> None:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Incremental update of clean_data/via_rail/")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--catch-up",
+        action="store_true",
+        help="Rebuild every EST day with new or changed snapshots (per the manifest)",
+    )
+    mode.add_argument(
+        "--since",
+        type=date.fromisoformat,
+        metavar="YYYY-MM-DD",
+        help="Like --catch-up, but only consider EST days on or after this date",
+    )
+    parser.add_argument(
+        "--all-snapshots",
+        action="store_true",
+        help="Also rebuild the intraday delta stream of every processed day",
+    )
+    runlog.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def update_today(args: argparse.Namespace, log: runlog.RunLog) -> None:
     today_est = datetime.now(UTC).astimezone(EST).date()
     print(f"Today's EST date: {today_est}")
 
-    path = select_file_for_date(RAW_DIR, today_est)
-    if path is None:
+    with runlog.stage("select_file"):
+        ref = select_file_for_date(RAW_DIR, today_est)
+    if ref is None:
         print(f"No scrape file found for {today_est} — nothing to do.")
         return
 
-    print(f"Selected file: {path.name}")
-
-    new_rows = flatten_file(path, today_est)
-    if not new_rows:
-        print("File produced 0 rows — nothing to append.")
-        return
+    print(f"Selected file: {ref.name}")
+
+    with runlog.profiled(log.profile_dir, ref.name):
+        with runlog.stage("file", file=ref.name, est_date=today_est.isoformat()) as record:
+            new_table = flatten_file(ref, today_est)
+            if new_table.num_rows == 0:
+                print("File produced 0 rows — nothing to append.")
+                return
+
+            # Combine with today's existing partition (if present) — no other
+            # partition is touched
+            with runlog.stage("read_partition"):
+                existing = read_partition(DATASET_DIR, today_est)
+            if existing is not None:
+                existing_count = existing.num_rows
+                combined = pa.concat_tables([existing, new_table])
+            else:
+                existing_count = 0
+                combined = new_table
 
-    new_df = pd.DataFrame(new_rows)
-    new_df["stop_sequence"] = new_df["stop_sequence"].astype("Int32")
-    new_df["delay_minutes"] = new_df["delay_minutes"].astype("Int32")
-    for col in ("scheduled_arrival_utc", "estimated_arrival_utc",
-                "scheduled_departure_utc", "estimated_departure_utc"):
-        new_df[col] = pd.to_datetime(new_df[col], utc=True, errors="coerce")
-
-    # Load existing dataset (if present) and combine
-    if OUTPUT_PATH.exists():
-        existing_df = pq.read_table(OUTPUT_PATH).to_pandas()
-        existing_count = len(existing_df)
-        combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-    else:
-        existing_count = 0
-        combined_df = new_df.copy()
-
-    # Normalise date columns so dedup key comparison works regardless of
-    # whether values came from the existing Parquet (Python date objects) or
-    # from the freshly-parsed DataFrame (datetime64).
-    combined_df["scrape_date_est"] = pd.to_datetime(combined_df["scrape_date_est"])
-    combined_df["service_date"] = pd.to_datetime(combined_df["service_date"], errors="coerce")
-
-    # Deduplicate — safe to run multiple times per day
-    combined_df.drop_duplicates(
-        subset=DEDUP_KEYS,
-        keep="last",
-        inplace=True,
-    )
+            # Deduplicate within the partition — safe to run multiple times per day
+            combined = dedup_table(combined)
+            record["rows"] = combined.num_rows
 
-    rows_added = len(combined_df) - existing_count
+            rows_added = combined.num_rows - existing_count
+            out_path = store_day(combined, today_est)
 
-    table = pa.Table.from_pandas(combined_df, schema=SCHEMA, preserve_index=False)
-    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    pq.write_table(table, OUTPUT_PATH)
+    with runlog.stage("scan_raw_dir"):
+        entries, _ = scan_raw_dir(RAW_DIR, load_manifest(DATASET_DIR), since=today_est)
+    record_day(entries, today_est, ref.name, combined.num_rows)
+    finish(entries)
+    log.summary.update(rows=combined.num_rows, rows_added=rows_added)
 
     print(
         f"Added {rows_added:,} new rows — "
-        f"total {len(combined_df):,} rows in {OUTPUT_PATH}"
+        f"{combined.num_rows:,} rows in {out_path}"
+    )
+
+    if args.all_snapshots:
+        with runlog.stage("refresh_snapshots"):
+            refresh_snapshots(today_est, [
+                r for r in iter_snapshots(RAW_DIR, since=today_est)
+                if est_date_of(r.name) == today_est
+            ])
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    mode = "catch_up" if args.catch_up or args.since is not None else "nightly"
+    log = runlog.RunLog(
+        "update_dataset", args.run_log, profile_top=args.profile,
+        mode=mode, since=args.since, all_snapshots=args.all_snapshots,
     )
+    with log:
+        if mode == "catch_up":
+            catch_up(since=args.since, all_snapshots=args.all_snapshots, profile_dir=log.profile_dir)
+        else:
+            update_today(args, log)
+    log.report()
 
 
 if __name__ == "__main__":